@@ -1,4 +1,5 @@
 import os
+import re
 import json
 import sys
 import tkinter as tk
@@ -13,6 +14,39 @@ else:
     # 如果是普通Python运行环境
     os.environ['PYTHONIOENCODING'] = 'utf-8'
 
+# orjson解析更快，未安装时使用标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# LabelMe的imageData是整张图片的base64编码，修改label时不需要解析它
+IMAGE_DATA_RE = re.compile(rb'"imageData"\s*:\s*"')
+IMAGE_DATA_PLACEHOLDER = "__modify_json_label_image_data__"
+
+def load_json_skip_image_data(file_path):
+    """读取JSON文件，imageData的内容替换为占位符后再解析，返回 (数据, imageData原始内容)"""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    image_data = None
+    match = IMAGE_DATA_RE.search(raw)
+    if match:
+        # base64内容不含引号，下一个引号就是字符串结尾
+        end = raw.find(b'"', match.end())
+        if end >= 0:
+            image_data = raw[match.end():end].decode('ascii').replace('\\/', '/')
+            raw = raw[:match.end()] + IMAGE_DATA_PLACEHOLDER.encode('ascii') + raw[end:]
+    data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    return data, image_data
+
+def dump_json_restore_image_data(file_path, data, image_data):
+    """写回JSON文件（格式与json.dump(indent=4)一致），并把占位符还原为imageData原始内容"""
+    text = json.dumps(data, ensure_ascii=False, indent=4)
+    if image_data is not None:
+        text = text.replace(f'"imageData": "{IMAGE_DATA_PLACEHOLDER}"', f'"imageData": "{image_data}"', 1)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
 def select_folder():
     """弹出文件夹选择窗口，返回用户选择的文件夹路径"""
     # 隐藏 tkinter 主窗口（只保留文件夹选择弹窗）
@@ -45,9 +79,8 @@ def modify_json_label(folder_path, prefix):
                 # 拼接完整的文件路径（包含子文件夹）
                 file_path = os.path.join(root_dir, filename)
                 try:
-                    # 读取JSON文件（强制指定utf-8编码）
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
+                    # 读取JSON文件（跳过imageData的解析）
+                    data, image_data = load_json_skip_image_data(file_path)
                     
                     # 递归遍历JSON所有层级，找到所有label字段并修改（排除指定值）
                     def update_label(obj):
@@ -72,9 +105,8 @@ def modify_json_label(folder_path, prefix):
                     # 执行label修改
                     update_label(data)
                     
-                    # 写回修改后的内容（强制指定utf-8编码）
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=4)
+                    # 写回修改后的内容（强制指定utf-8编码，imageData原样保留）
+                    dump_json_restore_image_data(file_path, data, image_data)
                     
                     modified_files += 1
                     print(f"完成处理文件：{file_path}")
@@ -23,6 +23,8 @@ python check_dataset.py
 import os
 import glob
 
+from label_parser import load_label_files
+
 # 检查当前目录
 print('当前工作目录:', os.getcwd())
 
@@ -63,14 +65,7 @@ if train_label_files:
     
     # 检查所有标签文件中的类别ID
     print('\n检查标签文件中的类别ID:')
-    all_class_ids = set()
-    for lbl_path in train_label_files:
-        with open(lbl_path, 'r') as f:
-            lines = f.readlines()
-        for line in lines:
-            parts = line.strip().split()
-            if parts:
-                class_id = int(parts[0])
-                all_class_ids.add(class_id)
+    table = load_label_files(train_label_files)
+    all_class_ids = set(table.class_ids.tolist())
     print(f'训练集中使用的类别ID: {sorted(all_class_ids)}')
     print(f'类别ID数量: {len(all_class_ids)}')
@@ -4,9 +4,11 @@
 重复图像检查脚本
 
 功能描述：
-1. 计算所有标签文件的MD5哈希值，识别重复标签
+1. 计算所有标签文件的内容哈希值，识别重复标签
 2. 检查重复标签对应的图像文件是否也是重复的
 3. 输出重复标签和对应图像的详细信息
+4. 对所有图像计算感知哈希（pHash/dHash），查找重新编码、缩放或轻微裁剪后的近重复图像，
+   分别报告划分内和跨划分（train/valid/test之间泄漏）的近重复簇
 
 使用方法：
 直接运行此脚本，无需参数
@@ -17,89 +19,155 @@ python check_duplicate_images.py
 - 重复标签对应的图像是否也是重复的
 - 不重复图像的分组信息
 - 标签内容示例
+- 划分内和跨划分的近重复图像簇及其pHash距离
 
 检查逻辑：
-1. 首先计算所有标签文件的MD5哈希值
+1. 首先计算所有标签文件的内容哈希值（结果保存在指纹库dataset/.index/fingerprints.sqlite中，文件未变化时直接复用）
 2. 找到哈希值相同的重复标签文件
 3. 对每个重复标签组，找到对应的图像文件
-4. 计算这些图像文件的MD5哈希值
+4. 计算这些图像文件的内容哈希值
 5. 判断图像是否也是重复的并输出结果
+6. 并行计算所有图像的感知哈希，用多索引哈希查找汉明距离不超过阈值的图像并聚类（见image_hash.py）
 """
 import os
-import hashlib
 import glob
+import time
 
-# 计算文件的MD5哈希值
-def calculate_hash(file_path):
-    hash_md5 = hashlib.md5()
-    try:
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-    except Exception as e:
-        print(f"计算文件哈希值时出错 {file_path}: {e}")
-        return None
-    return hash_md5.hexdigest()
-
-# 检查重复标签对应的图像是否也是重复的
-print("检查重复标签对应的图像...")
-
-# 获取所有标签文件
-train_labels = glob.glob('dataset/train/labels/*.txt')
-val_labels = glob.glob('dataset/valid/labels/*.txt')
-all_labels = train_labels + val_labels
-
-# 计算所有标签文件的哈希值
-label_hashes = {}
-for lbl_path in all_labels:
-    file_hash = calculate_hash(lbl_path)
-    if file_hash not in label_hashes:
-        label_hashes[file_hash] = []
-    label_hashes[file_hash].append(lbl_path)
-
-# 检查每个哈希值对应的所有标签文件
-for file_hash, lbl_paths in label_hashes.items():
-    if len(lbl_paths) > 1:
-        print(f"\n哈希值 {file_hash} 有 {len(lbl_paths)} 个重复标签:")
+from fingerprint_store import FingerprintStore
+from image_hash import find_near_duplicates, list_images, MAX_DISTANCE
+
+# 参与近重复检查的划分
+SPLITS = ('train', 'valid', 'test')
+
+# 每类近重复簇最多输出的数量
+MAX_PRINT_CLUSTERS = 50
+
+def check_duplicate_label_images(store):
+    """
+    检查重复标签对应的图像是否也是重复的
+
+    参数:
+        store: FingerprintStore指纹库，文件未变化时直接复用上次的摘要
+    """
+    print("检查重复标签对应的图像...")
+
+    # 获取所有标签文件
+    train_labels = glob.glob('dataset/train/labels/*.txt')
+    val_labels = glob.glob('dataset/valid/labels/*.txt')
+    all_labels = train_labels + val_labels
+
+    # 计算所有标签文件的哈希值
+    label_hashes = {}
+    for lbl_path, file_hash in store.digests(all_labels).items():
+        if file_hash not in label_hashes:
+            label_hashes[file_hash] = []
+        label_hashes[file_hash].append(lbl_path)
+
+    # 检查每个哈希值对应的所有标签文件
+    for file_hash, lbl_paths in label_hashes.items():
+        if len(lbl_paths) > 1:
+            print(f"\n哈希值 {file_hash} 有 {len(lbl_paths)} 个重复标签:")
         
-        # 获取对应的图像文件路径
-        img_paths = []
-        for lbl_path in lbl_paths:
-            # 将 labels 替换为 images，将 .txt 替换为 .jpg
-            img_path = lbl_path.replace('labels', 'images').replace('.txt', '.jpg')
-            if os.path.exists(img_path):
-                img_paths.append(img_path)
-            else:
-                # 尝试 .png 格式
-                img_path_png = img_path.replace('.jpg', '.png')
-                if os.path.exists(img_path_png):
-                    img_paths.append(img_path_png)
+            # 获取对应的图像文件路径
+            img_paths = []
+            for lbl_path in lbl_paths:
+                # 将 labels 替换为 images，将 .txt 替换为 .jpg
+                img_path = lbl_path.replace('labels', 'images').replace('.txt', '.jpg')
+                if os.path.exists(img_path):
+                    img_paths.append(img_path)
                 else:
-                    print(f"  警告: 图像文件不存在 {img_path}")
+                    # 尝试 .png 格式
+                    img_path_png = img_path.replace('.jpg', '.png')
+                    if os.path.exists(img_path_png):
+                        img_paths.append(img_path_png)
+                    else:
+                        print(f"  警告: 图像文件不存在 {img_path}")
         
-        # 计算图像文件的哈希值
-        img_hashes = {}
-        for img_path in img_paths:
-            img_hash = calculate_hash(img_path)
-            if img_hash not in img_hashes:
-                img_hashes[img_hash] = []
-            img_hashes[img_hash].append(img_path)
+            # 计算图像文件的哈希值
+            img_hashes = {}
+            for img_path, img_hash in store.digests(img_paths).items():
+                if img_hash not in img_hashes:
+                    img_hashes[img_hash] = []
+                img_hashes[img_hash].append(img_path)
         
-        # 输出结果
-        if len(img_hashes) == 1:
-            print("  ✅ 这些标签对应的图像也是重复的")
-            print(f"  图像路径: {img_paths[0]}")
-        else:
-            print(f"  ❌ 这些标签对应的图像不重复 ({len(img_hashes)} 种不同图像)")
-            for i, (img_hash, img_paths_same_hash) in enumerate(img_hashes.items(), 1):
-                print(f"  图像组 {i} ({len(img_paths_same_hash)} 个文件):")
-                for img_path in img_paths_same_hash:
-                    print(f"    {img_path}")
+            # 输出结果
+            if len(img_hashes) == 1:
+                print("  ✅ 这些标签对应的图像也是重复的")
+                print(f"  图像路径: {img_paths[0]}")
+            else:
+                print(f"  ❌ 这些标签对应的图像不重复 ({len(img_hashes)} 种不同图像)")
+                for i, (img_hash, img_paths_same_hash) in enumerate(img_hashes.items(), 1):
+                    print(f"  图像组 {i} ({len(img_paths_same_hash)} 个文件):")
+                    for img_path in img_paths_same_hash:
+                        print(f"    {img_path}")
                     
-            # 显示其中一个标签文件的内容
-            with open(lbl_paths[0], 'r') as f:
-                content = f.read()
-            print(f"\n  标签内容示例 (来自 {os.path.basename(lbl_paths[0])}):")
-            print(content[:200] + "..." if len(content) > 200 else content)
+                # 显示其中一个标签文件的内容
+                with open(lbl_paths[0], 'r') as f:
+                    content = f.read()
+                print(f"\n  标签内容示例 (来自 {os.path.basename(lbl_paths[0])}):")
+                print(content[:200] + "..." if len(content) > 200 else content)
+
+
+def _split_of(img_path):
+    """从 dataset/<划分>/images/xxx.jpg 中取出划分名称"""
+    return os.path.basename(os.path.dirname(os.path.dirname(img_path)))
+
+
+def _print_clusters(title, clusters):
+    """输出近重复簇，每类最多输出MAX_PRINT_CLUSTERS个"""
+    print(f"\n{title}: {len(clusters)} 个簇")
+    for i, cluster in enumerate(clusters[:MAX_PRINT_CLUSTERS], 1):
+        print(f"  簇 {i} ({len(cluster)} 张图像):")
+        for img_path, distance in cluster:
+            print(f"    [{_split_of(img_path)}] {img_path} (距离 {distance})")
+    if len(clusters) > MAX_PRINT_CLUSTERS:
+        print(f"  ... 还有 {len(clusters) - MAX_PRINT_CLUSTERS} 个簇未显示")
+
+
+def check_near_duplicate_images(store, max_distance=MAX_DISTANCE, workers=None):
+    """
+    使用感知哈希检查所有图像中的近重复图像
+
+    参数:
+        store: FingerprintStore指纹库，图像未变化时直接复用上次的感知哈希
+        max_distance: pHash汉明距离阈值
+        workers: 计算哈希的进程数，None表示使用全部CPU核心
+    """
+    print(f"\n检查近重复图像（pHash汉明距离 <= {max_distance}）...")
+
+    img_paths = []
+    for split in SPLITS:
+        img_paths.extend(list_images(os.path.join('dataset', split, 'images')))
+
+    start = time.perf_counter()
+    hashes, failed = store.image_hashes(img_paths, workers=workers)
+    print(f"已计算 {len(hashes)} 张图像的感知哈希，耗时 {time.perf_counter() - start:.2f}s")
+    for img_path, error in failed.items():
+        print(f"  警告: 无法读取图像 {img_path}: {error}")
+
+    clusters = find_near_duplicates(hashes, max_distance)
+    cross_split = []
+    within_split = {}
+    for cluster in clusters:
+        splits = {_split_of(img_path) for img_path, _ in cluster}
+        if len(splits) > 1:
+            cross_split.append(cluster)
+        else:
+            within_split.setdefault(splits.pop(), []).append(cluster)
+
+    for split, split_clusters in within_split.items():
+        _print_clusters(f"{split} 集内的近重复图像", split_clusters)
+
+    if cross_split:
+        leaked = sum(1 for cluster in cross_split for img_path, _ in cluster if _split_of(img_path) != 'train')
+        _print_clusters("❌ 跨划分的近重复图像（数据泄漏，会使验证指标虚高）", cross_split)
+        print(f"\n共 {leaked} 张非训练集图像与其他划分的图像近重复")
+    else:
+        print("\n✅ 未发现跨划分的近重复图像")
+
 
-print("\n检查完成！")
+if __name__ == '__main__':
+    with FingerprintStore('dataset') as fingerprint_store:
+        check_duplicate_label_images(fingerprint_store)
+        check_near_duplicate_images(fingerprint_store)
+    print("\n检查完成！")
@@ -5,10 +5,11 @@
 
 功能描述：
 1. 检查训练集和验证集的标签文件是否重复
-2. 计算所有标签文件的MD5哈希值以识别重复内容
+2. 并行计算所有标签文件的内容哈希（xxhash或blake2b，每个文件只读取一次）以识别重复内容
 3. 统计验证集中相同内容的文件数量
 4. 显示重复标签的哈希值和路径
 5. 输出重复标签内容的示例
+6. 统计训练集与验证集之间内容相同的标签文件（数据泄漏）
 
 使用方法：
 直接运行此脚本，无需参数
@@ -19,22 +20,22 @@ python check_duplicate_labels.py
 - 重复标签文件的哈希值和路径
 - 验证集中相同内容的文件统计
 - 重复标签内容的示例（前3行）
+- 训练集与验证集之间的泄漏数量
 
 检查逻辑：
-1. 首先计算所有训练集和验证集标签文件的MD5哈希值
+1. 首先一次性计算所有训练集和验证集标签文件的哈希值，建立 哈希值 -> 文件列表 的哈希表
+   （摘要保存在指纹库dataset/.index/fingerprints.sqlite中，文件未变化时直接复用）
 2. 找到哈希值相同的重复标签文件
 3. 统计验证集中每个哈希值对应的文件数量
 4. 对重复的标签内容，显示示例内容
+5. 统计同时出现在训练集和验证集中的非空标签内容
 """
 import os
-import hashlib
 import glob
+from collections import Counter
 
-# 计算文件内容的哈希值
-def get_file_hash(file_path):
-    with open(file_path, 'rb') as f:
-        content = f.read()
-    return hashlib.md5(content).hexdigest()
+from file_hash import bytes_digest
+from fingerprint_store import FingerprintStore
 
 # 检查训练集和验证集的标签是否重复
 print("检查训练集和验证集的标签是否重复...")
@@ -43,26 +44,33 @@ print("检查训练集和验证集的标签是否重复...")
 train_lbl_files = glob.glob('dataset/train/labels/*.txt')
 valid_lbl_files = glob.glob('dataset/valid/labels/*.txt')
 
-# 计算所有标签文件的哈希值
+# 一次性并行计算所有标签文件的哈希值，后续统计都基于这张表
+# 结果保存在指纹库中，文件未变化时直接复用上次的摘要
+with FingerprintStore('dataset') as store:
+    file_hashes = store.digests(train_lbl_files + valid_lbl_files)
+
+# 读取失败的文件没有摘要（None），单独报告，不参与重复统计
+unreadable_files = [lbl_path for lbl_path in train_lbl_files + valid_lbl_files if file_hashes[lbl_path] is None]
+train_lbl_files = [lbl_path for lbl_path in train_lbl_files if file_hashes[lbl_path] is not None]
+valid_lbl_files = [lbl_path for lbl_path in valid_lbl_files if file_hashes[lbl_path] is not None]
+
+# 哈希值 -> 文件列表
 hash_dict = {}
 
 # 检查训练集
 print(f'\n检查训练集 ({len(train_lbl_files)} 个文件):')
 for lbl_path in train_lbl_files:
-    file_hash = get_file_hash(lbl_path)
-    if file_hash in hash_dict:
-        hash_dict[file_hash].append(lbl_path)
-    else:
-        hash_dict[file_hash] = [lbl_path]
+    hash_dict.setdefault(file_hashes[lbl_path], []).append(lbl_path)
 
 # 检查验证集
 print(f'\n检查验证集 ({len(valid_lbl_files)} 个文件):')
 for lbl_path in valid_lbl_files:
-    file_hash = get_file_hash(lbl_path)
-    if file_hash in hash_dict:
-        hash_dict[file_hash].append(lbl_path)
-    else:
-        hash_dict[file_hash] = [lbl_path]
+    hash_dict.setdefault(file_hashes[lbl_path], []).append(lbl_path)
+
+if unreadable_files:
+    print(f'\n⚠️  {len(unreadable_files)} 个标签文件无法读取，未参与重复检查:')
+    for lbl_path in unreadable_files:
+        print(f'  {lbl_path}')
 
 # 查找重复的标签文件
 print('\n重复的标签文件:')
@@ -79,22 +87,44 @@ if not has_duplicates:
 
 # 检查验证集中相同内容的文件数量
 print('\n验证集中相同内容的文件统计:')
-valid_hashes = {get_file_hash(lbl_path): 0 for lbl_path in valid_lbl_files}
+valid_hashes = Counter(file_hashes[lbl_path] for lbl_path in valid_lbl_files)
+# 每个哈希值在验证集中的第一个文件，作为示例
+valid_samples = {}
 for lbl_path in valid_lbl_files:
-    file_hash = get_file_hash(lbl_path)
-    valid_hashes[file_hash] += 1
+    valid_samples.setdefault(file_hashes[lbl_path], lbl_path)
 
 for file_hash, count in valid_hashes.items():
     print(f'哈希值 {file_hash}: {count} 个文件')
     # 显示该哈希值对应的文件内容示例
     if count > 1:
-        sample_path = next(p for p in valid_lbl_files if get_file_hash(p) == file_hash)
+        sample_path = valid_samples[file_hash]
         print(f'  示例内容 (来自 {os.path.basename(sample_path)}):')
-        with open(sample_path, 'r') as f:
-            lines = f.readlines()
+        try:
+            with open(sample_path, 'r') as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f'    无法读取示例文件: {e}')
+            continue
         for line in lines[:3]:
             print(f'    {line.strip()}')
         if len(lines) > 3:
             print(f'    ... 还有 {len(lines) - 3} 行')
 
+# 训练集与验证集之间的泄漏统计（空标签文件是背景图像，不计入泄漏）
+print('\n训练集与验证集之间的泄漏统计:')
+empty_hash = bytes_digest(b'')
+train_hashes = Counter(file_hashes[lbl_path] for lbl_path in train_lbl_files)
+shared_hashes = [h for h in valid_hashes if h in train_hashes and h != empty_hash]
+leaked_valid = sum(valid_hashes[h] for h in shared_hashes)
+leaked_train = sum(train_hashes[h] for h in shared_hashes)
+print(f'  训练集和验证集共有的标签内容: {len(shared_hashes)} 种')
+print(f'  涉及验证集文件: {leaked_valid} / {len(valid_lbl_files)}')
+print(f'  涉及训练集文件: {leaked_train} / {len(train_lbl_files)}')
+if empty_hash in valid_hashes and empty_hash in train_hashes:
+    print(f'  另有空标签文件: 验证集 {valid_hashes[empty_hash]} 个, 训练集 {train_hashes[empty_hash]} 个（不计入泄漏）')
+if leaked_valid:
+    print(f'  ❌ {leaked_valid} 个验证集标签文件与训练集内容相同，请结合check_duplicate_images.py确认图像是否重复')
+else:
+    print('  ✅ 未发现训练集与验证集之间内容相同的标签文件')
+
 print('\n检查完成')
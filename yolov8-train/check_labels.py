@@ -29,13 +29,16 @@ python check_labels.py
 检查逻辑：
 1. 从data.yaml加载类别配置
 2. 遍历train和valid集的标签文件
-3. 检查每个标签文件的每一行
-4. 验证格式、类别ID和坐标范围
+3. 使用label_parser将全部标签文件一次性解析为数组
+4. 用向量化掩码验证格式、类别ID和坐标范围
 5. 统计类别分布和错误数量
 """
 import os
 import glob
 import yaml
+import numpy as np
+
+from label_parser import load_label_files, class_mask, coord_mask, count_classes, box_values
 
 # 加载数据集配置
 with open('dataset/data.yaml', 'r', encoding='utf-8') as f:
@@ -70,48 +73,30 @@ for split in splits:
     if missing_images:
         print(f'  警告: 有 {len(missing_images)} 个标签缺少图像')
     
-    # 检查标签内容
-    class_counts = {i: 0 for i in range(data_config['nc'])}
-    invalid_labels = 0
+    # 检查标签内容（整个划分一次性向量化解析）
+    table = load_label_files(label_files)
+    valid_cls = class_mask(table, data_config['nc'])
+    valid_coords = coord_mask(table)
+    
+    errors = [(file_idx, 0, f'读取失败: {message}') for file_idx, message in table.read_errors]
+    for file_idx, line_num, kind, line in table.bad_lines:
+        if kind == 'format':
+            errors.append((file_idx, line_num, f'中的行格式不正确: {line}'))
+        else:
+            errors.append((file_idx, line_num, f'中的值转换失败: {line}'))
+    
+    # 类别ID无效的行不再检查坐标
+    for row in np.flatnonzero(~valid_cls | ~valid_coords).tolist():
+        cls_id, coords = box_values(table, row)
+        message = f'中的类别ID无效: {cls_id}' if not valid_cls[row] else f'中的坐标超出范围: {coords}'
+        errors.append((int(table.file_ids[row]), int(table.line_numbers[row]), message))
+    
+    for file_idx, _, message in sorted(errors):
+        print(f'  错误: {os.path.basename(label_files[file_idx])} {message}')
+    invalid_labels = len(errors)
     
-    for lbl_path in label_files:
-        with open(lbl_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            parts = line.split()
-            if len(parts) != 5:
-                print(f'  错误: {os.path.basename(lbl_path)} 中的行格式不正确: {line}')
-                invalid_labels += 1
-                continue
-            
-            try:
-                class_id = int(parts[0])
-                coords = list(map(float, parts[1:5]))
-                
-                # 检查类别ID是否有效
-                if class_id < 0 or class_id >= data_config['nc']:
-                    print(f'  错误: {os.path.basename(lbl_path)} 中的类别ID无效: {class_id}')
-                    invalid_labels += 1
-                    continue
-                
-                # 检查坐标是否在0-1范围内
-                if any(c < 0 or c > 1 for c in coords):
-                    print(f'  错误: {os.path.basename(lbl_path)} 中的坐标超出范围: {coords}')
-                    invalid_labels += 1
-                    continue
-                
-                # 更新类别计数
-                class_counts[class_id] += 1
-                
-            except ValueError as e:
-                print(f'  错误: {os.path.basename(lbl_path)} 中的值转换失败: {line}')
-                invalid_labels += 1
-                continue
+    # 更新类别计数
+    class_counts = dict(enumerate(count_classes(table, data_config['nc'], valid_coords).tolist()))
     
     # 打印类别分布
     print(f"  类别分布:")
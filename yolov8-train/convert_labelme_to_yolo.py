@@ -1,8 +1,9 @@
-import json
 import os
 import glob
 from PIL import Image
 
+from labelme_json import load_labelme
+
 # 类别映射，需要根据您的实际类别进行调整
 # 从 data.yaml 中获取类别列表
 import yaml
@@ -14,9 +15,8 @@ with open('dataset/data.yaml', 'r', encoding='utf-8') as f:
 # 转换Labelme JSON到YOLO TXT
 
 def convert_labelme_to_yolo(json_path, output_dir):
-    # 加载JSON文件
-    with open(json_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # 加载JSON文件（跳过imageData，只需要图像尺寸和shapes）
+    data = load_labelme(json_path)
     
     # 获取图像尺寸
     # 如果JSON中没有图像尺寸信息，尝试从图像文件获取
@@ -9,13 +9,14 @@ COCO类名提取脚本
 1. 将此脚本放在与您的COCO注释文件相同的目录中，注释文件通常命名为'_annotations.coco.json'
 2. 如果您的注释文件与'_annotations.coco.json'名称不同，请更新下面的'coco_json'变量
 3. 运行脚本，它将提取类名，格式化它们，并将它们保存到指定的输出文件
+4. 注释文件通过coco_stream.py流式读取，读完categories后立即停止，请把coco_stream.py一并放在脚本所在目录
 
 输出格式：
 nc: 类的数量 # number of classes
 names: ['类名1', '类名2', ...] # 类名列表
 """
 # 导入所需库
-import json
+from coco_stream import iter_array
 
 # COCO JSON文件路径
 # 确保此文件存在于与脚本相同的目录中
@@ -34,13 +35,10 @@ def extract_classes_and_save(coco_json, output_file):
         coco_json: COCO格式的JSON注释文件路径
         output_file: 输出YAML文件路径
     """
-    # 加载COCO JSON文件
-    with open(coco_json) as file:
-        data = json.load(file)
-
     # 从'categories'部分提取类名
     # 每个category包含'name'字段，代表类名
-    classes = [category['name'] for category in data['categories']]
+    # 流式读取，读完categories后立即停止，不解析文件的其余部分
+    classes = [category['name'] for category in iter_array(coco_json, 'categories')]
     num_classes = len(classes)  # 计算类的数量
 
     # 格式化为YAML格式
@@ -9,14 +9,17 @@ COCO到YOLO注释格式转换脚本
 1. 将此脚本放在与您的COCO注释文件相同的目录中，注释文件通常命名为'_annotations.coco.json'
 2. 如果您的COCO文件具有不同的名称，请修改下面的'coco_json'变量
 3. 运行脚本，它将读取COCO注释，将它们转换为YOLO格式，并将它们保存在指定的输出目录中
+4. 注释文件通过coco_stream.py流式读取，请把coco_stream.py一并放在脚本所在目录
 
 注意：以下代码也应该可以工作，这是在创建此脚本后发现的
 from ultralytics.data.converter import convert_coco
 convert_coco(labels_dir='path/to/coco/annotations/')
 """
 # 导入所需库
-import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+
+from coco_stream import iter_array
 
 # COCO JSON文件路径
 # 确保此文件存在于与脚本相同的目录中
@@ -26,43 +29,48 @@ coco_json = '_annotations.coco.json'
 # 转换后的注释文件将保存在此目录中
 output_dir = 'yolo_annotations'
 
-# 将COCO JSON格式注释转换为YOLO格式文本文件
-def convert_coco_to_yolo(coco_json, output_dir):
+# 写入标注文件的线程数，None表示按CPU核心数自动选择，1表示串行写入
+write_workers = None
+
+
+# 建立图像ID索引
+def build_image_index(images):
     """
-    将COCO JSON格式的注释转换为YOLO格式的文本文件
-    
+    建立图像ID到 (不带扩展名的文件名, 宽度, 高度) 的索引，每个注释只需一次字典查找
+
     参数:
-        coco_json: COCO格式的JSON注释文件路径
-        output_dir: 输出YOLO格式注释文件的目录路径
+        images: COCO格式的图像信息（可迭代对象）
+
+    返回:
+        image_index: {图像ID: (不带扩展名的文件名, 宽度, 高度)}
     """
-    # 加载COCO JSON文件
-    with open(coco_json) as file:
-        data = json.load(file)
+    return {image['id']: (os.path.splitext(image['file_name'])[0], image['width'], image['height'])
+            for image in images}
 
-    # 如果输出目录不存在，则创建它
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
 
-    # 提取图像尺寸信息
-    # 创建一个字典，键为图像ID，值为(宽度, 高度)元组
-    image_dimensions = {image['id']: (image['width'], image['height']) for image in data['images']}
+# 按图像分组生成YOLO格式的标注行
+def group_annotations(image_index, annotations):
+    """
+    把所有注释按图像分组转换为YOLO格式的文本行
+
+    参数:
+        image_index: build_image_index返回的图像索引
+        annotations: COCO格式的注释（可迭代对象，可以是流式读取的生成器）
+
+    返回:
+        labels: {不带扩展名的图像文件名: [YOLO格式的行, ...]}，行的顺序与注释在文件中的顺序一致
+    """
+    labels = {}
+    for annotation in annotations:
+        image = image_index.get(annotation['image_id'])  # 获取注释对应的图像
+        if image is None:  # 如果找不到对应的图像，跳过
+            continue
+        base_file_name, width, height = image
 
-    # 处理每个注释
-    for annotation in data['annotations']:
-        image_id = annotation['image_id']  # 获取注释对应的图像ID
         # COCO类ID从1开始，YOLO从0开始，所以减1
         category_id = annotation['category_id'] - 1
         bbox = annotation['bbox']  # 获取COCO格式的边界框 [x, y, width, height]
 
-        # 计算归一化值
-        # 找到对应的图像文件名
-        file_name = next((img['file_name'] for img in data['images'] if img['id'] == image_id), None)
-        if file_name is None:  # 如果找不到对应的图像，跳过
-            continue
-
-        base_file_name = os.path.splitext(file_name)[0]  # 获取不带扩展名的文件名
-        width, height = image_dimensions[image_id]  # 获取图像尺寸
-        
         # COCO边界框格式：[x, y, width, height]（左上角坐标和宽高）
         # YOLO边界框格式：[x_center, y_center, width, height]（归一化的中心点坐标和宽高）
         x_center = (bbox[0] + bbox[2] / 2) / width  # 计算归一化的中心X坐标
@@ -70,15 +78,65 @@ def convert_coco_to_yolo(coco_json, output_dir):
         norm_width = bbox[2] / width  # 计算归一化的宽度
         norm_height = bbox[3] / height  # 计算归一化的高度
 
-        # 准备写入文件的行
         # YOLO格式：class_id x_center y_center width height
-        line = f"{category_id} {x_center} {y_center} {norm_width} {norm_height}\n"
+        labels.setdefault(base_file_name, []).append(
+            f"{category_id} {x_center} {y_center} {norm_width} {norm_height}\n")
+    return labels
+
+
+# 写入单个标注文件
+def write_label_file(output_file, lines):
+    """
+    一次性写入一张图像的全部标注（先写临时文件再替换），重复运行会覆盖而不是追加
+
+    参数:
+        output_file: 输出的txt文件路径
+        lines: YOLO格式的行列表
+    """
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp_file, output_file)
+
+
+# 将COCO JSON格式注释转换为YOLO格式文本文件
+def convert_coco_to_yolo(coco_json, output_dir, workers=None):
+    """
+    将COCO JSON格式的注释转换为YOLO格式的文本文件
+
+    参数:
+        coco_json: COCO格式的JSON注释文件路径
+        output_dir: 输出YOLO格式注释文件的目录路径
+        workers: 写入文件的线程数，None表示按CPU核心数自动选择，1表示串行写入
+
+    返回:
+        (写入的标注文件数, 转换的注释数)
+    """
+    # 流式读取COCO JSON文件：先读取images建立索引，再逐个读取annotations，
+    # 不会把整个文件（尤其是annotations中的分割多边形）解析到内存中
+    image_index = build_image_index(iter_array(coco_json, 'images'))
+
+    # 如果输出目录不存在，则创建它
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    # 按图像分组，每个标注文件只写一次
+    labels = group_annotations(image_index, iter_array(coco_json, 'annotations'))
+    # 使用图像文件名作为注释文件名
+    tasks = [(os.path.join(output_dir, f"{base_file_name}.txt"), lines) for base_file_name, lines in labels.items()]
+
+    if workers == 1:
+        for output_file, lines in tasks:
+            write_label_file(output_file, lines)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # list()确保写入过程中的异常被抛出
+            list(executor.map(lambda task: write_label_file(*task), tasks))
+
+    return len(tasks), sum(len(lines) for lines in labels.values())
 
-        # 写入对应的txt文件
-        # 使用图像文件名作为注释文件名
-        output_file = os.path.join(output_dir, f"{base_file_name}.txt")
-        with open(output_file, 'a') as f:  # 使用追加模式，因为一个图像可能有多个注释
-            f.write(line)
 
-# 转换数据集
-convert_coco_to_yolo(coco_json, output_dir)
+if __name__ == '__main__':
+    # 转换数据集
+    file_count, annotation_count = convert_coco_to_yolo(coco_json, output_dir, write_workers)
+    print(f"✅ 已将 {annotation_count} 个注释写入 {file_count} 个YOLO标注文件：{output_dir}")
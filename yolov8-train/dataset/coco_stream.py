@@ -0,0 +1,140 @@
+"""
+COCO JSON流式读取模块
+
+COCO注释文件可能有数GB，json.load会把整个文件解析到内存中。本模块按块读取文件，
+使用标准库json的raw_decode（C实现）逐个解码顶层数组中的元素：
+1. 内存占用只与读取块大小和单个元素大小有关，与文件大小无关
+2. 读取目标数组时，排在它前面的其他字段逐个元素解码后立即丢弃
+3. 目标数组读取完毕后立即停止，不再读取文件的剩余部分（例如只提取categories时）
+
+使用方法（与CocoToYoloAnnotations.py、CocoGetClasses.py放在同一目录）：
+    from coco_stream import iter_array
+    for annotation in iter_array('_annotations.coco.json', 'annotations'):
+        ...
+"""
+# 导入所需库
+import json
+import re
+
+# 每次从文件读取的字符数
+CHUNK_SIZE = 1 << 20
+
+# 匹配JSON中的空白字符
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# 匹配可能组成数字的字符
+_NUMBER_CHARS = re.compile(r'[-+0-9.eE]*')
+
+_DECODER = json.JSONDecoder()
+
+
+class _StreamReader:
+    """在按块读取的文本缓冲区上逐个解码JSON值"""
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """丢弃已解码的部分并读取下一块；缓冲区中的值跨越多个块时读取量翻倍，避免反复重试"""
+        data = self.file.read(max(self.chunk_size, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def peek(self):
+        """跳过空白字符，返回下一个字符"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("JSON文件意外结束")
+            self._fill()
+
+    def expect(self, char):
+        """读取下一个非空白字符，并确认它是char"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON格式错误：位置 {self.pos} 处应为 '{char}'，实际为 '{found}'")
+        self.pos += 1
+
+    def decode(self):
+        """解码当前位置的一个完整JSON值"""
+        # 数字没有结束符，在块边界处可能被截断成另一个合法数字（如 -2.5e-07 截断为 -2.5），
+        # 需要读到数字之后的字符再解码
+        if self.peek() in '-0123456789':
+            while _NUMBER_CHARS.match(self.buf, self.pos).end() == len(self.buf) and not self.eof:
+                self._fill()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # 值被块边界截断，读取更多内容后重试
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def iter_array_items(self):
+        """逐个解码当前位置的数组元素"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"JSON格式错误：位置 {self.pos - 1} 处应为 ',' 或 ']'")
+
+
+def iter_array(coco_json, key, chunk_size=CHUNK_SIZE):
+    """
+    流式读取COCO JSON文件中的顶层数组字段
+
+    参数:
+        coco_json: COCO格式的JSON注释文件路径
+        key: 顶层数组字段名，如 'images'、'annotations'、'categories'
+        chunk_size: 每次从文件读取的字符数
+
+    返回:
+        生成器，逐个产生数组中的元素；数组读取完毕后立即停止读取文件
+    """
+    with open(coco_json, 'r', encoding='utf-8') as file:
+        reader = _StreamReader(file, chunk_size)
+        reader.expect('{')
+        if reader.peek() == '}':
+            raise KeyError(key)
+        while True:
+            name = reader.decode()
+            reader.expect(':')
+            if name == key:
+                if reader.peek() != '[':
+                    raise ValueError(f"字段 {key} 不是数组")
+                yield from reader.iter_array_items()
+                return
+
+            # 跳过其他字段：数组逐个元素解码后丢弃，保证内存占用有界
+            if reader.peek() == '[':
+                for _ in reader.iter_array_items():
+                    pass
+            else:
+                reader.decode()
+
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == '}':
+                raise KeyError(key)
+            if separator != ',':
+                raise ValueError(f"JSON格式错误：位置 {reader.pos - 1} 处应为 ',' 或 '}}'")
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+Ultralytics缓存失效管理模块
+
+train.py原先在每次训练前无条件删除labels.cache和training_output下的全部.cache文件，
+并以cache=False启动训练，导致每次都要重新扫描标签、重新解码图像。
+
+本模块改为基于内容指纹的失效策略：
+1. 对各划分的图像和标签集合（文件名、大小、修改时间）以及data.yaml的内容计算指纹
+2. 指纹保存在 dataset/.index/cache_fingerprint.json
+3. 只有指纹发生变化时才删除Ultralytics生成的缓存（labels.cache、.npy图像缓存等）
+4. 根据数据集大小和可用内存/磁盘空间选择 cache='ram' / 'disk' / False
+
+使用方法：
+    from dataset_cache import invalidate_stale_caches, resolve_cache_mode
+    changed, removed, stats = invalidate_stale_caches('dataset', extra_dirs=['training_output'])
+    cache = resolve_cache_mode('auto', 'dataset', imgsz=640, stats=stats)
+"""
+import os
+import json
+import shutil
+import hashlib
+
+# 指纹文件位置（与dataset_validator共用 dataset/.index 目录）
+INDEX_DIR_NAME = '.index'
+FINGERPRINT_NAME = 'cache_fingerprint.json'
+
+# 参与指纹计算的划分
+SPLITS = ('train', 'valid', 'test')
+
+# 图像扩展名（与train.py保持一致）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 内存缓存最多占用可用内存的比例
+RAM_BUDGET_RATIO = 0.5
+
+# 磁盘缓存最多占用剩余磁盘空间的比例
+DISK_BUDGET_RATIO = 0.5
+
+# 磁盘缓存(.npy)保存的是原始分辨率的解码图像，按压缩文件大小的倍数估算
+DISK_EXPANSION_RATIO = 8
+
+
+def _scan_dir(directory, suffixes):
+    """返回目录下匹配扩展名的 (文件名, 大小, 修改时间ns) 列表，目录不存在时返回空列表"""
+    if not os.path.isdir(directory):
+        return []
+    records = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.lower().endswith(suffixes) and entry.is_file():
+                st = entry.stat()
+                records.append((entry.name, st.st_size, st.st_mtime_ns))
+    records.sort()
+    return records
+
+
+def compute_fingerprint(dataset_dir, splits=SPLITS):
+    """
+    计算数据集指纹
+
+    参数:
+        dataset_dir: 数据集根目录
+        splits: 参与计算的划分名称
+
+    返回:
+        fingerprint: 十六进制指纹字符串
+        stats: {'image_count': 图像数量, 'image_bytes': 图像总字节数}
+    """
+    digest = hashlib.sha256()
+
+    yaml_path = os.path.join(dataset_dir, 'data.yaml')
+    if os.path.exists(yaml_path):
+        with open(yaml_path, 'rb') as f:
+            digest.update(b'data.yaml\0')
+            digest.update(hashlib.sha256(f.read()).digest())
+
+    image_count = 0
+    image_bytes = 0
+    for split in splits:
+        images = _scan_dir(os.path.join(dataset_dir, split, 'images'), IMAGE_EXTENSIONS)
+        labels = _scan_dir(os.path.join(dataset_dir, split, 'labels'), ('.txt',))
+        for kind, records in (('images', images), ('labels', labels)):
+            digest.update(f'{split}/{kind}\0'.encode('utf-8'))
+            for name, size, mtime_ns in records:
+                digest.update(f'{name}\0{size}\0{mtime_ns}\n'.encode('utf-8'))
+        image_count += len(images)
+        image_bytes += sum(size for _, size, _ in images)
+
+    return digest.hexdigest(), {'image_count': image_count, 'image_bytes': image_bytes}
+
+
+def _fingerprint_path(dataset_dir):
+    return os.path.join(dataset_dir, INDEX_DIR_NAME, FINGERPRINT_NAME)
+
+
+def load_fingerprint(dataset_dir):
+    """
+    读取上次训练时保存的指纹
+
+    参数:
+        dataset_dir: 数据集根目录
+
+    返回:
+        上次的指纹字符串，不存在时返回None
+    """
+    try:
+        with open(_fingerprint_path(dataset_dir), 'r', encoding='utf-8') as f:
+            return json.load(f).get('fingerprint')
+    except (OSError, ValueError):
+        return None
+
+
+def save_fingerprint(dataset_dir, fingerprint, stats):
+    """
+    原子写入指纹文件
+
+    参数:
+        dataset_dir: 数据集根目录
+        fingerprint: 指纹字符串
+        stats: compute_fingerprint返回的统计信息
+    """
+    path = _fingerprint_path(dataset_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint, **stats}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def find_cache_files(dataset_dir, extra_dirs=(), splits=SPLITS):
+    """
+    查找Ultralytics生成的缓存文件
+
+    包括各划分目录下的labels.cache、images目录下的.npy磁盘缓存，
+    以及extra_dirs（如training_output）下的全部.cache文件。
+
+    参数:
+        dataset_dir: 数据集根目录
+        extra_dirs: 额外需要清理.cache文件的目录
+        splits: 划分名称
+
+    返回:
+        缓存文件路径列表
+    """
+    cache_files = []
+    for split in splits:
+        split_dir = os.path.join(dataset_dir, split)
+        for name in ('labels.cache', os.path.join('labels', 'labels.cache')):
+            path = os.path.join(split_dir, name)
+            if os.path.exists(path):
+                cache_files.append(path)
+        img_dir = os.path.join(split_dir, 'images')
+        cache_files.extend(os.path.join(img_dir, name) for name, _, _ in _scan_dir(img_dir, ('.npy',)))
+
+    for directory in extra_dirs:
+        if not os.path.isdir(directory):
+            continue
+        for root, dirs, files in os.walk(directory):
+            cache_files.extend(os.path.join(root, file) for file in files if file.endswith('.cache'))
+    return cache_files
+
+
+def invalidate_stale_caches(dataset_dir, extra_dirs=(), logger=None):
+    """
+    仅在数据集指纹变化时删除Ultralytics缓存
+
+    参数:
+        dataset_dir: 数据集根目录
+        extra_dirs: 额外需要清理.cache文件的目录（如training_output）
+        logger: 可选的日志记录器
+
+    返回:
+        changed: 指纹是否发生变化（首次运行视为变化）
+        removed: 被删除的缓存文件路径列表
+        stats: 数据集统计信息，可直接传给resolve_cache_mode
+    """
+    fingerprint, stats = compute_fingerprint(dataset_dir)
+    previous = load_fingerprint(dataset_dir)
+    if previous == fingerprint:
+        if logger:
+            logger.info(f"数据集指纹未变化 ({fingerprint[:12]})，保留已有缓存")
+        return False, [], stats
+
+    removed = []
+    for cache_file in find_cache_files(dataset_dir, extra_dirs):
+        try:
+            os.remove(cache_file)
+            removed.append(cache_file)
+            if logger:
+                logger.info(f"已删除过期缓存文件: {cache_file}")
+        except OSError as e:
+            if logger:
+                logger.error(f"删除缓存文件失败 {cache_file}: {str(e)}")
+
+    save_fingerprint(dataset_dir, fingerprint, stats)
+    if logger:
+        logger.info(f"数据集指纹已变化 ({(previous or '无')[:12]} -> {fingerprint[:12]})，共删除 {len(removed)} 个缓存文件")
+    return True, removed, stats
+
+
+def _available_memory():
+    """返回可用内存字节数，未安装psutil时返回None"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.virtual_memory().available
+
+
+def resolve_cache_mode(cache_mode, dataset_dir, imgsz, stats=None, logger=None):
+    """
+    确定传给modelYolo.train的cache参数
+
+    参数:
+        cache_mode: 'auto'、'ram'、'disk' 或 False
+                    'auto' 时数据集能放入内存预算则用'ram'，否则能放入磁盘则用'disk'，都不满足时为False
+        dataset_dir: 数据集根目录
+        imgsz: 训练输入尺寸，内存缓存按 imgsz x imgsz x 3 字节/张估算
+        stats: 可选，invalidate_stale_caches返回的统计信息，避免重复扫描
+        logger: 可选的日志记录器
+
+    返回:
+        'ram'、'disk' 或 False
+    """
+    if cache_mode != 'auto':
+        return cache_mode
+
+    if stats is None:
+        _, stats = compute_fingerprint(dataset_dir)
+    ram_needed = stats['image_count'] * imgsz * imgsz * 3
+    disk_needed = stats['image_bytes'] * DISK_EXPANSION_RATIO
+
+    available = _available_memory()
+    if available is not None and ram_needed <= available * RAM_BUDGET_RATIO:
+        mode = 'ram'
+    elif disk_needed <= shutil.disk_usage(dataset_dir).free * DISK_BUDGET_RATIO:
+        mode = 'disk'
+    else:
+        mode = False
+
+    if logger:
+        logger.info(f"缓存模式: {mode} (图像 {stats['image_count']} 张, 内存缓存约需 {ram_needed / 1024**3:.2f} GB, "
+                    f"磁盘缓存约需 {disk_needed / 1024**3:.2f} GB)")
+    return mode
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""
+增量并行数据集验证模块
+
+用于替代train.py中逐个文件glob + os.path.exists + readlines的串行验证流程：
+1. 每个数据集划分（train/valid）的images和labels目录只做一次os.scandir扫描
+2. 标签文件的内容由label_parser向量化检查，并按文件分块在进程池中并行执行
+3. 检查结果保存到清单文件（dataset/.index/validate_manifest.json），
+   以 (路径, 修改时间, 文件大小) 为键，再次运行时只重新检查发生变化的标签文件；
+   读取失败的标签（如权限不足）不写入清单，下次运行时重新检查
+
+报告的问题类别与原validate_dataset完全一致：
+- 缺失标签文件（图像既没有.txt也没有.json标注）
+- 无效标签文件（空文件、格式错误、数值格式错误、类别ID超出范围、坐标超出范围、读取错误）
+
+使用方法：
+    from dataset_validator import validate_splits
+    reports = validate_splits('dataset', expected_nc=11)
+
+也可以直接运行此脚本检查dataset目录：
+    python dataset_validator.py
+"""
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+from label_parser import load_label_files, file_errors
+
+# 支持的图像扩展名（与train.py保持一致）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 清单文件位置（相对于数据集根目录）
+INDEX_DIR_NAME = '.index'
+MANIFEST_NAME = 'validate_manifest.json'
+MANIFEST_VERSION = 1
+
+# 需要检查的标签文件少于该数量时直接串行检查，避免进程池启动开销
+PARALLEL_THRESHOLD = 256
+
+
+def check_label_files(lbl_paths, expected_nc):
+    """
+    批量检查YOLO标签文件的内容（基于label_parser的向量化解析）
+
+    参数:
+        lbl_paths: 标签文件路径列表
+        expected_nc: data.yaml中的类别数量（0表示不检查类别上限）
+
+    返回:
+        errors: 与lbl_paths一一对应的错误信息列表，文件正常时为空列表
+    """
+    return _check_label_files(lbl_paths, expected_nc)[0]
+
+
+def _check_label_files(lbl_paths, expected_nc):
+    """
+    批量检查标签文件，同时返回每个文件是否读取失败
+
+    返回:
+        errors: 与lbl_paths一一对应的错误信息列表
+        unreadable: 与lbl_paths一一对应的布尔列表，读取失败的文件为True
+    """
+    table = load_label_files(lbl_paths)
+    errors = file_errors(table, expected_nc)
+    read_failed = {file_idx for file_idx, _ in table.read_errors}
+    return [errors.get(i, []) for i in range(len(lbl_paths))], [i in read_failed for i in range(len(lbl_paths))]
+
+
+def check_label_file(lbl_path, expected_nc):
+    """
+    检查单个YOLO标签文件的内容
+
+    参数:
+        lbl_path: 标签文件路径
+        expected_nc: data.yaml中的类别数量（0表示不检查类别上限）
+
+    返回:
+        errors: 错误信息列表，文件正常时为空列表
+    """
+    return check_label_files([lbl_path], expected_nc)[0]
+
+
+def _check_chunk_task(args):
+    """进程池任务包装：返回 (标签路径列表, 错误列表, 读取失败标记列表)"""
+    lbl_paths, expected_nc = args
+    return (lbl_paths, *_check_label_files(lbl_paths, expected_nc))
+
+
+def scan_split(img_dir, lbl_dir):
+    """
+    使用os.scandir一次性扫描某个划分的图像和标签目录
+
+    参数:
+        img_dir: 图像目录
+        lbl_dir: 标签目录
+
+    返回:
+        images: 图像文件名列表
+        labels: {文件名(不含扩展名): (修改时间ns, 文件大小)}，仅包含.txt标签
+        jsons: 存在LabelMe JSON标注的文件名集合（不含扩展名）
+    """
+    images = []
+    with os.scandir(img_dir) as it:
+        for entry in it:
+            # 与glob('*.*')一致：忽略隐藏文件
+            if entry.name.startswith('.') or not entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            if entry.is_file():
+                images.append(entry.name)
+
+    labels = {}
+    jsons = set()
+    with os.scandir(lbl_dir) as it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            base_name, ext = os.path.splitext(entry.name)
+            if ext == '.txt' and entry.is_file():
+                st = entry.stat()
+                labels[base_name] = (st.st_mtime_ns, st.st_size)
+            elif ext == '.json' and entry.is_file():
+                jsons.add(base_name)
+
+    return images, labels, jsons
+
+
+def load_manifest(dataset_dir):
+    """
+    加载验证清单
+
+    参数:
+        dataset_dir: 数据集根目录
+
+    返回:
+        manifest: 清单字典，文件不存在或损坏时返回空清单
+    """
+    manifest_path = os.path.join(dataset_dir, INDEX_DIR_NAME, MANIFEST_NAME)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'expected_nc': None, 'files': {}}
+
+
+def save_manifest(dataset_dir, manifest):
+    """
+    原子写入验证清单（先写临时文件再替换，避免中断时留下损坏的清单）
+
+    参数:
+        dataset_dir: 数据集根目录
+        manifest: 清单字典
+    """
+    index_dir = os.path.join(dataset_dir, INDEX_DIR_NAME)
+    os.makedirs(index_dir, exist_ok=True)
+    manifest_path = os.path.join(index_dir, MANIFEST_NAME)
+    tmp_path = f'{manifest_path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+
+def _run_checks(lbl_paths, expected_nc, workers):
+    """串行或在进程池中分块执行标签检查，返回 {标签路径: (错误列表, 是否读取失败)}"""
+    if len(lbl_paths) < PARALLEL_THRESHOLD or workers == 1:
+        return dict(zip(lbl_paths, zip(*_check_label_files(lbl_paths, expected_nc))))
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, -(-len(lbl_paths) // (workers * 8)))
+    chunks = [(lbl_paths[i:i + chunk_size], expected_nc) for i in range(0, len(lbl_paths), chunk_size)]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for paths, errors, unreadable in executor.map(_check_chunk_task, chunks):
+            results.update(zip(paths, zip(errors, unreadable)))
+    return results
+
+
+def validate_splits(dataset_dir, expected_nc, splits=('train', 'valid'), workers=None, use_manifest=True):
+    """
+    增量并行验证数据集各划分的图像与标签
+
+    参数:
+        dataset_dir: 数据集根目录
+        expected_nc: data.yaml中的类别数量
+        splits: 需要验证的划分名称
+        workers: 进程池大小，None表示使用全部CPU核心，1表示串行
+        use_manifest: 是否读取/更新清单文件以跳过未变化的标签
+
+    返回:
+        reports: {划分名称: 报告字典}，报告字典包含：
+            img_dir_exists / lbl_dir_exists: 目录是否存在
+            image_count / label_count / json_count: 文件数量
+            missing_labels: 缺失标签的图像名（不含扩展名）列表
+            invalid_labels: (图像名, 错误信息) 列表
+            checked / reused: 本次重新检查和直接复用清单结果的标签数量
+    """
+    manifest = load_manifest(dataset_dir) if use_manifest else {'files': {}}
+    # 类别数量变化时，清单中的结论全部失效
+    if manifest.get('expected_nc') != expected_nc:
+        manifest['files'] = {}
+    cached = manifest['files']
+    # 保留本次未验证划分（如test）的清单记录
+    new_files = {key: entry for key, entry in cached.items() if key.split('/', 1)[0] not in splits}
+
+    reports = {}
+    labelled = {}
+    tasks = []
+    for split in splits:
+        img_dir = os.path.join(dataset_dir, split, 'images')
+        lbl_dir = os.path.join(dataset_dir, split, 'labels')
+        report = {
+            'img_dir_exists': os.path.isdir(img_dir),
+            'lbl_dir_exists': os.path.isdir(lbl_dir),
+            'image_count': 0,
+            'label_count': 0,
+            'json_count': 0,
+            'missing_labels': [],
+            'invalid_labels': [],
+            'checked': 0,
+            'reused': 0,
+        }
+        reports[split] = report
+        if not report['img_dir_exists'] or not report['lbl_dir_exists']:
+            continue
+
+        images, labels, jsons = scan_split(img_dir, lbl_dir)
+        report['image_count'] = len(images)
+        report['label_count'] = len(labels)
+        report['json_count'] = len(jsons)
+
+        labelled[split] = []
+        for image_name in sorted(images):
+            base_name = os.path.splitext(image_name)[0]
+            if base_name not in labels:
+                # 存在JSON文件时会在训练前自动转换，不算缺失
+                if base_name not in jsons:
+                    report['missing_labels'].append(base_name)
+                continue
+
+            labelled[split].append(base_name)
+            key = f'{split}/{base_name}.txt'
+            mtime_ns, size = labels[base_name]
+            if key in new_files:
+                # 同名不同扩展名的图像共用一个标签文件，只检查一次
+                continue
+            entry = cached.get(key)
+            if entry and entry['mtime_ns'] == mtime_ns and entry['size'] == size:
+                new_files[key] = entry
+                report['reused'] += 1
+            else:
+                new_files[key] = {'mtime_ns': mtime_ns, 'size': size, 'errors': None}
+                tasks.append((os.path.join(lbl_dir, f'{base_name}.txt'), key))
+                report['checked'] += 1
+
+    # 所有划分中需要重新检查的文件统一交给进程池
+    unreadable_keys = set()
+    if tasks:
+        results = _run_checks([path for path, _ in tasks], expected_nc, workers)
+        for path, key in tasks:
+            new_files[key]['errors'], unreadable = results[path]
+            if unreadable:
+                unreadable_keys.add(key)
+
+    # 按图像名顺序汇总无效标签
+    for split, base_names in labelled.items():
+        invalid_labels = reports[split]['invalid_labels']
+        for base_name in base_names:
+            for err in new_files[f'{split}/{base_name}.txt']['errors']:
+                invalid_labels.append((base_name, err))
+
+    if use_manifest:
+        manifest['expected_nc'] = expected_nc
+        # 读取错误通常是暂时的（权限、网络盘），不缓存，修复后无需改动文件即可重新检查
+        manifest['files'] = {key: entry for key, entry in new_files.items() if key not in unreadable_keys}
+        save_manifest(dataset_dir, manifest)
+
+    return reports
+
+
+if __name__ == '__main__':
+    import time
+    import yaml
+
+    dataset_dir = os.path.abspath('dataset')
+    with open(os.path.join(dataset_dir, 'data.yaml'), 'r', encoding='utf-8') as f:
+        nc = yaml.safe_load(f).get('nc', 0)
+
+    start = time.perf_counter()
+    for split, report in validate_splits(dataset_dir, nc).items():
+        print(f'\n--- {split} 集 ---')
+        print(f"图像: {report['image_count']}  标签: {report['label_count']}  JSON: {report['json_count']}")
+        print(f"重新检查: {report['checked']}  复用清单: {report['reused']}")
+        print(f"缺失标签: {len(report['missing_labels'])}  无效标签: {len(report['invalid_labels'])}")
+    print(f'\n耗时: {time.perf_counter() - start:.2f}s')
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+文件内容哈希模块
+
+检查脚本只需要判断文件内容是否相同，不需要加密强度的哈希：
+1. 已安装xxhash时使用xxh3_64，否则使用8字节摘要的blake2b，都比MD5快
+2. 在线程池中并行读取文件（读取和哈希计算都会释放GIL），每个文件只读取和哈希一次
+
+使用方法：
+    from file_hash import hash_files
+    digests = hash_files(paths)   # {路径: 十六进制摘要}
+"""
+import os
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# 当前使用的摘要算法名称（指纹库按算法分别保存摘要）
+DIGEST_NAME = 'xxh3_64' if xxhash is not None else 'blake2b-64'
+
+# 大文件分块读取的块大小
+READ_CHUNK_SIZE = 1 << 20
+
+# 文件少于该数量时串行计算，避免线程池开销
+PARALLEL_THRESHOLD = 64
+
+
+def _new_hasher():
+    """返回新的哈希对象"""
+    if xxhash is not None:
+        return xxhash.xxh3_64()
+    return hashlib.blake2b(digest_size=8)
+
+
+def bytes_digest(data):
+    """
+    计算字节串的摘要
+
+    参数:
+        data: 字节串
+
+    返回:
+        十六进制摘要字符串
+    """
+    hasher = _new_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def file_digest(file_path):
+    """
+    计算文件内容的摘要
+
+    参数:
+        file_path: 文件路径
+
+    返回:
+        十六进制摘要字符串
+    """
+    hasher = _new_hasher()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _safe_digest(file_path):
+    """读取失败时返回None而不是抛出异常"""
+    try:
+        return file_digest(file_path)
+    except OSError as e:
+        print(f"计算文件哈希值时出错 {file_path}: {e}")
+        return None
+
+
+def hash_files(paths, workers=None):
+    """
+    并行计算一组文件的摘要
+
+    参数:
+        paths: 文件路径列表
+        workers: 线程数，None表示按CPU核心数自动选择，1表示串行
+
+    返回:
+        digests: {文件路径: 十六进制摘要}，读取失败的文件摘要为None
+    """
+    if len(paths) < PARALLEL_THRESHOLD or workers == 1:
+        return {path: _safe_digest(path) for path in paths}
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(paths, executor.map(_safe_digest, paths)))
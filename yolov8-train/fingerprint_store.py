@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+持久化文件指纹库
+
+check_duplicate_images.py、check_duplicate_labels.py、fix_dataset.py每次运行都会从头读取并哈希全部文件。
+本模块把计算结果保存在SQLite数据库（dataset/.index/fingerprints.sqlite）中：
+1. 以 (路径, 文件大小, 修改时间) 为键，文件未变化时直接返回上次的结果，不再读取文件内容
+2. 保存内容摘要（file_hash，按算法分别保存）以及图像的感知哈希和尺寸（image_hash）
+3. 缺失或过期的记录先并行计算，再在一个事务中批量写回
+
+使用方法：
+    from fingerprint_store import FingerprintStore
+    with FingerprintStore('dataset') as store:
+        digests = store.digests(label_paths)
+        hashes, failed = store.image_hashes(image_paths)
+"""
+import os
+import sqlite3
+
+from file_hash import hash_files, DIGEST_NAME
+from image_hash import hash_images
+
+# 指纹库位置（与dataset_validator、dataset_cache共用 dataset/.index 目录）
+INDEX_DIR_NAME = '.index'
+DB_NAME = 'fingerprints.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    phash INTEGER,
+    dhash INTEGER
+);
+CREATE TABLE IF NOT EXISTS digests (
+    path TEXT NOT NULL,
+    algo TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (path, algo)
+);
+"""
+
+# 按键查询时每条SQL最多携带的参数数量（旧版SQLite上限为999）
+_QUERY_CHUNK = 900
+
+# SQLite的INTEGER是有符号64位整数，64位哈希需要在有符号/无符号之间转换
+_SIGN_BIT = 1 << 63
+
+
+def _to_signed(value):
+    return value - (1 << 64) if value >= _SIGN_BIT else value
+
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class FingerprintStore:
+    """
+    基于SQLite的文件指纹库
+
+    参数:
+        dataset_dir: 数据集根目录，库中的路径相对于该目录保存，数据集整体移动后记录仍然有效
+        db_path: 数据库路径，默认为 dataset_dir/.index/fingerprints.sqlite
+    """
+
+    def __init__(self, dataset_dir, db_path=None):
+        self.root = os.path.abspath(dataset_dir)
+        self._dir_keys = {}
+        if db_path is None:
+            db_path = os.path.join(self.root, INDEX_DIR_NAME, DB_NAME)
+        try:
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+            self.conn = sqlite3.connect(db_path)
+            self.conn.executescript(_SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            # 目录只读等情况下退化为内存库，本次运行仍然可用，只是不会持久化
+            print(f"警告: 无法打开指纹库 {db_path}: {e}，本次使用内存库")
+            self.conn = sqlite3.connect(':memory:')
+            self.conn.executescript(_SCHEMA)
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _dir_key(self, directory):
+        """数据集内的目录使用相对路径作为键前缀，其他目录使用绝对路径"""
+        abs_dir = os.path.abspath(directory)
+        try:
+            rel_dir = os.path.relpath(abs_dir, self.root)
+        except ValueError:
+            # Windows下不在同一个盘符
+            return abs_dir + '/'
+        if rel_dir.startswith('..'):
+            return abs_dir + '/'
+        return '' if rel_dir == '.' else rel_dir.replace(os.sep, '/') + '/'
+
+    def _key(self, path):
+        """返回文件在库中的键，同一目录的键前缀只计算一次"""
+        directory, name = os.path.split(path)
+        prefix = self._dir_keys.get(directory)
+        if prefix is None:
+            prefix = self._dir_keys[directory] = self._dir_key(directory)
+        return prefix + name
+
+    def _lookup(self, query, keys, params=()):
+        """
+        只查询指定键的记录，键较多时分块使用 path IN (...) 查询
+
+        参数:
+            query: 以path为第一列、包含一个 {} 占位（替换为IN列表）的SQL
+            keys: 需要查询的键
+            params: IN列表之前的其他参数
+
+        返回:
+            {键: 其余列组成的元组}
+        """
+        keys = list(set(keys))
+        rows = {}
+        for i in range(0, len(keys), _QUERY_CHUNK):
+            chunk = keys[i:i + _QUERY_CHUNK]
+            sql = query.format(','.join('?' * len(chunk)))
+            rows.update((row[0], row[1:]) for row in self.conn.execute(sql, (*params, *chunk)))
+        return rows
+
+    def _sync(self, paths):
+        """
+        检查文件的大小和修改时间，删除已过期的记录
+
+        返回:
+            {路径: 键}，无法访问的文件不包含在内
+        """
+        keys = {}
+        stats = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = self._key(path)
+            keys[path] = key
+            stats[key] = (st.st_size, st.st_mtime_ns)
+
+        stored = self._lookup('SELECT path, size, mtime_ns FROM files WHERE path IN ({})', stats)
+        stale = [key for key, stat in stats.items() if stored.get(key) != stat]
+        if stale:
+            with self.conn:
+                self.conn.executemany('DELETE FROM digests WHERE path = ?', ((key,) for key in stale))
+                self.conn.executemany('INSERT OR REPLACE INTO files (path, size, mtime_ns) VALUES (?, ?, ?)',
+                                      ((key, *stats[key]) for key in stale))
+        return keys
+
+    def digests(self, paths, workers=None):
+        """
+        获取文件内容摘要（file_hash.DIGEST_NAME算法），只计算新增或变化的文件
+
+        参数:
+            paths: 文件路径列表
+            workers: 计算摘要的线程数，None表示自动选择
+
+        返回:
+            digests: {文件路径: 十六进制摘要}，读取失败的文件摘要为None
+        """
+        keys = self._sync(paths)
+        stored = self._lookup('SELECT path, value FROM digests WHERE algo = ? AND path IN ({})',
+                              keys.values(), (DIGEST_NAME,))
+
+        result = {}
+        missing = []
+        for path in paths:
+            row = stored.get(keys.get(path))
+            if row is None:
+                missing.append(path)
+            result[path] = row[0] if row else None
+
+        if missing:
+            computed = hash_files(missing, workers=workers)
+            result.update(computed)
+            with self.conn:
+                self.conn.executemany('INSERT OR REPLACE INTO digests (path, algo, value) VALUES (?, ?, ?)',
+                                      ((keys[path], DIGEST_NAME, value) for path, value in computed.items()
+                                       if value is not None and path in keys))
+        return result
+
+    def image_hashes(self, paths, workers=None):
+        """
+        获取图像的感知哈希和尺寸，只计算新增或变化的图像
+
+        参数:
+            paths: 图像路径列表
+            workers: 计算哈希的进程数，None表示使用全部CPU核心
+
+        返回:
+            hashes: {图像路径: (pHash, dHash, 宽, 高)}
+            failed: {图像路径: 错误信息}，无法读取的图像
+        """
+        keys = self._sync(paths)
+        stored = self._lookup('SELECT path, phash, dhash, width, height FROM files '
+                              'WHERE phash IS NOT NULL AND path IN ({})', keys.values())
+
+        hashes = {}
+        missing = []
+        for path in paths:
+            row = stored.get(keys.get(path))
+            if row is None:
+                missing.append(path)
+            else:
+                hashes[path] = (_to_unsigned(row[0]), _to_unsigned(row[1]), row[2], row[3])
+
+        failed = {}
+        if missing:
+            computed, failed = hash_images(missing, workers=workers)
+            hashes.update(computed)
+            with self.conn:
+                self.conn.executemany('UPDATE files SET phash = ?, dhash = ?, width = ?, height = ? WHERE path = ?',
+                                      ((_to_signed(phash), _to_signed(dhash), width, height, keys[path])
+                                       for path, (phash, dhash, width, height) in computed.items() if path in keys))
+        return hashes, failed
@@ -3,6 +3,9 @@ import shutil
 import random
 import glob
 
+from label_parser import load_label_files, coord_mask
+from fingerprint_store import FingerprintStore
+
 # 修复数据集，确保训练集和验证集没有重复文件
 print("正在修复数据集...")
 
@@ -30,11 +33,12 @@ else:
 
 # 检查验证集中的重复标签文件
 print('\n检查验证集中的重复标签文件...')
+# 内容摘要保存在指纹库中，文件未变化时直接复用；与进程相关的hash()不同，摘要在多次运行之间保持一致
+with FingerprintStore('dataset') as store:
+    val_label_digests = store.digests(val_labels)
 val_label_hashes = {}
 for lbl_path in val_labels:
-    with open(lbl_path, 'r') as f:
-        content = f.read()
-    file_hash = hash(content)
+    file_hash = val_label_digests[lbl_path]
     if file_hash not in val_label_hashes:
         val_label_hashes[file_hash] = []
     val_label_hashes[file_hash].append(lbl_path)
@@ -54,31 +58,16 @@ else:
 
 # 检查标签文件内容是否正常
 print('\n检查标签文件内容...')
-problematic_files = []
-for lbl_path in val_labels[:5]:  # 只检查前5个
-    with open(lbl_path, 'r') as f:
-        lines = f.readlines()
-    if len(lines) == 0:
-        problematic_files.append(os.path.basename(lbl_path))
-        continue
-    # 检查每行的格式
-    for line in lines:
-        parts = line.strip().split()
-        if len(parts) != 5:
-            problematic_files.append(os.path.basename(lbl_path))
-            break
-        try:
-            cls_id = int(parts[0])
-            x = float(parts[1])
-            y = float(parts[2])
-            w = float(parts[3])
-            h = float(parts[4])
-            if not (0 <= x <= 1 and 0 <= y <= 1 and 0 < w <= 1 and 0 < h <= 1):
-                problematic_files.append(os.path.basename(lbl_path))
-                break
-        except ValueError:
-            problematic_files.append(os.path.basename(lbl_path))
-            break
+sample_labels = val_labels[:5]  # 只检查前5个
+table = load_label_files(sample_labels)
+# 空文件、空白行、格式/数值错误，以及坐标超出范围或宽高不为正的标注框都视为有问题
+problem_idx = set(table.empty_files)
+problem_idx.update(file_idx for file_idx, _ in table.read_errors)
+problem_idx.update(file_idx for file_idx, _ in table.blank_lines)
+problem_idx.update(file_idx for file_idx, _, _, _ in table.bad_lines)
+bad_boxes = ~coord_mask(table, allow_zero_size=False)
+problem_idx.update(table.file_ids[bad_boxes].tolist())
+problematic_files = [os.path.basename(sample_labels[i]) for i in sorted(problem_idx)]
 
 if problematic_files:
     print(f'⚠️  发现 {len(problematic_files)} 个格式有问题的标签文件')
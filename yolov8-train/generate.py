@@ -12,46 +12,71 @@ YOLOv8推理生成脚本
 
 使用方法：
 1. 将待检测图像放入generate_input目录
-2. 配置脚本中的参数（模型路径、模式、置信度阈值等）
+2. 配置脚本中的参数（模型路径、模式、置信度阈值、批大小等），或通过命令行参数指定
 3. 运行脚本，结果将保存在generate_output目录
+    python generate.py --mode segmentation --model ./models/best.pt --conf 0.25
+
+监视模式：持续监视输入目录，新图像写入完成后立即推理，已处理的图像记录在输出目录的
+.processed 文件中，重启后不会重复处理（Ctrl+C 退出）：
+    python generate.py --watch --poll-interval 1
+
+作为库使用（导入时不加载模型、不创建目录，模型在第一次推理时加载并在进程内缓存）：
+    from generate import Generator
+    generator = Generator(model_path='./models/best.pt', mode='detection')
+    generator.run(image_paths)                                  # 生成全部输出文件
+    lines = generator.detection_lines(generator.predict([img])[0])  # 只获取检测结果
+
+推理按批进行：后台线程解码下一批图像的同时，当前批在模型上推理，
+推理结果再逐张拆分用于生成标注图像、检测结果和掩码。
+每张图像只用OpenCV解码一次，推理、绘制标注和生成掩码共用同一个BGR数组；
+图像编码和文件写入在后台写入线程中进行，写入队列有长度上限，
+写入跟不上时推理循环会等待（背压），避免待写入的图像占满内存。
+运行结束后输出解码、推理、绘制、编码、写入各阶段的耗时，用于判断瓶颈。
 """
-# 导入所需库
-from ultralytics import YOLO
+# 导入所需库（ultralytics和torch导入较慢，在第一次加载模型时才导入）
 from pathlib import Path
-from PIL import Image, ImageDraw, ImageFont
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from tqdm import tqdm  # 用于显示进度条
+import argparse
 import cv2
 import numpy as np
+import os
+import queue
+import threading
+import time
 
-# 目录配置
+# 目录配置（目录在运行时创建）
 input_dir = Path('./generate_input')      # 输入图像目录
-input_dir.mkdir(parents=True, exist_ok=True)  # 如果目录不存在则创建
+output_dir = Path('./generate_output')    # 输出目录，其中包含以下三个子目录
 
-output_dir = Path('./generate_output')    # 输出目录
-output_dir.mkdir(parents=True, exist_ok=True)  # 如果目录不存在则创建
-
-overlay_dir = output_dir / 'overlays'     # 带标注的图像输出目录
-overlay_dir.mkdir(parents=True, exist_ok=True)
 overlay_prefix = ""  # 输出图像前缀，可留空
 overlay_suffix = ""  # 输出图像后缀，可留空
 
-detection_dir = output_dir / 'detections' # 检测结果文本文件输出目录
-detection_dir.mkdir(parents=True, exist_ok=True)
 detection_prefix = ""  # 检测结果文本前缀，可留空
 detection_suffix = ""  # 检测结果文本后缀，可留空
 
-mask_dir = output_dir / 'masks'           # 掩码图像输出目录
-mask_dir.mkdir(parents=True, exist_ok=True)
 mask_prefix = ""  # 掩码图像前缀，可留空
 mask_suffix = ""  # 掩码图像后缀，可留空
 
-# 加载训练好的模型
+# 训练好的模型
 model_path = './models/best.pt'  # 模型文件路径
-model = YOLO(model_path)
 
 # 模式选择：detection（检测）或segmentation（分割）
 mode = "detection"
 
+# 批量推理设置
+batch_size = 8       # 每次送入模型的图像数量，显存/内存不足时调小
+loader_workers = 4   # 后台解码图像的线程数
+writer_workers = 4   # 后台编码和写入输出文件的线程数
+max_pending_writes = 32  # 写入队列的最大长度，队列满时推理循环等待写入完成
+cpu_threads = 0      # CPU推理时PyTorch使用的线程数，0表示使用PyTorch默认值（容器/taskset限制CPU时可手动设置）
+
+# 监视模式设置
+poll_interval = 1.0        # 扫描输入目录的间隔（秒）
+max_pending_images = 64    # 等待推理的图像队列最大长度，队列满时暂停扫描
+processed_state_name = '.processed'  # 已处理图像记录文件名（位于输出目录中）
+
 # 是否检测所有类或仅检测选定的类
 detect_all_classes = True  # 设置为True检测所有类，False仅检测下面指定的类
 
@@ -72,12 +97,10 @@ confidence_threshold = 0.15
 label_boxes = True  # 是否绘制类名，False仅绘制边界框
 font_size = 30      # 类标签的字体大小
 
-# 尝试加载自定义字体，失败则使用默认字体
-try:
-    font = ImageFont.truetype("arial.ttf", 30)  # 可根据需要更新字体大小
-except IOError:
-    font = ImageFont.load_default()
-    print("Default font will be used, as custom font not found.")
+# 标签直接用OpenCV绘制在BGR图像上，字体缩放比例按font_size换算
+font_face = cv2.FONT_HERSHEY_SIMPLEX
+font_scale = font_size * 0.03
+font_thickness = 2
 
 # 预定义的标签颜色和文本颜色配对列表
 predefined_colors_with_text = [
@@ -94,49 +117,100 @@ predefined_colors_with_text = [
     # 可根据需要添加更多颜色对
 ]
 
-# 为每个类分配颜色，如果类的数量超过颜色数量，则循环使用颜色
-class_colors = {class_name: predefined_colors_with_text[i % len(predefined_colors_with_text)][0] for i, class_name in enumerate(selected_classes)}
-text_colors = {class_name: predefined_colors_with_text[i % len(predefined_colors_with_text)][1] for i, class_name in enumerate(selected_classes)}
+# 文本颜色名对应的BGR值
+text_color_values = {'white': (255, 255, 255), 'black': (0, 0, 0)}
+
+# 支持的图像扩展名
+image_extensions = ['*.jpg', '*.jpeg', '*.png']
+
+# 已加载模型的缓存，同一进程内相同路径的模型只加载一次
+_model_cache = {}
+_model_lock = threading.Lock()
+
+
+# 加载（或从缓存中获取）模型的函数
+def load_model(model_path):
+    """
+    加载YOLO模型，同一路径的模型在进程内只加载一次
+
+    参数:
+        model_path: 模型文件路径
+
+    返回:
+        YOLO模型实例
+    """
+    key = os.path.abspath(model_path)
+    with _model_lock:
+        model = _model_cache.get(key)
+        if model is None:
+            import torch
+            from ultralytics import YOLO
+
+            # 仅使用CPU推理且配置了线程数时，设置PyTorch的线程数
+            if cpu_threads > 0 and not torch.cuda.is_available():
+                torch.set_num_threads(cpu_threads)
+            model = _model_cache[key] = YOLO(model_path)
+    return model
+
+# 收集输入图像路径的函数
+def collect_images(input_dir):
+    """
+    收集目录中所有支持格式的图像
 
+    参数:
+        input_dir: 输入图像目录
 
-# 存储输入图像的路径
-image_paths = []
-for extension in ['*.jpg', '*.jpeg', '*.png']:  # 支持的图像扩展名
-    image_paths.extend(input_dir.glob(extension))  # 收集所有匹配的图像文件
+    返回:
+        图像路径列表
+    """
+    image_paths = []
+    for extension in image_extensions:
+        image_paths.extend(Path(input_dir).glob(extension))  # 收集所有匹配的图像文件
+    return image_paths
 
 # 分割类，用于处理像素分割任务
 class YOLOSEG:
     """
     YOLO分割类，用于处理像素级分割任务
     """
-    def __init__(self, model_path):
+    def __init__(self, model):
         """
         初始化YOLO分割模型
-        
+
         参数:
-            model_path: 模型文件路径
+            model: 已加载的YOLO模型或模型文件路径，传入模型时与其共用同一份权重
         """
-        self.model = YOLO(model_path)
+        self.model = load_model(model) if isinstance(model, (str, os.PathLike)) else model
 
     def detect(self, img):
         """
         对输入图像进行分割检测
-        
+
         参数:
             img: 输入图像
-        
+
         返回:
             bboxes: 边界框坐标
             class_ids: 类ID
             segmentation_contours_idx: 分割轮廓索引
             scores: 置信度分数
         """
-        height, width, _ = img.shape  # 获取图像尺寸
         results = self.model.predict(source=img.copy(), save=False, save_txt=False)
-        result = results[0]
+        return self.parse(results[0])
+
+    @staticmethod
+    def parse(result):
+        """
+        从已有的推理结果中提取分割数据，不再重复推理
+
+        参数:
+            result: 单张图像的推理结果
 
+        返回:
+            与detect相同
+        """
         segmentation_contours_idx = []
-        if len(result) > 0:
+        if len(result) > 0 and result.masks is not None:
             for seg in result.masks.xy:
                 segment = np.array(seg, dtype=np.float32)
                 segmentation_contours_idx.append(segment)
@@ -147,18 +221,15 @@ class YOLOSEG:
         scores = np.array(result.boxes.conf.cpu(), dtype="float").round(2)
         return bboxes, class_ids, segmentation_contours_idx, scores
 
-# 创建YOLO分割实例
-ys = YOLOSEG(model_path)
-
 # 估算文本大小的函数
 def estimate_text_size(label, font_size):
     """
     估算文本在图像上占据的尺寸
-    
+
     参数:
         label: 要绘制的文本
         font_size: 字体大小
-    
+
     返回:
         text_width: 文本宽度
         text_height: 文本高度
@@ -169,127 +240,712 @@ def estimate_text_size(label, font_size):
     return text_width, text_height
 
 # 将检测结果写入文件的函数
-def write_detections_to_file(image_path, detections):
+def write_detections_to_file(image_path, detections, detection_dir=output_dir / 'detections'):
     """
     将检测结果写入文本文件
-    
+
     参数:
         image_path: 图像文件路径
         detections: 检测结果列表
+        detection_dir: 检测结果文本文件输出目录
     """
     # 创建与图像同名的文本文件
-    text_file_path = detection_dir / f"{detection_prefix}{image_path.stem}{detection_suffix}.txt"
+    text_file_path = Path(detection_dir) / f"{detection_prefix}{Path(image_path).stem}{detection_suffix}.txt"
 
     with open(text_file_path, 'w') as file:
         for detection in detections:
             file.write(f"{detection}\n")
 
-# 处理图像，显示进度条
-print(f"Generating outputs in {mode} mode.")
-for image_path in tqdm(image_paths, desc='Processing Images'):
-    # 检测模式
-    if mode == "detection":
-        # 使用OpenCV加载图像用于掩码生成
-        img_cv = cv2.imread(str(image_path))
-        # 初始化一个空白掩码用于所有检测
-        mask_img = np.zeros(img_cv.shape[:2], dtype=np.uint8)
-
-        # 使用PIL加载图像用于生成带标注的图像
-        img_pil = Image.open(image_path)
-        results = model.predict(img_pil)  # 进行推理
-        draw = ImageDraw.Draw(img_pil)  # 创建绘图对象
+# 各阶段耗时统计
+class StageTimer:
+    """
+    线程安全的分阶段耗时统计
+    """
+    def __init__(self):
+        self.totals = {}  # 阶段名: 累计耗时（秒）
+        self.counts = {}  # 阶段名: 处理数量
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, count=1):
+        """
+        累加一个阶段的耗时
+
+        参数:
+            stage: 阶段名
+            seconds: 耗时（秒）
+            count: 本次处理的数量
+        """
+        with self._lock:
+            self.totals[stage] = self.totals.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + count
+
+    @contextmanager
+    def measure(self, stage, count=1):
+        """统计with代码块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, count)
+
+    def report(self):
+        """打印各阶段的累计耗时和平均耗时"""
+        print("各阶段耗时（多线程阶段为各线程耗时之和）:")
+        for stage, total in self.totals.items():
+            count = self.counts[stage]
+            print(f"  {stage:<12} {total:8.2f}s  共{count}次  平均{total / count * 1000:.1f}ms")
+
+# 后台输出写入器
+class OutputWriter:
+    """
+    使用有界队列和后台线程编码并写入输出文件
+
+    队列满时submit会阻塞，推理循环随之等待，内存中待写入的图像数量不会超过队列长度；
+    close会等待队列中的全部任务写完，任何写入失败都会在close时抛出。
+    """
+    def __init__(self, workers, max_pending, timer):
+        """
+        启动写入线程
+
+        参数:
+            workers: 写入线程数
+            max_pending: 队列最大长度
+            timer: 耗时统计实例
+        """
+        self.timer = timer
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.max_depth = 0  # 队列达到过的最大深度
+        self.errors = []
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _put(self, task):
+        """放入任务，队列已满时等待（背压）"""
+        with self.timer.measure('backpressure'):
+            self.queue.put(task)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def submit_image(self, output_path, img):
+        """
+        提交图像写入任务，格式由扩展名决定
+
+        参数:
+            output_path: 输出文件路径
+            img: BGR或单通道图像，提交后不应再修改
+        """
+        self._put(('image', output_path, img))
+
+    def submit_text(self, output_path, lines):
+        """
+        提交文本写入任务
+
+        参数:
+            output_path: 输出文件路径
+            lines: 文本行列表
+        """
+        self._put(('text', output_path, lines))
+
+    def _worker(self):
+        """写入线程：编码并写入任务，收到None时退出"""
+        while True:
+            task = self.queue.get()
+            if task is None:
+                return
+            kind, output_path, data = task
+            try:
+                with self.timer.measure('encode'):
+                    if kind == 'image':
+                        ok, encoded = cv2.imencode(Path(output_path).suffix, data)
+                        if not ok:
+                            raise IOError(f"无法编码图像: {output_path}")
+                        payload = encoded.tobytes()
+                    else:
+                        payload = ''.join(f"{line}\n" for line in data).encode('utf-8')
+                with self.timer.measure('write'):
+                    with open(output_path, 'wb') as f:
+                        f.write(payload)
+            except Exception as e:
+                print(f"写入文件时出错 {output_path}: {e}")
+                self.errors.append(e)
+
+    def close(self):
+        """等待全部任务写完并停止写入线程，有写入失败时抛出第一个错误"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.errors:
+            raise self.errors[0]
+
+# 填充全部矩形区域的函数
+def rasterize_boxes(shape, boxes):
+    """
+    生成覆盖全部边界框的二值掩码（与逐个用cv2.rectangle填充的结果相同）
+
+    坐标裁剪一次性向量化完成，每个矩形只需一次数组切片赋值。
+
+    参数:
+        shape: 掩码尺寸 (高, 宽)
+        boxes: (N, 4) 整数数组，每行为 (x1, y1, x2, y2)，包含右下角像素
+
+    返回:
+        uint8掩码，覆盖区域为255
+    """
+    height, width = shape
+    mask = np.zeros(shape, dtype=np.uint8)
+    x1 = np.clip(boxes[:, 0], 0, width)
+    y1 = np.clip(boxes[:, 1], 0, height)
+    x2 = np.clip(boxes[:, 2] + 1, 0, width)
+    y2 = np.clip(boxes[:, 3] + 1, 0, height)
+    for bx1, by1, bx2, by2 in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist()):
+        mask[by1:by2, bx1:bx2] = 255
+    return mask
+
+
+# 推理生成器
+class Generator:
+    """
+    YOLOv8推理生成器
+
+    模型在第一次推理时才加载，并通过load_model在进程内缓存，
+    同一进程中的多个Generator（或同一个Generator的多次run）共用一个已加载的模型。
+    """
+    def __init__(self, model_path=model_path, mode=mode, output_dir=output_dir,
+                 confidence_threshold=confidence_threshold, detect_all_classes=detect_all_classes,
+                 selected_classes=selected_classes, class_overrides=class_overrides,
+                 label_boxes=label_boxes, batch_size=batch_size, loader_workers=loader_workers,
+                 writer_workers=writer_workers, max_pending_writes=max_pending_writes):
+        """
+        初始化生成器（不加载模型、不创建目录）
+
+        参数:
+            model_path: 模型文件路径
+            mode: "detection" 或 "segmentation"
+            output_dir: 输出目录
+            其余参数与脚本顶部的同名配置相同，默认使用这些配置
+        """
+        if mode not in ("detection", "segmentation"):
+            raise ValueError(f"不支持的模式: {mode}")
+        self.model_path = model_path
+        self.mode = mode
+        self.output_dir = Path(output_dir)
+        self.overlay_dir = self.output_dir / 'overlays'      # 带标注的图像输出目录
+        self.detection_dir = self.output_dir / 'detections'  # 检测结果文本文件输出目录
+        self.mask_dir = self.output_dir / 'masks'            # 掩码图像输出目录
+        self.confidence_threshold = confidence_threshold
+        self.detect_all_classes = detect_all_classes
+        self.selected_classes = list(selected_classes)
+        self.class_overrides = dict(class_overrides)
+        self.label_boxes = label_boxes
+        self.batch_size = batch_size
+        self.loader_workers = loader_workers
+        self.writer_workers = writer_workers
+        self.max_pending_writes = max_pending_writes
+
+        # 为每个类分配颜色，如果类的数量超过颜色数量，则循环使用颜色
+        self.class_colors = {class_name: predefined_colors_with_text[i % len(predefined_colors_with_text)][0] for i, class_name in enumerate(self.selected_classes)}
+        self.text_colors = {class_name: predefined_colors_with_text[i % len(predefined_colors_with_text)][1] for i, class_name in enumerate(self.selected_classes)}
+
+        self.timer = StageTimer()  # 最近一次run的各阶段耗时
+        self.max_write_depth = 0   # 最近一次run中写入队列达到过的最大深度
+        self.unreadable = []       # 最近一次run中无法读取而被跳过的图像
+        self._model = None
+        self._seg = None
+
+    @property
+    def model(self):
+        """YOLO模型，第一次访问时加载"""
+        if self._model is None:
+            self._model = load_model(self.model_path)
+        return self._model
+
+    @property
+    def seg(self):
+        """与model共用权重的YOLOSEG实例"""
+        if self._seg is None:
+            self._seg = YOLOSEG(self.model)
+        return self._seg
+
+    def predict(self, images):
+        """
+        对一批BGR图像进行推理
+
+        参数:
+            images: BGR格式的NumPy数组列表
+
+        返回:
+            每张图像的推理结果列表
+        """
+        with self.timer.measure('infer', len(images)):
+            return self.model.predict(images)
+
+    def filter_detections(self, result):
+        """
+        按类覆盖映射、类选择和置信度阈值筛选检测结果
+
+        参数:
+            result: 单张图像的推理结果
+
+        返回:
+            boxes: (N, 4) float数组，每行为 (x1, y1, x2, y2)
+            cls_names: 应用类覆盖映射后的类名列表
+            confs: (N,) 置信度数组
+        """
+        # 边界框、类ID和置信度一次性转换为NumPy数组，避免逐个检测结果访问张量
+        if result.boxes.xyxy is not None and len(result.boxes):
+            boxes = result.boxes.xyxy.cpu().numpy()[:, :4]
+            cls_ids = result.boxes.cls.cpu().numpy().astype(np.int64)
+            confs = result.boxes.conf.cpu().numpy()
+        else:
+            boxes = np.zeros((0, 4), dtype=np.float32)
+            cls_ids = np.zeros(0, dtype=np.int64)
+            confs = np.zeros(0, dtype=np.float32)
+
+        # 每个类ID应用类覆盖映射后的类名，无效ID使用"Unknown"
+        names = [self.class_overrides.get(result.names[i], result.names[i]) for i in range(len(result.names))]
+        names.append(self.class_overrides.get("Unknown", "Unknown"))
+        valid_ids = np.where((cls_ids >= 0) & (cls_ids < len(result.names)), cls_ids, len(result.names))
+
+        # 检查是否满足检测条件（类在选定列表中或检测所有类，且置信度高于阈值）
+        keep = confs >= self.confidence_threshold
+        if not self.detect_all_classes:
+            selected_ids = [i for i, name in enumerate(names) if name in self.selected_classes]
+            keep &= np.isin(valid_ids, selected_ids)
+        return boxes[keep], [names[i] for i in valid_ids[keep].tolist()], confs[keep]
+
+    def detection_lines(self, result):
+        """
+        生成与检测结果文本文件相同格式的记录
+
+        参数:
+            result: 单张图像的推理结果
+
+        返回:
+            "cls_name conf x1 y1 x2 y2" 格式的字符串列表
+        """
+        boxes, cls_names, confs = self.filter_detections(result)
+        return [f"{cls_name} {conf:.2f} {x1} {y1} {x2} {y2}"
+                for (x1, y1, x2, y2), cls_name, conf in zip(boxes.tolist(), cls_names, confs.tolist())]
+
+    def _output_paths(self, image_path):
+        """返回 (标注图像, 检测结果文本, 掩码图像) 的输出路径"""
+        image_path = Path(image_path)
+        return (self.overlay_dir / f"{overlay_prefix}{image_path.stem}{overlay_suffix}{image_path.suffix}",
+                self.detection_dir / f"{detection_prefix}{image_path.stem}{detection_suffix}.txt",
+                self.mask_dir / f"{mask_prefix}{image_path.stem}{mask_suffix}.png")
+
+    def _submit_outputs(self, image_path, overlay_img, lines, mask_img, writer):
+        """把标注图像、检测结果文本和掩码图像提交给写入器（写入队列满时在此等待）"""
+        overlay_output_path, detection_output_path, mask_output_path = self._output_paths(image_path)
+        writer.submit_image(overlay_output_path, overlay_img)
+        writer.submit_text(detection_output_path, lines)
+        writer.submit_image(mask_output_path, mask_img)
+
+    def process_detection(self, image_path, img, result, writer):
+        """
+        绘制边界框、生成掩码，并把检测模式的输出提交给写入器
+
+        参数:
+            image_path: 图像文件路径
+            img: 推理使用的BGR图像，标注直接绘制在该数组上
+            result: 该图像的推理结果
+            writer: OutputWriter实例
+        """
+        # 只统计绘制耗时，提交时等待写入队列的时间计入backpressure
+        with self.timer.measure('draw'):
+            overlay_img, detections, mask_img = self.draw_detection(img, result)
+        self._submit_outputs(image_path, overlay_img, detections, mask_img, writer)
+
+    def draw_detection(self, img, result):
+        """
+        在图像上绘制边界框和标签，并生成全部检测的掩码
+
+        参数:
+            img: 推理使用的BGR图像，标注直接绘制在该数组上
+            result: 该图像的推理结果
+
+        返回:
+            (标注图像, 检测结果文本行列表, 掩码图像)
+        """
         detections = []  # 存储检测结果
+        boxes, cls_names, confs = self.filter_detections(result)
+
+        # 绘制使用的整数坐标（与int()一样向零取整）
+        int_boxes = boxes.astype(np.int64)
+
+        # 生成全部检测的掩码
+        mask_img = rasterize_boxes(img.shape[:2], int_boxes)
+
+        # 绘制边界框和标签
+        for (x1, y1, x2, y2), (ix1, iy1, ix2, iy2), cls_name, conf in zip(
+                boxes.tolist(), int_boxes.tolist(), cls_names, confs.tolist()):
+            box_color = self.class_colors.get(cls_name, (255, 0, 0))[::-1]  # 获取边界框颜色（RGB转为BGR）
+            text_color = text_color_values[self.text_colors.get(cls_name, 'black')]  # 获取文本颜色
+            cv2.rectangle(img, (ix1, iy1), (ix2, iy2), box_color, thickness=7)  # 绘制边界框
+
+            # 如果需要绘制标签
+            if self.label_boxes:
+                label = f"{cls_name}: {conf:.2f}"  # 标签文本
+                text_size = estimate_text_size(label, font_size)  # 估算文本大小
+                # 绘制标签背景
+                top = int(y1 - text_size[1] - 5)
+                cv2.rectangle(img, (ix1, top), (int(x1 + text_size[0]), iy1), box_color, thickness=-1)
+                # 绘制标签文本（OpenCV以文本左下角为起点）
+                cv2.putText(img, label, (ix1, iy1 - 5), font_face, font_scale, text_color,
+                            font_thickness, cv2.LINE_AA)
+
+            # 将检测结果添加到列表
+            detections.append(f"{cls_name} {conf:.2f} {x1} {y1} {x2} {y2}")
+
+        return img, detections, mask_img
+
+    def process_segmentation(self, image_path, img, result, writer):
+        """
+        生成分割数据、掩码，并把分割模式的输出提交给写入器
+
+        参数:
+            image_path: 图像文件路径
+            img: 推理使用的BGR图像
+            result: 该图像的推理结果
+            writer: OutputWriter实例
+        """
+        with self.timer.measure('draw'):
+            annotated_img, seg_lines, mask_img = self.draw_segmentation(img, result)
+        self._submit_outputs(image_path, annotated_img, seg_lines, mask_img, writer)
+
+    def draw_segmentation(self, img, result):
+        """
+        生成带分割轮廓的标注图像、分割数据文本和分割掩码
+
+        参数:
+            img: 推理使用的BGR图像
+            result: 该图像的推理结果
+
+        返回:
+            (标注图像, 分割数据文本行列表, 掩码图像)
+        """
+        height, width, _ = img.shape  # 获取图像尺寸
 
-        # 如果有检测结果且包含边界框
-        if len(results) > 0 and results[0].boxes.xyxy is not None:
-            # 遍历每个检测结果
-            for idx, box in enumerate(results[0].boxes.xyxy):
-                x1, y1, x2, y2 = box[:4].tolist()  # 获取边界框坐标
-                cls_id = int(results[0].boxes.cls[idx].item())  # 获取类ID
-                conf = results[0].boxes.conf[idx].item()  # 获取置信度
-                # 获取类名，如果ID无效则使用"Unknown"
-                cls_name = results[0].names[cls_id] if 0 <= cls_id < len(results[0].names) else "Unknown"
-                cls_name = class_overrides.get(cls_name, cls_name)  # 应用类覆盖映射
-
-                # 检查是否满足检测条件（类在选定列表中或检测所有类，且置信度高于阈值）
-                if (cls_name in selected_classes or detect_all_classes) and conf >= confidence_threshold:
-                    box_color = class_colors.get(cls_name, (255, 0, 0))  # 获取边界框颜色
-                    text_color = text_colors.get(cls_name, 'black')  # 获取文本颜色
-                    draw.rectangle([x1, y1, x2, y2], outline=box_color, width=7)  # 绘制边界框
-
-                    # 填充掩码图像
-                    cv2.rectangle(mask_img, (int(x1), int(y1)), (int(x2), int(y2)), 255, thickness=-1)  # -1表示填充矩形
-
-                    # 如果需要绘制标签
-                    if label_boxes:
-                        label = f"{cls_name}: {conf:.2f}"  # 标签文本
-                        text_size = estimate_text_size(label, font_size)  # 估算文本大小
-                        # 绘制标签背景
-                        draw.rectangle([x1, y1 - text_size[1] - 5, x1 + text_size[0], y1], fill=box_color)
-                        # 绘制标签文本
-                        draw.text((x1, y1 - text_size[1] - 5), label, fill=text_color, font=font)
-
-                    # 将检测结果添加到列表
-                    detections.append(f"{cls_name} {conf:.2f} {x1} {y1} {x2} {y2}")
-
-        # 保存带标注的图像
-        img_pil.save(overlay_dir / f"{overlay_prefix}{image_path.stem}{overlay_suffix}{image_path.suffix}")
-
-        # 将检测结果写入文本文件
-        write_detections_to_file(image_path, detections)
-
-        # 保存掩码图像
-        mask_output_path = mask_dir / f"{mask_prefix}{image_path.stem}{mask_suffix}.png"
-        cv2.imwrite(str(mask_output_path), mask_img)
-    
-    # 分割模式
-    elif mode == "segmentation":
-        # 使用OpenCV加载图像用于分割和掩码生成
-        img_cv = cv2.imread(str(image_path))
-        height, width, _ = img_cv.shape  # 获取图像尺寸
-
-        # 使用YOLOSEG进行分割检测
-        bboxes, classes, segmentations, scores = ys.detect(img_cv)
+        # 从批量推理的结果中提取边界框、类ID和分割轮廓，不再对图像重复推理
+        bboxes, classes, segmentations, scores = self.seg.parse(result)
 
         # 初始化一个空白掩码用于所有分割
-        mask_img = np.zeros(img_cv.shape[:2], dtype=np.uint8)
-
-        # 使用原始YOLO模型进行初始标注
-        img_pil = Image.open(image_path)
-        results = model.predict(img_pil)
-        # 获取带标注的图像
-        if hasattr(results[0], 'render'):
-            annotated_img = results[0].render()[0]  # 使用'render'（如果可用）
+        mask_img = np.zeros(img.shape[:2], dtype=np.uint8)
+
+        # 使用同一推理结果生成带标注的图像
+        if hasattr(result, 'render'):
+            annotated_img = result.render()[0]  # 使用'render'（如果可用）
         else:
-            annotated_img = results[0].plot()  # 使用'plot'作为回退
+            annotated_img = result.plot()  # 使用'plot'作为回退
         annotated_img = np.array(annotated_img)  # 转换为NumPy数组以便CV2处理
 
-        # 保存分割数据的文本文件
-        txt_output_path = detection_dir / f"{detection_prefix}{image_path.stem}{detection_suffix}.txt"
-        with open(txt_output_path, 'w') as f:
-            # 遍历每个分割结果
-            for bbox, class_id, seg in zip(bboxes, classes, segmentations):
-                # 归一化分割数据
-                seg_normalized = seg / [width, height]
-                # 将归一化数据写入文本文件
-                seg_data = ' '.join([f'{x:.6f},{y:.6f}' for x, y in seg_normalized])
-                f.write(f'{class_id} {seg_data}\n')
-
-                # 在掩码图像上绘制分割区域
-                cv2.fillPoly(mask_img, [np.array(seg, dtype=np.int32)], 255)
-
-                # 在标注图像上绘制边界框和分割掩码
-                x, y, x2, y2 = bbox
-                cv2.rectangle(annotated_img, (x, y), (x2, y2), (0, 0, 255), 2)
-                cv2.polylines(annotated_img, [np.array(seg, dtype=np.int32)], isClosed=True, color=(0, 0, 255), thickness=2)
-
-        # 保存带标注的图像
-        overlay_output_path = overlay_dir / f"{overlay_prefix}{image_path.stem}{overlay_suffix}{image_path.suffix}"
-        cv2.imwrite(str(overlay_output_path), annotated_img)
-
-        # 保存掩码图像
-        mask_output_path = mask_dir / f"{mask_prefix}{image_path.stem}{mask_suffix}.png"
-        cv2.imwrite(str(mask_output_path), mask_img)
-
-# 处理完成，显示结果统计
-print(f"Processed {len(image_paths)} images. Overlays saved to '{overlay_dir}', Detections saved to '{detection_dir}', and Masks saved to '{mask_dir}'.")
+        # 分割数据文本，每行为类ID和归一化的轮廓坐标
+        seg_lines = []
+        # 遍历每个分割结果
+        for bbox, class_id, seg in zip(bboxes, classes, segmentations):
+            # 归一化分割数据
+            seg_normalized = seg / [width, height]
+            seg_data = ' '.join([f'{x:.6f},{y:.6f}' for x, y in seg_normalized])
+            seg_lines.append(f'{class_id} {seg_data}')
+
+            # 在掩码图像上绘制分割区域
+            cv2.fillPoly(mask_img, [np.array(seg, dtype=np.int32)], 255)
+
+            # 在标注图像上绘制边界框和分割掩码
+            x, y, x2, y2 = bbox
+            cv2.rectangle(annotated_img, (x, y), (x2, y2), (0, 0, 255), 2)
+            cv2.polylines(annotated_img, [np.array(seg, dtype=np.int32)], isClosed=True, color=(0, 0, 255), thickness=2)
+
+        return annotated_img, seg_lines, mask_img
+
+    def load_image(self, image_path):
+        """
+        解码单张图像，推理、绘制和生成掩码都使用这一个数组（在后台线程中执行）
+
+        参数:
+            image_path: 图像文件路径
+
+        返回:
+            BGR格式的NumPy数组，无法读取时为None
+        """
+        with self.timer.measure('decode'):
+            return cv2.imread(str(image_path))
+
+    def iter_batches(self, image_paths):
+        """
+        按批产生已解码的图像，当前批推理时后台线程已在解码下一批
+
+        参数:
+            image_paths: 图像路径列表
+
+        返回:
+            生成器，每次产生 (图像路径列表, 图像列表)，无法读取的图像已被跳过
+        """
+        batches = [image_paths[i:i + self.batch_size] for i in range(0, len(image_paths), self.batch_size)]
+        if not batches:
+            return
+        with ThreadPoolExecutor(max_workers=self.loader_workers) as executor:
+            pending = executor.map(self.load_image, batches[0])
+            for i, batch in enumerate(batches):
+                images = list(pending)  # 等待当前批解码完成
+                if i + 1 < len(batches):
+                    pending = executor.map(self.load_image, batches[i + 1])  # 提前解码下一批
+
+                loaded = [(path, img) for path, img in zip(batch, images) if img is not None]
+                for path, img in zip(batch, images):
+                    if img is None:
+                        print(f"警告: 无法读取图像 {path}，已跳过")
+                        self.unreadable.append(path)
+                if loaded:
+                    yield [path for path, _ in loaded], [img for _, img in loaded]
+
+    def run(self, image_paths, progress=True, reset_timer=True):
+        """
+        对一组图像进行推理并保存全部输出，返回前等待全部文件写完
+
+        参数:
+            image_paths: 图像路径列表
+            progress: 是否显示进度条
+            reset_timer: 是否重新开始统计各阶段耗时，False时累加到之前的统计中
+
+        返回:
+            成功处理的图像数量
+        """
+        image_paths = [Path(path) for path in image_paths]
+        for directory in (self.overlay_dir, self.detection_dir, self.mask_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+
+        if reset_timer:
+            self.timer = StageTimer()
+        self.unreadable = []
+        process = self.process_detection if self.mode == "detection" else self.process_segmentation
+        processed = 0
+        with OutputWriter(self.writer_workers, self.max_pending_writes, self.timer) as writer, \
+                tqdm(total=len(image_paths), desc='Processing Images', disable=not progress) as bar:
+            for batch_paths, images in self.iter_batches(image_paths):
+                # 整批送入模型推理
+                results = self.predict(images)
+
+                # 将推理结果拆分到每张图像，输出文件交给写入器保存
+                for image_path, img, result in zip(batch_paths, images, results):
+                    process(image_path, img, result, writer)
+                processed += len(batch_paths)
+                # 无法读取而跳过的图像也计入进度
+                bar.update(processed + len(self.unreadable) - bar.n)
+            bar.update(processed + len(self.unreadable) - bar.n)  # 最后几批全部无法读取时
+        # 退出with时写入器已等待全部文件写完
+        self.max_write_depth = writer.max_depth
+        return processed
+
+
+# 已处理图像记录
+class ProcessedState:
+    """
+    记录已处理的图像，监视模式重启后跳过这些图像
+
+    记录文件每行为 "文件大小 修改时间(ns) 文件名"，只追加写入；
+    同名文件被替换（大小或修改时间变化）后会被重新处理。
+    """
+    def __init__(self, state_path):
+        """
+        加载已有记录
+
+        参数:
+            state_path: 记录文件路径
+        """
+        self.state_path = Path(state_path)
+        self.done = set()
+        if self.state_path.exists():
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.rstrip('\n').split(' ', 2)
+                    if len(parts) == 3:
+                        self.done.add((parts[2], int(parts[0]), int(parts[1])))
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add(self, keys):
+        """
+        追加一批已处理的图像
+
+        参数:
+            keys: (文件名, 文件大小, 修改时间) 列表
+        """
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_path, 'a', encoding='utf-8') as f:
+            for name, size, mtime_ns in keys:
+                f.write(f"{size} {mtime_ns} {name}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(keys)
+
+# 扫描输入目录的函数
+def scan_images(input_dir):
+    """
+    使用os.scandir列出目录中的图像及其大小和修改时间
+
+    参数:
+        input_dir: 输入图像目录
+
+    返回:
+        {文件名: (路径, 文件大小, 修改时间)}
+    """
+    suffixes = tuple(extension[1:] for extension in image_extensions)  # '*.jpg' -> '.jpg'
+    found = {}
+    with os.scandir(input_dir) as it:
+        for entry in it:
+            if entry.name.lower().endswith(suffixes) and entry.is_file():
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue  # 扫描过程中被删除
+                found[entry.name] = (entry.path, st.st_size, st.st_mtime_ns)
+    return found
+
+# 监视输入目录的函数
+def watch_directory(generator, input_dir, poll_interval=poll_interval, max_pending=max_pending_images):
+    """
+    持续监视输入目录，对新出现的图像进行推理，直到Ctrl+C
+
+    扫描线程每隔poll_interval秒用os.scandir扫描一次目录，连续两次扫描大小和修改时间都不变的
+    新文件才视为写入完成，放入有界队列（队列满时扫描线程等待）；主线程从队列中按批取出图像，
+    使用同一个已加载的模型推理，每批输出写完后记录到已处理文件中并打印结果。
+    某一批推理或写入失败时只打印错误，不记录这批图像，扫描线程会在之后的扫描中重新发现并重试。
+
+    参数:
+        generator: Generator实例
+        input_dir: 输入图像目录
+        poll_interval: 扫描间隔（秒）
+        max_pending: 等待推理的图像队列最大长度
+    """
+    input_dir = Path(input_dir)
+    input_dir.mkdir(parents=True, exist_ok=True)
+    state = ProcessedState(generator.output_dir / processed_state_name)
+    pending = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+    queued = set()  # 已放入队列的文件，失败的批次从中移除以便重新扫描
+    queued_lock = threading.Lock()
+    generator.timer = StageTimer()
+
+    def scanner():
+        """扫描线程：发现写入完成的新图像并放入队列"""
+        previous = {}  # 上一次扫描时尚未稳定的文件
+        while not stop.is_set():
+            try:
+                found = scan_images(input_dir)
+            except OSError as e:
+                print(f"扫描目录时出错 {input_dir}: {e}")
+                found = {}
+            current = {}
+            for name, (path, size, mtime_ns) in sorted(found.items()):
+                key = (name, size, mtime_ns)
+                with queued_lock:
+                    seen = key in state or key in queued
+                if seen:
+                    continue
+                if previous.get(name) != (size, mtime_ns):
+                    current[name] = (size, mtime_ns)  # 文件可能仍在写入，下次扫描再确认
+                    continue
+                while not stop.is_set():
+                    try:
+                        pending.put((Path(path), key), timeout=0.5)
+                        with queued_lock:
+                            queued.add(key)
+                        break
+                    except queue.Full:
+                        continue
+            previous = current
+            stop.wait(poll_interval)
+
+    thread = threading.Thread(target=scanner, daemon=True)
+    thread.start()
+    print(f"👀 正在监视 {input_dir}（{generator.mode} 模式，Ctrl+C 退出）")
+
+    total = 0
+    try:
+        while True:
+            try:
+                batch = [pending.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # 取出队列中已有的图像凑成一批，不等待后续图像
+            while len(batch) < generator.batch_size:
+                try:
+                    batch.append(pending.get_nowait())
+                except queue.Empty:
+                    break
+
+            start = time.perf_counter()
+            try:
+                generator.run([path for path, _ in batch], progress=False, reset_timer=False)
+                state.add([key for _, key in batch])
+            except Exception as e:
+                # 磁盘写满、权限等暂时性错误不应终止监视：这批图像不记录，稍后重新处理
+                print(f"❌ 处理 {len(batch)} 张图像时出错: {e}，稍后重试")
+                with queued_lock:
+                    queued.difference_update(key for _, key in batch)
+                continue
+            total += len(batch)
+            elapsed = (time.perf_counter() - start) * 1000
+            unreadable = set(generator.unreadable)
+            for path, _ in batch:
+                if path in unreadable:
+                    print(f"⚠️ {path.name} 无法读取，已跳过（文件更新后会重新处理）")
+                else:
+                    print(f"✅ {path.name}  ({elapsed / len(batch):.0f}ms/张，待处理 {pending.qsize()})")
+    except KeyboardInterrupt:
+        print("\n停止监视")
+    finally:
+        stop.set()
+        thread.join()
+    print(f"共处理 {total} 张图像")
+    generator.timer.report()
+
+
+# 命令行入口
+def main():
+    """解析命令行参数并处理输入目录中的全部图像，未指定的参数使用脚本顶部的配置"""
+    parser = argparse.ArgumentParser(description='使用YOLOv8模型对目录中的图像进行推理，生成标注图像、检测结果和掩码')
+    parser.add_argument('--input', default=str(input_dir), help='输入图像目录')
+    parser.add_argument('--output', default=str(output_dir), help='输出目录')
+    parser.add_argument('--model', default=model_path, help='模型文件路径')
+    parser.add_argument('--mode', default=mode, choices=['detection', 'segmentation'], help='推理模式')
+    parser.add_argument('--conf', type=float, default=confidence_threshold, help='置信度阈值')
+    parser.add_argument('--batch-size', type=int, default=batch_size, help='每次送入模型的图像数量')
+    parser.add_argument('--watch', action='store_true', help='持续监视输入目录并处理新图像')
+    parser.add_argument('--poll-interval', type=float, default=poll_interval, help='监视模式下扫描输入目录的间隔（秒）')
+    args = parser.parse_args()
+
+    if args.watch:
+        generator = Generator(model_path=args.model, mode=args.mode, output_dir=args.output,
+                              confidence_threshold=args.conf, batch_size=args.batch_size)
+        watch_directory(generator, args.input, poll_interval=args.poll_interval)
+        return
+
+    Path(args.input).mkdir(parents=True, exist_ok=True)  # 如果输入目录不存在则创建
+    image_paths = collect_images(args.input)
+
+    generator = Generator(model_path=args.model, mode=args.mode, output_dir=args.output,
+                          confidence_threshold=args.conf, batch_size=args.batch_size)
+
+    # 处理图像，显示进度条
+    print(f"Generating outputs in {generator.mode} mode.")
+    processed = generator.run(image_paths)
+
+    # 处理完成，显示结果统计
+    print(f"Processed {processed} images. Overlays saved to '{generator.overlay_dir}', Detections saved to '{generator.detection_dir}', and Masks saved to '{generator.mask_dir}'.")
+    generator.timer.report()
+    print(f"写入队列最大深度: {generator.max_write_depth}/{generator.max_pending_writes}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+感知哈希近重复图像检测模块
+
+MD5只能发现字节完全相同的图像，重新编码、缩放或轻微裁剪后的图像会被当作不同图像，
+这类图像同时出现在train和valid中会让验证指标虚高。本模块：
+1. 在进程池中并行计算每张图像的64位pHash（DCT）和dHash（梯度），
+   JPEG通过PIL的draft模式在解码阶段直接缩小，不需要完整解码大图
+2. 使用多索引哈希（multi-index hashing）查找汉明距离不超过阈值t的图像对：
+   把64位哈希切成4段16位，根据抽屉原理，距离不超过t的两个哈希至少有一段的距离不超过t//4，
+   因此每段只需在排序后的分段值中查找与其距离不超过t//4的桶，避免O(n²)的两两比较
+3. 候选对再用dHash距离确认，最后用并查集合并为近重复簇
+
+使用方法：
+    from image_hash import hash_images, find_near_duplicates
+    hashes, failed = hash_images(image_paths)
+    clusters = find_near_duplicates(hashes)
+"""
+import os
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# 支持的图像扩展名（与train.py保持一致）
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# pHash计算使用的缩放尺寸和保留的低频系数尺寸
+PHASH_SIZE = 32
+PHASH_LOW_FREQ = 8
+
+# 默认的pHash / dHash汉明距离阈值
+MAX_DISTANCE = 6
+MAX_DHASH_DISTANCE = 12
+
+# 图像少于该数量时串行计算，避免进程池启动开销
+PARALLEL_THRESHOLD = 64
+
+# 每个进程池任务包含的图像数量
+CHUNK_SIZE = 64
+
+# 多索引哈希的分段数量（每段16位）
+SEGMENTS = 4
+
+# 一次展开比较的最大候选对数量，限制内存占用
+BLOCK_PAIRS = 1 << 22
+
+# SWAR popcount使用的掩码常量
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _dct_matrix(n):
+    """返回n点DCT-II变换矩阵"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
+
+def _bits_to_int(bits):
+    """把64个布尔值打包为一个Python整数"""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def compute_hashes(image_path):
+    """
+    计算单张图像的pHash和dHash
+
+    参数:
+        image_path: 图像文件路径
+
+    返回:
+        (phash, dhash, width, height): 两个64位整数哈希和图像原始尺寸
+    """
+    with Image.open(image_path) as img:
+        width, height = img.size
+        # JPEG在解码阶段直接缩小到不小于目标尺寸的1/2、1/4或1/8，大幅减少解码开销
+        img.draft('L', (PHASH_SIZE, PHASH_SIZE))
+        gray = img.convert('L')
+
+    pixels = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR), dtype=np.float64)
+    dct = _DCT @ pixels @ _DCT.T
+    low = dct[:PHASH_LOW_FREQ, :PHASH_LOW_FREQ].ravel()
+    # 直流分量不参与中位数计算
+    phash = _bits_to_int(low > np.median(low[1:]))
+
+    small = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    dhash = _bits_to_int(small[:, 1:] > small[:, :-1])
+    return phash, dhash, width, height
+
+
+def _hash_chunk(image_paths):
+    """进程池任务：计算一组图像的哈希，返回 (路径, 哈希结果, 错误信息) 列表"""
+    results = []
+    for path in image_paths:
+        try:
+            results.append((path, compute_hashes(path), None))
+        except Exception as e:
+            results.append((path, None, str(e)))
+    return results
+
+
+def hash_images(image_paths, workers=None):
+    """
+    并行计算一组图像的感知哈希
+
+    参数:
+        image_paths: 图像路径列表
+        workers: 进程池大小，None表示使用全部CPU核心，1表示串行
+
+    返回:
+        hashes: {图像路径: (pHash, dHash, 宽, 高)}
+        failed: {图像路径: 错误信息}，无法读取的图像
+    """
+    chunks = [image_paths[i:i + CHUNK_SIZE] for i in range(0, len(image_paths), CHUNK_SIZE)]
+    hashes = {}
+    failed = {}
+    executor = None
+    try:
+        if len(image_paths) < PARALLEL_THRESHOLD or workers == 1:
+            results = map(_hash_chunk, chunks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(_hash_chunk, chunks)
+
+        for chunk in results:
+            for path, result, error in chunk:
+                if error is None:
+                    hashes[path] = result
+                else:
+                    failed[path] = error
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return hashes, failed
+
+
+def hamming_distance(a, b):
+    """
+    计算两组uint64哈希逐元素的汉明距离
+
+    参数:
+        a, b: 形状可广播的uint64数组
+
+    返回:
+        int32汉明距离数组
+    """
+    # 并行位计数（SWAR），全部为uint64向量运算，比按字节查表快
+    x = np.bitwise_xor(a, b)
+    x -= (x >> np.uint64(1)) & _M1
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return ((x * _H01) >> np.uint64(56)).astype(np.int32)
+
+
+def _probe_masks(width, radius):
+    """返回与分段值汉明距离不超过radius的全部异或掩码（含0）"""
+    masks = [0]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(width), r):
+            masks.append(sum(1 << bit for bit in bits))
+    return masks
+
+
+def candidate_pairs(phashes, max_distance=MAX_DISTANCE):
+    """
+    使用多索引哈希查找pHash汉明距离不超过阈值的图像对
+
+    参数:
+        phashes: uint64数组
+        max_distance: 汉明距离阈值
+
+    返回:
+        pairs: (N, 3) int64数组，每行为 (索引i, 索引j, 距离)，i < j，且不重复
+    """
+    n = len(phashes)
+    width = 64 // SEGMENTS
+    radius = max_distance // SEGMENTS
+    segment_mask = np.uint64((1 << width) - 1)
+    query_ids = np.arange(n)
+
+    found = []
+    for segment in range(SEGMENTS):
+        keys = (phashes >> np.uint64(segment * width)) & segment_mask
+        order = np.argsort(keys, kind='stable')
+        # 每个分段值在排序结果中的起始位置，探测时直接查表
+        starts = np.searchsorted(keys[order], np.arange((1 << width) + 1, dtype=np.uint64))
+        for mask in _probe_masks(width, radius):
+            probes = (keys ^ np.uint64(mask)).astype(np.intp)
+            lo = starts[probes]
+            counts = starts[probes + 1] - lo
+            ends = np.cumsum(counts)
+            # 按候选数量分块，避免大桶（如大量纯色图像）一次展开过多候选对
+            splits = np.searchsorted(ends, np.arange(BLOCK_PAIRS, ends[-1], BLOCK_PAIRS))
+            for q in np.split(query_ids, splits):
+                c = counts[q]
+                total = int(c.sum())
+                if total == 0:
+                    continue
+                i = np.repeat(q, c)
+                offsets = np.arange(total) - np.repeat(np.cumsum(c) - c, c)
+                j = order[np.repeat(lo[q], c) + offsets]
+                keep = i < j
+                i, j = i[keep], j[keep]
+                dist = hamming_distance(phashes[i], phashes[j])
+                keep = dist <= max_distance
+                found.append(np.stack([i[keep], j[keep], dist[keep]], axis=1))
+
+    if not found:
+        return np.empty((0, 3), dtype=np.int64)
+    # 同一对图像可能在多个分段、多个探测值中被找到，去重
+    return np.unique(np.concatenate(found).astype(np.int64), axis=0)
+
+
+def _find(parent, i):
+    """并查集查找（路径压缩）"""
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(hashes, max_distance=MAX_DISTANCE, max_dhash_distance=MAX_DHASH_DISTANCE):
+    """
+    查找近重复图像簇
+
+    参数:
+        hashes: {图像路径: (pHash, dHash, ...)}，hash_images的返回值
+        max_distance: pHash汉明距离阈值（0表示只找感知上完全相同的图像）
+        max_dhash_distance: dHash汉明距离阈值，用于确认候选对，None表示不确认
+
+    返回:
+        clusters: 近重复簇列表，每个簇为 [(图像路径, 与簇内首张图像的pHash距离), ...]，
+                  按簇大小降序排列
+    """
+    paths = sorted(hashes)
+    if len(paths) < 2:
+        return []
+    phashes = np.array([hashes[p][0] for p in paths], dtype=np.uint64)
+    dhashes = np.array([hashes[p][1] for p in paths], dtype=np.uint64)
+
+    pairs = candidate_pairs(phashes, max_distance)
+    if max_dhash_distance is not None and len(pairs):
+        pairs = pairs[hamming_distance(dhashes[pairs[:, 0]], dhashes[pairs[:, 1]]) <= max_dhash_distance]
+
+    parent = list(range(len(paths)))
+    for i, j, _ in pairs.tolist():
+        ri, rj = _find(parent, i), _find(parent, j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    members = {}
+    for i in np.unique(pairs[:, :2]).tolist():
+        members.setdefault(_find(parent, i), []).append(i)
+
+    clusters = []
+    for root, indices in members.items():
+        dist = hamming_distance(phashes[indices], phashes[root])
+        clusters.append([(paths[i], int(d)) for i, d in zip(indices, dist)])
+    clusters.sort(key=lambda c: (-len(c), c[0][0]))
+    return clusters
+
+
+def list_images(img_dir):
+    """
+    使用os.scandir列出目录下的图像文件
+
+    参数:
+        img_dir: 图像目录
+
+    返回:
+        图像路径列表（已排序），目录不存在时返回空列表
+    """
+    if not os.path.isdir(img_dir):
+        return []
+    with os.scandir(img_dir) as it:
+        return sorted(entry.path for entry in it
+                      if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file())
@@ -0,0 +1,130 @@
+"""
+推理服务压力测试客户端
+
+使用多个并发的keep-alive连接向inference_server.py发送同一张图像，统计吞吐量和客户端侧的延迟分位数，
+最后打印服务端 /stats 返回的统计信息（队列深度、平均批大小、服务端p50/p99）。
+
+使用方法：
+    python inference_load_test.py --image image.jpg --concurrency 16 --requests 500
+"""
+# 导入所需库
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+
+# 发送一个HTTP请求并读取响应的函数
+async def http_request(reader, writer, method, path, body=b''):
+    """
+    在已建立的连接上发送一个HTTP/1.1请求
+
+    参数:
+        reader, writer: asyncio连接
+        method: 请求方法
+        path: 请求路径
+        body: 请求体字节
+
+    返回:
+        (状态码, 响应体字节)
+    """
+    head = (f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: keep-alive\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('服务端关闭了连接')
+    status = int(status_line.split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value.strip())
+    return status, await reader.readexactly(length)
+
+# 单个并发连接的工作函数
+async def worker(host, port, data, counter, total, latencies, failures):
+    """
+    持续发送请求，直到总请求数达到total
+
+    参数:
+        host, port: 服务地址
+        data: 图像字节
+        counter: 共享的已发送请求计数（长度为1的列表）
+        total: 总请求数
+        latencies: 收集延迟（秒）的列表
+        failures: 收集失败状态码的列表
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < total:
+            counter[0] += 1
+            start = time.perf_counter()
+            status, _ = await http_request(reader, writer, 'POST', '/detect', data)
+            if status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures.append(status)
+    finally:
+        writer.close()
+
+# 压力测试主流程
+async def run_load_test(host, port, data, concurrency, total):
+    """
+    运行压力测试并打印结果
+
+    参数:
+        host, port: 服务地址
+        data: 图像字节
+        concurrency: 并发连接数
+        total: 总请求数
+    """
+    counter = [0]
+    latencies = []
+    failures = []
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(host, port, data, counter, total, latencies, failures)
+                           for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1000
+    print(f"📊 完成 {len(latencies)} 个请求，失败 {len(failures)} 个，用时 {elapsed:.2f}s，"
+          f"吞吐量 {len(latencies) / elapsed:.1f} 请求/秒")
+    if len(ms):
+        print(f"客户端延迟: p50 {np.percentile(ms, 50):.1f}ms  p90 {np.percentile(ms, 90):.1f}ms  "
+              f"p99 {np.percentile(ms, 99):.1f}ms  最大 {ms.max():.1f}ms")
+
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await http_request(reader, writer, 'GET', '/stats')
+    finally:
+        writer.close()
+    print("服务端统计:")
+    print(json.dumps(json.loads(body), ensure_ascii=False, indent=2))
+
+
+# 命令行入口
+def main():
+    """解析命令行参数并运行压力测试"""
+    parser = argparse.ArgumentParser(description='inference_server.py压力测试客户端')
+    parser.add_argument('--image', required=True, help='发送的图像文件')
+    parser.add_argument('--host', default='127.0.0.1', help='服务地址')
+    parser.add_argument('--port', type=int, default=8000, help='服务端口')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发连接数')
+    parser.add_argument('--requests', type=int, default=200, help='总请求数')
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as f:
+        data = f.read()
+    asyncio.run(run_load_test(args.host, args.port, data, args.concurrency, args.requests))
+
+
+if __name__ == '__main__':
+    main()
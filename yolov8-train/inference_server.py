@@ -0,0 +1,353 @@
+"""
+YOLOv8本地HTTP推理服务
+
+img_detect.py、video_detect.py、generate.py每次运行都要从磁盘加载模型，处理一个输入后退出。
+本服务常驻内存，模型只加载一次（使用generate.py中的Generator），通过HTTP接收图像并返回检测结果：
+1. 基于asyncio，只依赖标准库和generate.py的依赖，默认只监听127.0.0.1
+2. 动态微批处理：并发到达的请求在延迟预算（--max-wait-ms）内合并为一批送入模型，
+   批大小达到--batch-size时立即推理
+3. 图像解码和模型推理在线程中执行，不阻塞事件循环
+4. 统计队列深度、批大小以及请求延迟的p50/p99
+
+接口：
+    POST /detect   请求体为图像文件的字节（jpg/png等），
+                   返回text/plain，每行一个检测结果 "cls_name conf x1 y1 x2 y2"，与generate.py写入的格式相同
+    GET  /stats    返回JSON格式的统计信息
+
+使用方法：
+    python inference_server.py --model ./models/best.pt --port 8000
+    curl --data-binary @image.jpg http://127.0.0.1:8000/detect
+    python inference_load_test.py --image image.jpg --concurrency 16 --requests 500
+"""
+# 导入所需库
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import time
+
+import cv2
+import numpy as np
+
+from generate import Generator, model_path, confidence_threshold
+
+# 服务配置
+host = '127.0.0.1'        # 监听地址，默认只允许本机访问
+port = 8000               # 监听端口
+batch_size = 8            # 每批最多合并的请求数
+max_wait_ms = 10          # 第一个请求到达后最多等待多少毫秒凑批
+max_body_size = 50 << 20  # 请求体最大字节数
+latency_window = 10000    # 统计延迟分位数时保留的最近请求数
+
+# HTTP状态码对应的说明文字
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               411: 'Length Required', 413: 'Payload Too Large', 431: 'Request Header Fields Too Large',
+               500: 'Internal Server Error'}
+
+
+# 推理服务
+class InferenceServer:
+    """
+    常驻内存的推理服务，负责微批处理和统计
+    """
+    def __init__(self, generator, batch_size=batch_size, max_wait_ms=max_wait_ms):
+        """
+        初始化推理服务
+
+        参数:
+            generator: Generator实例，提供模型和检测结果格式化
+            batch_size: 每批最多合并的请求数
+            max_wait_ms: 凑批的最长等待时间（毫秒）
+        """
+        self.generator = generator
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        # 模型不是线程安全的，推理固定在一个线程中执行
+        self.infer_executor = ThreadPoolExecutor(max_workers=1)
+        self.decode_executor = ThreadPoolExecutor(max_workers=4)
+
+        # 统计信息
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_images = 0
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=latency_window)  # 最近请求的端到端延迟（秒）
+        self.infer_times = deque(maxlen=latency_window)  # 最近批次的推理耗时（秒）
+
+    async def detect(self, data):
+        """
+        解码图像并等待所在批次的推理结果
+
+        参数:
+            data: 图像文件的字节
+
+        返回:
+            检测结果字符串列表，图像无法解码时为None
+        """
+        loop = asyncio.get_running_loop()
+        img = await loop.run_in_executor(self.decode_executor, decode_image, data)
+        if img is None:
+            return None
+        future = loop.create_future()
+        await self.queue.put((img, future))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        return await future
+
+    async def batcher(self):
+        """后台任务：从队列中收集请求组成批次，在推理线程中推理后把结果分发给各个请求"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            # 在延迟预算内继续收集请求，达到批大小时立即推理
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            images = [img for img, _ in batch]
+            start = time.perf_counter()
+            try:
+                lines = await loop.run_in_executor(self.infer_executor, self._infer, images)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.infer_times.append(time.perf_counter() - start)
+            self.batches += 1
+            self.batched_images += len(batch)
+            for (_, future), result_lines in zip(batch, lines):
+                if not future.done():  # 客户端可能已断开
+                    future.set_result(result_lines)
+
+    def _infer(self, images):
+        """在推理线程中执行：整批推理并格式化检测结果"""
+        results = self.generator.predict(images)
+        return [self.generator.detection_lines(result) for result in results]
+
+    def stats(self):
+        """
+        返回统计信息
+
+        返回:
+            统计信息字典，延迟单位为毫秒
+        """
+        latencies = np.array(self.latencies) * 1000
+        infer_times = np.array(self.infer_times) * 1000
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': self.requests,
+            'errors': self.errors,
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'max_queue_depth': self.max_queue_depth,
+            'batches': self.batches,
+            'avg_batch_size': round(self.batched_images / self.batches, 2) if self.batches else 0,
+            'latency_p50_ms': round(float(np.percentile(latencies, 50)), 1) if len(latencies) else None,
+            'latency_p99_ms': round(float(np.percentile(latencies, 99)), 1) if len(latencies) else None,
+            'infer_p50_ms': round(float(np.percentile(infer_times, 50)), 1) if len(infer_times) else None,
+        }
+
+    async def handle_connection(self, reader, writer):
+        """处理一个HTTP连接，支持keep-alive"""
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                start = time.perf_counter()
+                status, content_type, payload = await self.route(method, path, body)
+                if path == '/detect':
+                    self.requests += 1
+                    if status == 200:
+                        self.latencies.append(time.perf_counter() - start)
+                    else:
+                        self.errors += 1
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await send_response(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            await send_response(writer, e.status, 'text/plain; charset=utf-8', f"{e}\n".encode('utf-8'), False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def route(self, method, path, body):
+        """
+        根据请求路径分发请求
+
+        返回:
+            (状态码, Content-Type, 响应体字节)
+        """
+        path = path.split('?', 1)[0]
+        if path == '/detect':
+            if method != 'POST':
+                return 405, 'text/plain; charset=utf-8', b'use POST\n'
+            try:
+                lines = await self.detect(body)
+            except Exception as e:
+                print(f"推理出错: {e}")
+                return 500, 'text/plain; charset=utf-8', f"{e}\n".encode('utf-8')
+            if lines is None:
+                return 400, 'text/plain; charset=utf-8', 'invalid image\n'.encode('utf-8')
+            return 200, 'text/plain; charset=utf-8', ''.join(f"{line}\n" for line in lines).encode('utf-8')
+        if path == '/stats':
+            return 200, 'application/json', json.dumps(self.stats()).encode('utf-8')
+        return 404, 'text/plain; charset=utf-8', b'not found\n'
+
+    async def serve(self, host=host, port=port):
+        """启动服务并一直运行"""
+        self.queue = asyncio.Queue()
+        batcher = asyncio.create_task(self.batcher())
+
+        # 预热：加载模型并完成第一次推理，避免第一个请求承担加载时间
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.infer_executor, self._infer, [np.zeros((640, 640, 3), dtype=np.uint8)])
+
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🚀 推理服务已启动: http://{host}:{port}（POST /detect, GET /stats）")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+# HTTP请求错误
+class HTTPError(Exception):
+    """无法继续处理的HTTP请求错误，返回状态码后关闭连接"""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# 解码图像的函数（在线程中执行）
+def decode_image(data):
+    """
+    把图像文件字节解码为BGR数组
+
+    参数:
+        data: 图像文件的字节
+
+    返回:
+        BGR格式的NumPy数组，无法解码时为None
+    """
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+# 读取一行请求头的函数
+async def read_line(reader):
+    """
+    读取一行，超过StreamReader缓冲区上限（默认64KB）的请求行/请求头返回431
+
+    参数:
+        reader: asyncio.StreamReader
+
+    返回:
+        行字节（含换行符），连接已关闭时为b''
+    """
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HTTPError(431, 'request line or header too long')
+
+# 读取一个HTTP请求的函数
+async def read_request(reader):
+    """
+    读取一个HTTP/1.1请求
+
+    参数:
+        reader: asyncio.StreamReader
+
+    返回:
+        (方法, 路径, 请求头字典, 请求体字节)，连接已关闭时返回None
+    """
+    request_line = await read_line(reader)
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HTTPError(400, 'malformed request line')
+    method, path, _ = parts
+
+    headers = {}
+    while True:
+        line = await read_line(reader)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    if method == 'POST':
+        if 'content-length' not in headers:
+            raise HTTPError(411, 'Content-Length required')
+        # 只接受十进制非负整数，其他写法（负数、空值、非数字）直接返回400
+        value = headers['content-length']
+        if not (value.isascii() and value.isdigit()):
+            raise HTTPError(400, 'invalid Content-Length')
+        length = int(value)
+        if length > max_body_size:
+            raise HTTPError(413, 'request body too large')
+        body = await reader.readexactly(length)
+    return method, path, headers, body
+
+# 发送HTTP响应的函数
+async def send_response(writer, status, content_type, payload, keep_alive):
+    """
+    发送HTTP/1.1响应
+
+    参数:
+        writer: asyncio.StreamWriter
+        status: 状态码
+        content_type: Content-Type
+        payload: 响应体字节
+        keep_alive: 是否保持连接
+    """
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + payload)
+    await writer.drain()
+
+
+# 命令行入口
+def main():
+    """解析命令行参数并启动推理服务"""
+    parser = argparse.ArgumentParser(description='YOLOv8本地HTTP推理服务（动态微批处理）')
+    parser.add_argument('--model', default=model_path, help='模型文件路径')
+    parser.add_argument('--host', default=host, help='监听地址')
+    parser.add_argument('--port', type=int, default=port, help='监听端口')
+    parser.add_argument('--conf', type=float, default=confidence_threshold, help='置信度阈值')
+    parser.add_argument('--batch-size', type=int, default=batch_size, help='每批最多合并的请求数')
+    parser.add_argument('--max-wait-ms', type=float, default=max_wait_ms, help='凑批的最长等待时间（毫秒）')
+    args = parser.parse_args()
+
+    generator = Generator(model_path=args.model, mode='detection', confidence_threshold=args.conf)
+    server = InferenceServer(generator, batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+        print(json.dumps(server.stats(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""
+YOLO标签向量化解析模块
+
+将单个标签文件或整个目录的标签文件一次性加载为列式数组，
+并使用NumPy向量化掩码检查列数、类别ID范围和坐标范围，
+供train.py、check_labels.py、fix_dataset.py以及dataset_validator.py共用，
+保证各个检查脚本得到完全一致的结果。
+
+数组格式（每个标注框一行）：
+    LabelTable.file_ids:  int64 (N,)   文件索引
+    LabelTable.class_ids: int64 (N,)   类别ID
+    LabelTable.boxes:     float32 (N, 4) [x_center, y_center, width, height]
+
+使用方法：
+    from label_parser import load_label_dir, class_mask, coord_mask
+    table = load_label_dir('dataset/train/labels')
+    valid = class_mask(table, nc=11) & coord_mask(table)
+"""
+import io
+import os
+from itertools import chain, compress
+
+import numpy as np
+
+# 每行标签的列数：class x_center y_center width height
+LABEL_COLUMNS = 5
+
+# boxes数组的列索引
+COL_X, COL_Y, COL_W, COL_H = range(4)
+
+# 超出int64范围的类别ID截断到边界值，仍按"类别ID超出范围"报告
+_INT64_MIN, _INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+# coord_flags的位标记（在float64精度下计算，避免float32舍入改变边界判断）
+FLAG_COORDS_IN_RANGE = 1  # x, y, w, h 均在 [0, 1] 内
+FLAG_POSITIVE_SIZE = 2    # w > 0 且 h > 0
+
+
+class LabelTable:
+    """
+    标签文件的列式解析结果
+
+    属性:
+        files: 标签文件路径列表，file_ids中的文件索引指向此列表
+        file_ids: int64数组 (N,)，每个标注框所属的文件索引
+        class_ids: int64数组 (N,)，每个标注框的类别ID
+        boxes: float32数组 (N, 4)，每行一个格式正确的标注框的坐标
+        line_numbers: int32数组 (N,)，每个标注框在文件中的行号（从1开始）
+        line_counts: int64数组 (文件数,)，每个文件的总行数
+        coord_flags: uint8数组 (N,)，坐标检查位标记
+        bad_lines: 格式错误的行 [(文件索引, 行号, 类型, 行内容)]，
+                   类型为 'format'（列数不为5）或 'value'（数值无法转换）
+        blank_lines: 空白行 [(文件索引, 行号)]
+        empty_files: 内容为空的文件索引列表
+        read_errors: 读取失败的文件 [(文件索引, 错误信息)]
+    """
+
+    def __init__(self, files):
+        self.files = files
+        self.file_ids = np.empty(0, dtype=np.int64)
+        self.class_ids = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.line_numbers = np.empty(0, dtype=np.int32)
+        self.line_counts = np.zeros(len(files), dtype=np.int64)
+        self.coord_flags = np.empty(0, dtype=np.uint8)
+        self.bad_lines = []
+        self.blank_lines = []
+        self.empty_files = []
+        self.read_errors = []
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+# 快速路径使用的行结构：类别ID为整数，坐标为浮点数
+_ROW_DTYPE = np.dtype([('cls', np.int64), ('coords', np.float64, (4,))])
+
+
+def _parse_rows(rows):
+    """
+    将字符串二维数组转换为类别ID(int64)和坐标(float64)
+
+    参数:
+        rows: 形状为 (N, 5) 的字符串数组
+
+    返回:
+        cls_ids: int64数组
+        coords: float64数组 (N, 4)
+        ok: 布尔数组，数值转换失败的行为False
+    """
+    try:
+        return rows[:, 0].astype(np.int64), rows[:, 1:].astype(np.float64), np.ones(len(rows), dtype=bool)
+    except (ValueError, OverflowError):
+        pass
+
+    # 存在无法转换的数值时逐行回退，语义与int()/float()完全一致
+    cls_ids = np.zeros(len(rows), dtype=np.int64)
+    coords = np.zeros((len(rows), 4), dtype=np.float64)
+    ok = np.ones(len(rows), dtype=bool)
+    for i, row in enumerate(rows.tolist()):
+        try:
+            cls_ids[i] = min(max(int(row[0]), _INT64_MIN), _INT64_MAX)
+            coords[i] = [float(v) for v in row[1:]]
+        except (ValueError, OverflowError):
+            ok[i] = False
+    return cls_ids, coords, ok
+
+
+def _fast_parse(texts, total_lines):
+    """
+    快速路径：整个批次交给np.loadtxt的C解析器一次性解析
+
+    np.loadtxt接受的数值写法是int()/float()的子集，因此只要解析成功且没有空白行
+    （行数与原始行数一致），结果就与逐行解析完全相同；否则返回None走通用路径。
+
+    参数:
+        texts: 以换行符结尾的文件内容列表
+        total_lines: 总行数
+
+    返回:
+        (cls_ids, coords) 或 None
+    """
+    try:
+        rows = np.loadtxt(io.StringIO(''.join(texts)), dtype=_ROW_DTYPE, comments=None, ndmin=1)
+    except ValueError:
+        return None
+    if len(rows) != total_lines:
+        return None
+    return rows['cls'], rows['coords']
+
+
+def _generic_parse(texts, line_files, line_numbers, table):
+    """
+    通用路径：逐行切分后向量化检查列数和数值，记录空白行与格式错误行
+
+    参数:
+        texts: 以换行符结尾的文件内容列表
+        line_files / line_numbers: 每一行对应的文件索引和行号
+        table: 用于记录空白行和错误行的LabelTable
+
+    返回:
+        good_idx: 格式正确的行索引
+        cls_ids, coords: 对应的类别ID和坐标
+    """
+    raw_lines = ''.join(texts).split('\n')
+    raw_lines.pop()
+    split_lines = [line.split() for line in raw_lines]
+
+    # 列数检查
+    counts = np.fromiter(map(len, split_lines), dtype=np.int32, count=len(split_lines))
+    blank = counts == 0
+    well_formed = counts == LABEL_COLUMNS
+
+    for i in np.flatnonzero(blank).tolist():
+        table.blank_lines.append((int(line_files[i]), int(line_numbers[i])))
+    for i in np.flatnonzero(~blank & ~well_formed).tolist():
+        table.bad_lines.append((int(line_files[i]), int(line_numbers[i]), 'format', raw_lines[i].strip()))
+
+    # 数值转换
+    good_idx = np.flatnonzero(well_formed)
+    tokens = list(chain.from_iterable(compress(split_lines, well_formed.tolist())))
+    rows = np.array(tokens, dtype=str).reshape(-1, LABEL_COLUMNS)
+    cls_ids, coords, ok = _parse_rows(rows)
+
+    for i in good_idx[~ok].tolist():
+        table.bad_lines.append((int(line_files[i]), int(line_numbers[i]), 'value', raw_lines[i].strip()))
+    table.bad_lines.sort(key=lambda item: (item[0], item[1]))
+
+    return good_idx[ok], cls_ids[ok], coords[ok]
+
+
+def load_label_files(paths, dtype=np.float32):
+    """
+    批量加载标签文件为列式数组
+
+    整个批次先尝试np.loadtxt快速路径；存在空白行或格式错误时回退到通用路径，
+    通用路径中的列数检查、数值转换同样在整个批次上一次性向量化完成。
+
+    参数:
+        paths: 标签文件路径列表
+        dtype: boxes（坐标）数组的数据类型，默认float32
+
+    返回:
+        table: LabelTable对象
+    """
+    files = list(paths)
+    table = LabelTable(files)
+
+    texts = []
+    file_ids = []
+    line_counts = []
+    for file_idx, path in enumerate(files):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except Exception as e:
+            table.read_errors.append((file_idx, str(e)))
+            continue
+
+        if not text:
+            table.empty_files.append(file_idx)
+            continue
+
+        # 与readlines()一致：只按换行符切分，末尾换行不产生额外的行
+        if not text.endswith('\n'):
+            text += '\n'
+        texts.append(text)
+        file_ids.append(file_idx)
+        line_counts.append(text.count('\n'))
+
+    if not texts:
+        return table
+
+    # 每一行对应的文件索引和行号
+    line_counts = np.asarray(line_counts, dtype=np.int64)
+    table.line_counts[file_ids] = line_counts
+    total_lines = int(line_counts.sum())
+    line_files = np.repeat(np.asarray(file_ids, dtype=np.int64), line_counts)
+    starts = np.repeat(np.cumsum(line_counts) - line_counts, line_counts)
+    line_numbers = (np.arange(total_lines) - starts + 1).astype(np.int32)
+
+    parsed = _fast_parse(texts, total_lines)
+    if parsed is not None:
+        good_idx = np.arange(total_lines)
+        cls_ids, coords = parsed
+    else:
+        good_idx, cls_ids, coords = _generic_parse(texts, line_files, line_numbers, table)
+
+    # 坐标检查在float64精度下完成
+    flags = np.zeros(len(good_idx), dtype=np.uint8)
+    flags[((coords >= 0) & (coords <= 1)).all(axis=1)] |= FLAG_COORDS_IN_RANGE
+    flags[(coords[:, 2] > 0) & (coords[:, 3] > 0)] |= FLAG_POSITIVE_SIZE
+
+    table.file_ids = line_files[good_idx]
+    table.class_ids = cls_ids
+    table.boxes = coords.astype(dtype)
+    table.line_numbers = line_numbers[good_idx]
+    table.coord_flags = flags
+
+    return table
+
+
+def load_label_file(path, dtype=np.float32):
+    """
+    加载单个标签文件
+
+    参数:
+        path: 标签文件路径
+        dtype: boxes数组的数据类型
+
+    返回:
+        table: LabelTable对象（文件索引均为0）
+    """
+    return load_label_files([path], dtype=dtype)
+
+
+def load_label_dir(lbl_dir, dtype=np.float32):
+    """
+    加载目录下的全部.txt标签文件（按文件名排序）
+
+    参数:
+        lbl_dir: 标签目录
+        dtype: boxes数组的数据类型
+
+    返回:
+        table: LabelTable对象
+    """
+    with os.scandir(lbl_dir) as it:
+        paths = sorted(entry.path for entry in it if entry.name.endswith('.txt') and entry.is_file())
+    return load_label_files(paths, dtype=dtype)
+
+
+def class_mask(table, nc):
+    """
+    类别ID范围掩码
+
+    参数:
+        table: LabelTable对象
+        nc: 类别数量，0或None表示只检查非负
+
+    返回:
+        布尔数组，类别ID有效的标注框为True
+    """
+    cls_ids = table.class_ids
+    mask = cls_ids >= 0
+    if nc:
+        mask &= cls_ids < nc
+    return mask
+
+
+def coord_mask(table, allow_zero_size=True):
+    """
+    坐标范围掩码
+
+    参数:
+        table: LabelTable对象
+        allow_zero_size: 是否允许宽高为0（fix_dataset.py要求宽高严格大于0）
+
+    返回:
+        布尔数组，坐标有效的标注框为True
+    """
+    mask = (table.coord_flags & FLAG_COORDS_IN_RANGE).astype(bool)
+    if not allow_zero_size:
+        mask &= (table.coord_flags & FLAG_POSITIVE_SIZE).astype(bool)
+    return mask
+
+
+def count_classes(table, nc, mask=None):
+    """
+    统计每个类别的标注框数量
+
+    参数:
+        table: LabelTable对象
+        nc: 类别数量
+        mask: 可选的布尔掩码，只统计为True的标注框
+
+    返回:
+        长度为nc的int64数组
+    """
+    valid = class_mask(table, nc)
+    if mask is not None:
+        valid &= mask
+    return np.bincount(table.class_ids[valid], minlength=nc)[:nc]
+
+
+def box_values(table, row):
+    """
+    获取某个标注框的 (类别ID, [x, y, w, h])，坐标保留6位小数便于打印
+
+    参数:
+        table: LabelTable对象
+        row: boxes中的行索引
+
+    返回:
+        cls_id, coords
+    """
+    return int(table.class_ids[row]), [round(float(v), 6) for v in table.boxes[row]]
+
+
+def file_errors(table, nc):
+    """
+    按文件汇总错误信息，消息格式与train.py的validate_dataset一致
+
+    参数:
+        table: LabelTable对象
+        nc: 类别数量（0表示不检查类别上限）
+
+    返回:
+        errors: {文件索引: [错误信息, ...]}，只包含有错误的文件，
+                同一文件内按行号排序
+    """
+    records = []
+    for file_idx in table.empty_files:
+        records.append((file_idx, 0, 0, '标签文件为空'))
+    for file_idx, message in table.read_errors:
+        records.append((file_idx, 0, 0, f'读取错误: {message}'))
+    for file_idx, line_num, kind, line in table.bad_lines:
+        if kind == 'format':
+            records.append((file_idx, line_num, 0, f'第{line_num}行格式错误: {line}'))
+        else:
+            records.append((file_idx, line_num, 0, f'第{line_num}行数值格式错误: {line}'))
+
+    bad_cls = ~class_mask(table, nc)
+    bad_coords = ~coord_mask(table)
+    for row in np.flatnonzero(bad_cls | bad_coords).tolist():
+        file_idx = int(table.file_ids[row])
+        line_num = int(table.line_numbers[row])
+        cls_id, (x, y, w, h) = box_values(table, row)
+        if bad_cls[row]:
+            records.append((file_idx, line_num, 1, f'第{line_num}行类别ID超出范围: {cls_id}'))
+        if bad_coords[row]:
+            records.append((file_idx, line_num, 2, f'第{line_num}行坐标超出范围: {x:.2f},{y:.2f},{w:.2f},{h:.2f}'))
+
+    errors = {}
+    for file_idx, _, _, message in sorted(records, key=lambda item: item[:3]):
+        errors.setdefault(file_idx, []).append(message)
+    return errors
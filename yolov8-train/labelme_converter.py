@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+LabelMe到YOLO格式的并行批量转换模块
+
+train.py原先对train/valid/test中的每个JSON串行调用convert_labelme_to_yolo，
+并且每次启动都会重写全部.txt文件。本模块改为：
+1. 按块把JSON文件分发到进程池中并行转换
+2. 如果.txt比对应的JSON和data.yaml都新，则跳过该文件
+3. 先写临时文件再替换，保证中断时不会留下写了一半的.txt
+4. 返回每个划分的文件数量、转换/跳过/失败数量和耗时
+
+本模块不依赖torch/ultralytics，进程池的工作进程可以快速启动。
+
+使用方法：
+    from labelme_converter import batch_convert
+    stats = batch_convert('dataset', class_mapping)
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from labelme_json import load_labelme
+
+# 默认处理的标注目录
+LABEL_SUBDIRS = ('train/labels', 'valid/labels', 'test/labels')
+
+# 待转换文件少于该数量时串行处理，避免进程池启动开销
+PARALLEL_THRESHOLD = 64
+
+# 每个进程池任务包含的JSON文件数量
+CHUNK_SIZE = 64
+
+
+def convert_labelme_to_yolo(json_file, class_mapping=None):
+    """
+    将单个LabelMe JSON格式的注释转换为YOLO格式的文本文件
+
+    参数:
+        json_file: LabelMe格式的JSON注释文件路径
+        class_mapping: 类别名称到ID的映射字典
+
+    返回:
+        (是否成功, 使用的类别映射)
+    """
+    # 加载LabelMe JSON文件（跳过imageData，转换只需要尺寸和shapes）
+    data = load_labelme(json_file)
+
+    # 提取图像信息
+    image_width = data.get('imageWidth')
+    image_height = data.get('imageHeight')
+
+    if not image_width or not image_height:
+        print(f"警告: {json_file} 中缺少图像尺寸信息，跳过转换")
+        return False, {}
+
+    # 构建输出文件路径（与JSON文件同名，扩展名为.txt）
+    base_name = os.path.splitext(json_file)[0]
+    output_file = f"{base_name}.txt"
+
+    # 如果没有提供类别映射，自动从数据中提取
+    if class_mapping is None:
+        class_mapping = {}
+        for shape in data.get('shapes', []):
+            label = shape['label']
+            if label not in class_mapping:
+                class_mapping[label] = len(class_mapping)
+
+    # 处理每个标注形状
+    lines = []
+    for shape in data.get('shapes', []):
+        label = shape['label']
+        points = shape['points']
+        shape_type = shape.get('shape_type', 'rectangle')
+
+        # 将标签名称转换为小写进行匹配
+        label_lower = label.lower()
+
+        # 获取类别ID
+        if label_lower not in class_mapping:
+            # 如果类别不在映射中，跳过该标注
+            print(f"警告: {json_file} 中包含未在data.yaml中定义的类别 {label}，跳过此标注")
+            continue
+        else:
+            class_id = class_mapping[label_lower]
+
+        # 根据形状类型计算边界框
+        if shape_type in ('rectangle', 'polygon'):
+            # 矩形存储角点、多边形存储顶点，都取所有点的坐标范围作为边界框
+            x_coords = [p[0] for p in points]
+            y_coords = [p[1] for p in points]
+            x1, y1 = min(x_coords), min(y_coords)
+            x2, y2 = max(x_coords), max(y_coords)
+        else:
+            print(f"警告: {json_file} 中包含不支持的形状类型 {shape_type}，跳过此标注")
+            continue
+
+        # 计算YOLO格式的归一化坐标
+        # YOLO格式：[x_center, y_center, width, height]
+        x_center = (x1 + x2) / 2 / image_width
+        y_center = (y1 + y2) / 2 / image_height
+        norm_width = abs(x2 - x1) / image_width
+        norm_height = abs(y2 - y1) / image_height
+
+        lines.append(f"{class_id} {x_center} {y_center} {norm_width} {norm_height}\n")
+
+    # 原子写入：先写临时文件再替换
+    tmp_file = f"{output_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        f.writelines(lines)
+    os.replace(tmp_file, output_file)
+
+    return True, class_mapping
+
+
+def is_up_to_date(json_file, min_mtime_ns=0):
+    """
+    判断JSON对应的.txt是否已是最新
+
+    参数:
+        json_file: JSON文件路径
+        min_mtime_ns: .txt至少要比该时间新（通常为data.yaml的修改时间）
+
+    返回:
+        bool: .txt存在且比JSON和min_mtime_ns都新时返回True
+    """
+    txt_file = f"{os.path.splitext(json_file)[0]}.txt"
+    try:
+        txt_mtime = os.stat(txt_file).st_mtime_ns
+    except OSError:
+        return False
+    return txt_mtime > os.stat(json_file).st_mtime_ns and txt_mtime > min_mtime_ns
+
+
+def _convert_chunk(args):
+    """进程池任务：转换一组JSON文件，返回成功转换的数量"""
+    json_files, class_mapping = args
+    success_count = 0
+    for json_file in json_files:
+        try:
+            result, _ = convert_labelme_to_yolo(json_file, class_mapping)
+        except Exception as e:
+            print(f"警告: 转换 {json_file} 失败: {str(e)}")
+            result = False
+        if result:
+            success_count += 1
+    return success_count
+
+
+def _list_json_files(labels_dir):
+    """使用os.scandir列出目录下的JSON文件"""
+    with os.scandir(labels_dir) as it:
+        return sorted(entry.path for entry in it if entry.name.endswith('.json') and entry.is_file())
+
+
+def batch_convert(dataset_dir, class_mapping, subdirs=LABEL_SUBDIRS, workers=None, force=False, yaml_path=None):
+    """
+    并行批量转换数据集中的LabelMe JSON文件
+
+    参数:
+        dataset_dir: 数据集根目录
+        class_mapping: 类别名称(小写)到ID的映射字典
+        subdirs: 需要处理的标注目录（相对于dataset_dir）
+        workers: 进程池大小，None表示使用全部CPU核心，1表示串行
+        force: 为True时忽略修改时间，全部重新转换
+        yaml_path: data.yaml路径，.txt比它旧时也会重新转换；默认为dataset_dir/data.yaml
+
+    返回:
+        stats: {标注目录: {'exists', 'total', 'converted', 'skipped', 'failed', 'seconds'}}
+    """
+    yaml_path = yaml_path or os.path.join(dataset_dir, 'data.yaml')
+    yaml_mtime_ns = os.stat(yaml_path).st_mtime_ns if os.path.exists(yaml_path) else 0
+
+    stats = {}
+    executor = None
+    try:
+        for subdir in subdirs:
+            labels_dir = os.path.join(dataset_dir, subdir)
+            split_stats = {'exists': os.path.isdir(labels_dir), 'total': 0, 'converted': 0,
+                           'skipped': 0, 'failed': 0, 'seconds': 0.0}
+            stats[subdir] = split_stats
+            if not split_stats['exists']:
+                continue
+
+            start = time.perf_counter()
+            json_files = _list_json_files(labels_dir)
+            if force:
+                pending = json_files
+            else:
+                pending = [f for f in json_files if not is_up_to_date(f, yaml_mtime_ns)]
+
+            chunks = [(pending[i:i + CHUNK_SIZE], class_mapping) for i in range(0, len(pending), CHUNK_SIZE)]
+            if len(pending) < PARALLEL_THRESHOLD or workers == 1:
+                converted = sum(map(_convert_chunk, chunks))
+            else:
+                if executor is None:
+                    executor = ProcessPoolExecutor(max_workers=workers)
+                converted = sum(executor.map(_convert_chunk, chunks))
+
+            split_stats['total'] = len(json_files)
+            split_stats['converted'] = converted
+            split_stats['skipped'] = len(json_files) - len(pending)
+            split_stats['failed'] = len(pending) - converted
+            split_stats['seconds'] = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return stats
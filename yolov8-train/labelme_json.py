@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+LabelMe JSON快速解析模块
+
+LabelMe标注文件中的imageData字段是整张图像的base64编码，往往有数MB，
+而转换为YOLO格式只需要imageWidth、imageHeight和shapes。
+本模块在解析前直接在原始字节上定位imageData的字符串值并跳过它：
+1. 较大的文件通过mmap访问，imageData的内容既不会被读入Python字符串，也不会被JSON解析器处理
+2. 剩余部分优先使用orjson解析（如已安装），否则使用标准库json
+
+使用方法：
+    from labelme_json import load_labelme
+    data = load_labelme('xxx.json')          # data['imageData'] 为 None
+    data = load_labelme('xxx.json', skip_image_data=False)  # 完整解析
+"""
+import re
+import json
+import mmap
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 匹配 "imageData": " 的开头部分（值为字符串时才需要跳过）
+_IMAGE_DATA_RE = re.compile(rb'"imageData"\s*:\s*"')
+
+# 超过该大小的文件使用mmap，避免把整个文件读入内存
+MMAP_THRESHOLD = 1 << 20
+
+
+def loads(raw):
+    """
+    解析JSON字节串，已安装orjson时使用orjson
+
+    参数:
+        raw: JSON字节串
+
+    返回:
+        解析后的Python对象
+    """
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def find_image_data(buf):
+    """
+    在原始字节中定位imageData字符串值的位置
+
+    base64内容不包含引号，因此值的结束位置就是下一个引号。
+
+    参数:
+        buf: bytes或mmap对象
+
+    返回:
+        (值起始位置, 值结束位置)，均不含引号；找不到时返回None
+    """
+    match = _IMAGE_DATA_RE.search(buf)
+    if match is None:
+        return None
+    start = match.end()
+    end = buf.find(b'"', start)
+    if end < 0:
+        return None
+    return start, end
+
+
+def read_without_image_data(path, placeholder=b'null'):
+    """
+    读取LabelMe JSON文件，并把imageData的字符串值替换为placeholder
+
+    参数:
+        path: JSON文件路径
+        placeholder: 替换imageData值（含引号）的JSON字节串
+
+    返回:
+        raw: 替换后的JSON字节串
+        image_data: imageData原始内容的 (起始, 结束) 位置，不存在时为None
+    """
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        if size < MMAP_THRESHOLD:
+            buf = f.read()
+            span = find_image_data(buf)
+            if span is None:
+                return buf, None
+            return buf[:span[0] - 1] + placeholder + buf[span[1] + 1:], span
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            span = find_image_data(mm)
+            if span is None:
+                return mm[:], None
+            # 只拷贝imageData之外的部分
+            return mm[:span[0] - 1] + placeholder + mm[span[1] + 1:], span
+
+
+def load_labelme(path, skip_image_data=True):
+    """
+    加载LabelMe JSON标注文件
+
+    参数:
+        path: JSON文件路径
+        skip_image_data: 为True时跳过imageData（结果中为None），为False时完整解析
+
+    返回:
+        data: 标注字典
+    """
+    if not skip_image_data:
+        with open(path, 'rb') as f:
+            return loads(f.read())
+
+    raw, _ = read_without_image_data(path)
+    return loads(raw)
@@ -30,12 +30,17 @@ import os
 import torch
 5
 
-import json
 import glob
+import numpy as np
 import logging
 from datetime import datetime   
 from ultralytics import YOLO
 
+from dataset_validator import validate_splits
+from dataset_cache import invalidate_stale_caches, resolve_cache_mode
+from labelme_converter import convert_labelme_to_yolo, batch_convert
+from label_parser import load_label_files, class_mask, count_classes, box_values
+
 def detailed_dataset_check(dataset_dir):
     """
     详细检查数据集，验证图像与标签的对应关系和标签内容
@@ -82,52 +87,60 @@ def detailed_dataset_check(dataset_dir):
         # 统计每个类别的样本数量
         class_counts = {i: 0 for i in range(expected_nc)}
         
-        # 检查每个标签文件
-        for lbl_path in label_files[:10]:  # 只检查前10个文件
-            try:
-                with open(lbl_path, 'r') as f:
-                    lines = f.readlines()
+        # 检查每个标签文件（只检查前10个文件，一次性向量化解析）
+        sample_files = label_files[:10]
+        table = load_label_files(sample_files)
+        valid_cls = class_mask(table, expected_nc)
+        box_files = table.file_ids
+        read_errors = dict(table.read_errors)
+        files_with_image = []
+        
+        for file_idx, lbl_path in enumerate(sample_files):
+            base_name = os.path.splitext(os.path.basename(lbl_path))[0]
+            if file_idx in read_errors:
+                print(f'\n❌ 文件 {os.path.basename(lbl_path)}: 读取错误 - {read_errors[file_idx]}')
+                continue
+            
+            img_path = None
+            
+            # 查找对应的图像文件
+            for ext in ['.jpg', '.jpeg', '.png', '.bmp']:
+                potential_img = os.path.join(img_dir, f'{base_name}{ext}')
+                if os.path.exists(potential_img):
+                    img_path = potential_img
+                    break
+            
+            if img_path:
+                files_with_image.append(file_idx)
+                print(f'\n文件 {base_name}:')
+                print(f'  ✅ 图像文件存在')
+                print(f'  标签行数: {table.line_counts[file_idx]}')
                 
-                base_name = os.path.splitext(os.path.basename(lbl_path))[0]
-                img_path = None
+                # 检查标签内容，只显示前5行
+                messages = []
+                for bad_file, line_num, kind, line in table.bad_lines:
+                    if bad_file == file_idx and line_num <= 5:
+                        error_name = '格式错误' if kind == 'format' else '数值格式错误'
+                        messages.append((line_num, f'    ❌ 第{line_num}行{error_name}: {line}'))
                 
-                # 查找对应的图像文件
-                for ext in ['.jpg', '.jpeg', '.png', '.bmp']:
-                    potential_img = os.path.join(img_dir, f'{base_name}{ext}')
-                    if os.path.exists(potential_img):
-                        img_path = potential_img
-                        break
+                for row in np.flatnonzero((box_files == file_idx) & (table.line_numbers <= 5)).tolist():
+                    line_num = int(table.line_numbers[row])
+                    cls_id, (x, y, w, h) = box_values(table, row)
+                    # 检查类别ID是否在范围内
+                    if valid_cls[row]:
+                        messages.append((line_num, f'    ✅ 第{line_num}行: 类别 {cls_id} ({expected_classes[cls_id]}), 坐标 {x:.2f},{y:.2f},{w:.2f},{h:.2f}'))
+                    else:
+                        messages.append((line_num, f'    ❌ 第{line_num}行: 类别ID {cls_id} 超出范围 (0-{expected_nc-1})'))
                 
-                if img_path:
-                    print(f'\n文件 {base_name}:')
-                    print(f'  ✅ 图像文件存在')
-                    print(f'  标签行数: {len(lines)}')
-                    
-                    # 检查标签内容
-                    for line_num, line in enumerate(lines[:5], 1):  # 只显示前5行
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        parts = line.split()
-                        if len(parts) != 5:
-                            print(f'    ❌ 第{line_num}行格式错误: {line}')
-                            continue
-                        
-                        cls_id = int(parts[0])
-                        x, y, w, h = map(float, parts[1:5])
-                        
-                        # 检查类别ID是否在范围内
-                        if 0 <= cls_id < expected_nc:
-                            print(f'    ✅ 第{line_num}行: 类别 {cls_id} ({expected_classes[cls_id]}), 坐标 {x:.2f},{y:.2f},{w:.2f},{h:.2f}')
-                            class_counts[cls_id] += 1
-                        else:
-                            print(f'    ❌ 第{line_num}行: 类别ID {cls_id} 超出范围 (0-{expected_nc-1})')
-                else:
-                    print(f'\n❌ 文件 {base_name}: 缺少对应的图像文件')
-                    
-            except Exception as e:
-                print(f'\n❌ 文件 {os.path.basename(lbl_path)}: 读取错误 - {str(e)}')
+                for _, message in sorted(messages):
+                    print(message)
+            else:
+                print(f'\n❌ 文件 {base_name}: 缺少对应的图像文件')
+        
+        # 统计每个类别的样本数量（与原逻辑一致，只统计存在图像的文件的前5行）
+        counted = (table.line_numbers <= 5) & np.isin(box_files, files_with_image)
+        for cls_id, count in enumerate(count_classes(table, expected_nc, counted).tolist()):
+            class_counts[cls_id] += count
         
         # 输出类别统计
         print(f'\n类别统计 (仅前10个文件):')
@@ -147,7 +160,6 @@ def validate_dataset(dataset_dir):
     返回:
         bool: 如果数据集验证通过返回True，否则返回False
     """
-    import glob
     import yaml
     
     print('\n=== 数据集验证 ===')
@@ -170,107 +182,47 @@ def validate_dataset(dataset_dir):
     
     expected_nc = data.get('nc', 0)
     
+    # 一次性扫描train和valid集，标签内容在进程池中检查，未变化的文件直接复用清单结果
+    reports = validate_splits(dataset_dir, expected_nc, splits=('train', 'valid'))
+    
     # 检查train和valid集
-    for split in ['train', 'valid']:
+    for split, report in reports.items():
         print(f'\n--- {split} 集 ---')
         
-        # 定义路径
-        img_dir = os.path.join(dataset_dir, split, 'images')
-        lbl_dir = os.path.join(dataset_dir, split, 'labels')
-        
         # 检查目录是否存在
-        if not os.path.exists(img_dir):
+        if not report['img_dir_exists']:
             print(f'❌ 错误: 找不到{split}/images目录')
             print(f'   解决方案: 创建{dataset_dir}/{split}/images目录并放入图像文件')
             has_error = True
             continue
         
-        if not os.path.exists(lbl_dir):
+        if not report['lbl_dir_exists']:
             print(f'❌ 错误: 找不到{split}/labels目录')
             print(f'   解决方案: 创建{dataset_dir}/{split}/labels目录并放入标签文件')
             has_error = True
             continue
         
-        # 获取所有图像文件
-        image_files = glob.glob(os.path.join(img_dir, '*.*'))
-        image_files = [f for f in image_files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))]
-        print(f'图像文件数量: {len(image_files)}')
+        print(f"图像文件数量: {report['image_count']}")
+        print(f"标签文件数量: {report['label_count']}")
         
-        # 获取所有标签文件
-        label_files = glob.glob(os.path.join(lbl_dir, '*.txt'))
-        print(f'标签文件数量: {len(label_files)}')
-        
-        # 获取所有JSON文件
-        json_files = glob.glob(os.path.join(lbl_dir, '*.json'))
-        if json_files:
-            print(f'发现{len(json_files)}个LabelMe JSON文件，将在训练前自动转换')
+        if report['json_count']:
+            print(f"发现{report['json_count']}个LabelMe JSON文件，将在训练前自动转换")
         
         # 检查数据集是否为空
-        total_files = len(image_files) + len(label_files) + len(json_files)
-        if split == 'train' and not image_files:
+        if split == 'train' and not report['image_count']:
             print(f'❌ 错误: 训练集为空，没有找到任何图像文件')
             print(f'   解决方案: 将图像文件放入{dataset_dir}/{split}/images目录')
             has_error = True
-        elif split == 'valid' and not image_files:
+        elif split == 'valid' and not report['image_count']:
             print(f'⚠️  警告: 验证集为空，没有找到任何图像文件')
             print(f'   解决方案: 运行 python create_validation_set.py 从训练集分割一部分作为验证集')
             has_error = True
         
-        # 检查每个图像是否有对应的标签文件
-        missing_labels = []
-        invalid_labels = []
+        if report['reused']:
+            print(f"增量验证: 重新检查 {report['checked']} 个标签文件，{report['reused']} 个未变化的文件复用上次结果")
         
-        for img_path in image_files:
-            # 获取图像文件名（不含扩展名）
-            base_name = os.path.splitext(os.path.basename(img_path))[0]
-            # 对应的标签文件路径
-            lbl_path = os.path.join(lbl_dir, f'{base_name}.txt')
-            json_path = os.path.join(lbl_dir, f'{base_name}.json')
-            
-            if not os.path.exists(lbl_path) and not os.path.exists(json_path):
-                missing_labels.append(base_name)
-                continue
-            
-            # 如果存在JSON文件但不存在TXT文件，会在训练前自动转换
-            if not os.path.exists(lbl_path) and os.path.exists(json_path):
-                continue
-            
-            # 检查标签文件内容
-            try:
-                with open(lbl_path, 'r') as f:
-                    lines = f.readlines()
-                
-                if not lines:
-                    invalid_labels.append((base_name, '标签文件为空'))
-                    continue
-                
-                for line_num, line in enumerate(lines, 1):
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # 检查标签格式
-                    parts = line.split()
-                    if len(parts) != 5:
-                        invalid_labels.append((base_name, f'第{line_num}行格式错误: {line}'))
-                        continue
-                    
-                    # 检查类别ID和坐标
-                    try:
-                        cls_id = int(parts[0])
-                        x, y, w, h = map(float, parts[1:5])
-                    except ValueError:
-                        invalid_labels.append((base_name, f'第{line_num}行数值格式错误: {line}'))
-                        continue
-                    
-                    if cls_id < 0 or (expected_nc > 0 and cls_id >= expected_nc):
-                        invalid_labels.append((base_name, f'第{line_num}行类别ID超出范围: {cls_id}'))
-                        
-                    if not (0 <= x <= 1 and 0 <= y <= 1 and 0 <= w <= 1 and 0 <= h <= 1):
-                        invalid_labels.append((base_name, f'第{line_num}行坐标超出范围: {x:.2f},{y:.2f},{w:.2f},{h:.2f}'))
-                        
-            except Exception as e:
-                invalid_labels.append((base_name, f'读取错误: {str(e)}'))
+        missing_labels = report['missing_labels']
+        invalid_labels = report['invalid_labels']
         
         # 输出结果
         if missing_labels:
@@ -294,86 +246,6 @@ def validate_dataset(dataset_dir):
         print('\n=== 验证成功，数据集完整性良好 ===')
         return True
 
-def convert_labelme_to_yolo(json_file, class_mapping=None):
-    """
-    将单个LabelMe JSON格式的注释转换为YOLO格式的文本文件
-    
-    参数:
-        json_file: LabelMe格式的JSON注释文件路径
-        class_mapping: 类别名称到ID的映射字典
-    """
-    # 加载LabelMe JSON文件
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # 提取图像信息
-    image_width = data.get('imageWidth')
-    image_height = data.get('imageHeight')
-    
-    if not image_width or not image_height:
-        print(f"警告: {json_file} 中缺少图像尺寸信息，跳过转换")
-        return False, {}
-    
-    # 构建输出文件路径（与JSON文件同名，扩展名为.txt）
-    base_name = os.path.splitext(json_file)[0]
-    output_file = f"{base_name}.txt"
-    
-    # 如果没有提供类别映射，自动从数据中提取
-    if class_mapping is None:
-        class_mapping = {}
-        for shape in data.get('shapes', []):
-            label = shape['label']
-            if label not in class_mapping:
-                class_mapping[label] = len(class_mapping)
-    
-    # 处理每个标注形状
-    with open(output_file, 'w') as f:
-        for shape in data.get('shapes', []):
-            label = shape['label']
-            points = shape['points']
-            shape_type = shape.get('shape_type', 'rectangle')
-            
-            # 将标签名称转换为小写进行匹配
-            label_lower = label.lower()
-            
-            # 获取类别ID
-            if label_lower not in class_mapping:
-                # 如果类别不在映射中，跳过该标注
-                print(f"警告: {json_file} 中包含未在data.yaml中定义的类别 {label}，跳过此标注")
-                continue
-            else:
-                class_id = class_mapping[label_lower]
-            
-            # 根据形状类型计算边界框
-            if shape_type == 'rectangle':
-                # 矩形：LabelMe存储四个角点，我们需要提取所有点的坐标范围
-                x_coords = [p[0] for p in points]
-                y_coords = [p[1] for p in points]
-                x1, y1 = min(x_coords), min(y_coords)
-                x2, y2 = max(x_coords), max(y_coords)
-            elif shape_type == 'polygon':
-                # 多边形：转换为边界框
-                x_coords = [p[0] for p in points]
-                y_coords = [p[1] for p in points]
-                x1, y1 = min(x_coords), min(y_coords)
-                x2, y2 = max(x_coords), max(y_coords)
-            else:
-                print(f"警告: {json_file} 中包含不支持的形状类型 {shape_type}，跳过此标注")
-                continue
-            
-            # 计算YOLO格式的归一化坐标
-            # YOLO格式：[x_center, y_center, width, height]
-            x_center = (x1 + x2) / 2 / image_width
-            y_center = (y1 + y2) / 2 / image_height
-            norm_width = abs(x2 - x1) / image_width
-            norm_height = abs(y2 - y1) / image_height
-            
-            # 写入YOLO格式的行
-            line = f"{class_id} {x_center} {y_center} {norm_width} {norm_height}\n"
-            f.write(line)
-    
-    return True, class_mapping
-
 def load_class_mapping_from_yaml(yaml_path):
     """
     从data.yaml文件加载类别映射
@@ -400,6 +272,8 @@ def batch_convert_labelme_to_yolo(dataset_dir):
     """
     批量转换数据集目录下的所有LabelMe JSON文件为YOLO格式
     
+    转换在进程池中并行执行，.txt比JSON和data.yaml都新的文件会被跳过
+    
     参数:
         dataset_dir: 数据集根目录
     """
@@ -413,31 +287,25 @@ def batch_convert_labelme_to_yolo(dataset_dir):
     print("开始检查并转换LabelMe格式标注文件...")
     print(f"使用data.yaml中的类别映射: {class_mapping}")
     
+    # 使用data.yaml中的类别映射，而不是自动生成的
+    stats = batch_convert(dataset_dir, class_mapping, subdirs=subdirs, yaml_path=yaml_path)
+    
     for subdir in subdirs:
-        # 构建完整路径
         labels_dir = os.path.join(dataset_dir, subdir)
+        split_stats = stats[subdir]
         
-        if not os.path.exists(labels_dir):
+        if not split_stats['exists']:
             print(f"目录 {labels_dir} 不存在，跳过")
             continue
         
-        # 查找所有JSON文件
-        json_files = glob.glob(os.path.join(labels_dir, '*.json'))
-        
-        if not json_files:
+        if not split_stats['total']:
             print(f"在 {labels_dir} 中未找到LabelMe JSON文件")
             continue
         
-        print(f"在 {labels_dir} 中找到 {len(json_files)} 个LabelMe JSON文件，开始转换...")
-        
-        success_count = 0
-        for json_file in json_files:
-            # 使用data.yaml中的类别映射，而不是自动生成的
-            result, _ = convert_labelme_to_yolo(json_file, class_mapping)
-            if result:
-                success_count += 1
-        
-        print(f"  转换完成！成功转换 {success_count} 个文件，失败 {len(json_files) - success_count} 个文件")
+        print(f"在 {labels_dir} 中找到 {split_stats['total']} 个LabelMe JSON文件，"
+              f"其中 {split_stats['skipped']} 个已是最新，跳过")
+        print(f"  转换完成！成功转换 {split_stats['converted']} 个文件，失败 {split_stats['failed']} 个文件，"
+              f"耗时 {split_stats['seconds']:.2f}s")
     
     # 打印使用的类别映射
     if class_mapping:
@@ -592,6 +460,7 @@ def main():
     weight_decay = 0.0005               # 权重衰减
     momentum = 0.937                    # 动量
     cos_lr = True                       # 使用余弦退火学习率调度
+    cache_mode = 'auto'                 # 图像缓存：'auto'按内存/磁盘空间自动选择，也可指定'ram'、'disk'或False
 
     # 创建必要的目录
     if not os.path.exists(output_dir):
@@ -607,37 +476,19 @@ def main():
     # 获取数据集配置文件的绝对路径
     dataset_path = os.path.abspath('dataset/data.yaml')
     
-    # 删除旧的标签缓存文件，强制YOLO重新解析标签
-    cache_files = [
-        os.path.join(os.path.dirname(dataset_path), 'train', 'labels.cache'),
-        os.path.join(os.path.dirname(dataset_path), 'valid', 'labels.cache'),
-        os.path.join(os.path.dirname(dataset_path), 'test', 'labels.cache')
-    ]
-    for cache_file in cache_files:
-        if os.path.exists(cache_file):
-            os.remove(cache_file)
-            logger.info(f"已删除旧的标签缓存文件: {cache_file}")
-    
-    # 检查并删除training_output目录下的所有.cache文件
+    # 基于数据集指纹的缓存失效：只有图像/标签集合或data.yaml发生变化时才删除旧缓存
     training_output_dir = os.path.join(os.getcwd(), 'training_output')
-    if os.path.exists(training_output_dir):
-        for root, dirs, files in os.walk(training_output_dir):
-            for file in files:
-                if file.endswith('.cache'):
-                    cache_file = os.path.join(root, file)
-                    try:
-                        os.remove(cache_file)
-                        logger.info(f"已删除训练输出目录下的缓存文件: {cache_file}")
-                    except Exception as e:
-                        logger.error(f"删除缓存文件失败 {cache_file}: {str(e)}")
-    
-    # 验证缓存是否已删除
-    logger.info("验证缓存文件删除情况:")
-    for cache_file in cache_files:
-        if os.path.exists(cache_file):
-            logger.warning(f"警告: 缓存文件仍存在 {cache_file}")
-        else:
-            logger.info(f"确认: 缓存文件已删除 {cache_file}")
+    cache_changed, removed_caches, dataset_stats = invalidate_stale_caches(
+        os.path.dirname(dataset_path), extra_dirs=[training_output_dir], logger=logger
+    )
+    if cache_changed:
+        print(f"数据集已变化，已删除 {len(removed_caches)} 个过期缓存文件")
+    else:
+        print("数据集未变化，复用已有的标签缓存")
+    
+    # 确定训练时的图像缓存方式
+    train_cache = resolve_cache_mode(cache_mode, os.path.dirname(dataset_path), img_size,
+                                     stats=dataset_stats, logger=logger)
     
     # 加载YOLO模型
     print(f"正在加载YOLO模型: {starting_model}")
@@ -691,7 +542,7 @@ def main():
                 weight_decay=weight_decay,      # 权重衰减
                 momentum=momentum,              # 动量
                 cos_lr=cos_lr,                  # 使用余弦退火学习率调度
-                cache=False,                    # 禁用缓存，强制重新解析标签
+                cache=train_cache,              # 图像缓存方式（标签缓存按数据集指纹失效）
                 augment=True,                   # 启用数据增强，与之前成功训练一致
                 mosaic=1.0,                     # 启用马赛克数据增强
                 fliplr=0.5,                     # 启用水平翻转
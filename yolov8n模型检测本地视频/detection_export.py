@@ -0,0 +1,239 @@
+import argparse
+import csv
+import gzip
+import os
+import time
+
+import cv2
+import numpy as np
+
+from video_writer import create_writer
+
+# 安装了pyarrow时导出Parquet（列式存储，体积小、读取快），否则导出gzip压缩的CSV
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# ========== 检测结果文件的列 ==========
+# frame：帧序号（从0开始）；timestamp：时间（秒）；x1/y1/x2/y2：原图像素坐标
+# inferred：该帧是否实际推理（跳帧模式下跳过的帧沿用上次推理的检测框，值为0）
+# track_id：跟踪ID（未开启跟踪时为-1）
+# 没有检测到目标的帧不产生任何行
+COLUMNS = ['frame', 'timestamp', 'class_id', 'class_name', 'conf', 'x1', 'y1', 'x2', 'y2', 'inferred', 'track_id']
+if pa is not None:
+    SCHEMA = pa.schema([
+        ('frame', pa.int32()), ('timestamp', pa.float64()), ('class_id', pa.int16()), ('class_name', pa.string()),
+        ('conf', pa.float32()), ('x1', pa.float32()), ('y1', pa.float32()), ('x2', pa.float32()), ('y2', pa.float32()),
+        ('inferred', pa.bool_()), ('track_id', pa.int32()),
+    ])
+
+# 标注颜色（与ultralytics的默认调色板相同，渲染的视频与video_detect.py直接输出的一致，且渲染时不需要导入ultralytics）
+PALETTE = ('042AFF', '0BDBEB', 'F3F3F3', '00DFB7', '111F68', 'FF6FDD', 'FF444F', 'CCED00', '00F344', 'BD00FF',
+           '00B4FF', 'DD00BA', '00FFFF', '26C000', '01FFB3', '7D24FF', '7B0068', 'FF1B6C', 'FC6D2F', 'A2FF0B')
+PALETTE_BGR = [tuple(int(h[i:i + 2], 16) for i in (4, 2, 0)) for h in PALETTE]
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+class DetectionExporter:
+    # 按帧追加检测结果，每积累chunk_rows行写入一次文件（Parquet为一个row group）
+    def __init__(self, base_path, fps, chunk_rows=10000, box_scale=1.0):
+        self.fps = fps
+        self.box_scale = box_scale  # 帧被缩小处理时，检测框乘以该系数换算回原视频坐标
+        self.chunk_rows = chunk_rows
+        self.pending = []        # 尚未写入的帧：(帧序号, 是否推理, 类别id, 置信度, 检测框, 跟踪ID)
+        self.pending_rows = 0
+        self.total_rows = 0
+        self.names = {}
+        if pa is not None:
+            self.path = base_path + '.parquet'
+            self.writer = pq.ParquetWriter(self.path, SCHEMA)
+        else:
+            self.path = base_path + '.csv.gz'
+            self.file = gzip.open(self.path, 'wt', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(COLUMNS)
+
+    def add(self, frame_index, results, inferred=True):
+        # 追加一帧的检测结果（ultralytics的Results对象）
+        boxes = results.boxes
+        if boxes is None or len(boxes) == 0:
+            return
+        self.names = results.names
+        track_id = boxes.id.cpu().numpy().astype(np.int32) if boxes.id is not None else np.full(len(boxes), -1, dtype=np.int32)
+        self.pending.append((frame_index, inferred, boxes.cls.cpu().numpy().astype(np.int16),
+                             boxes.conf.cpu().numpy().astype(np.float32), boxes.xyxy.cpu().numpy().astype(np.float32), track_id))
+        self.pending_rows += len(boxes)
+        if self.pending_rows >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        # 把积累的帧拼接成列写入文件
+        if not self.pending:
+            return
+        counts = [len(item[2]) for item in self.pending]
+        frame = np.repeat(np.array([item[0] for item in self.pending], dtype=np.int32), counts)
+        inferred = np.repeat(np.array([item[1] for item in self.pending], dtype=bool), counts)
+        class_id = np.concatenate([item[2] for item in self.pending])
+        conf = np.concatenate([item[3] for item in self.pending])
+        xyxy = np.concatenate([item[4] for item in self.pending])
+        if self.box_scale != 1:
+            xyxy *= self.box_scale
+        track_id = np.concatenate([item[5] for item in self.pending])
+        timestamp = frame / self.fps
+        class_name = [self.names.get(int(c), str(c)) for c in class_id]
+
+        if pa is not None:
+            self.writer.write_table(pa.table({
+                'frame': frame, 'timestamp': timestamp, 'class_id': class_id, 'class_name': class_name,
+                'conf': conf, 'x1': xyxy[:, 0], 'y1': xyxy[:, 1], 'x2': xyxy[:, 2], 'y2': xyxy[:, 3],
+                'inferred': inferred, 'track_id': track_id,
+            }, schema=SCHEMA))
+        else:
+            self.writer.writerows(zip(
+                frame.tolist(), np.round(timestamp, 3).tolist(), class_id.tolist(), class_name,
+                np.round(conf.astype(np.float64), 4).tolist(), *np.round(xyxy.astype(np.float64), 1).T.tolist(),
+                inferred.astype(np.int8).tolist(), track_id.tolist()))
+
+        self.total_rows += len(frame)
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        self.flush()
+        if pa is not None:
+            self.writer.close()
+        else:
+            self.file.close()
+
+# ========== 读取检测结果 ==========
+def iter_chunks(path, chunk_rows=10000):
+    # 按块读取检测结果文件，每块返回 {列名: NumPy数组}
+    if path.endswith('.parquet'):
+        if pa is None:
+            raise RuntimeError("读取Parquet文件需要安装pyarrow：pip install pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield {name: batch.column(name).to_numpy(zero_copy_only=False) for name in COLUMNS}
+        return
+
+    with gzip.open(path, 'rt', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = []
+        for row in reader:
+            rows.append(row)
+            if len(rows) >= chunk_rows:
+                yield rows_to_columns(header, rows)
+                rows = []
+        if rows:
+            yield rows_to_columns(header, rows)
+
+def rows_to_columns(header, rows):
+    columns = dict(zip(header, zip(*rows)))
+    return {
+        'frame': np.array(columns['frame'], dtype=np.int32),
+        'timestamp': np.array(columns['timestamp'], dtype=np.float64),
+        'class_id': np.array(columns['class_id'], dtype=np.int16),
+        'class_name': np.array(columns['class_name'], dtype=object),
+        'conf': np.array(columns['conf'], dtype=np.float32),
+        **{name: np.array(columns[name], dtype=np.float32) for name in ('x1', 'y1', 'x2', 'y2')},
+        'inferred': np.array(columns['inferred'], dtype=np.int8).astype(bool),
+        'track_id': np.array(columns['track_id'], dtype=np.int32),
+    }
+
+def iter_frames(path):
+    # 按帧序号分组返回 (帧序号, {列名: 该帧的NumPy数组})，文件中的行按帧序号递增排列
+    carry = None
+    for chunk in iter_chunks(path):
+        if carry is not None:
+            chunk = {name: np.concatenate([carry[name], chunk[name]]) for name in COLUMNS}
+        frames = chunk['frame']
+        starts = np.flatnonzero(np.r_[True, frames[1:] != frames[:-1]])
+        # 最后一帧可能跨块，留到下一块一起处理
+        for begin, end in zip(starts[:-1], starts[1:]):
+            yield int(frames[begin]), {name: chunk[name][begin:end] for name in COLUMNS}
+        carry = {name: chunk[name][starts[-1]:] for name in COLUMNS}
+    if carry is not None and len(carry['frame']):
+        yield int(carry['frame'][0]), carry
+
+# ========== 可选的渲染步骤：根据检测结果绘制标注视频 ==========
+def class_color(class_id):
+    return PALETTE_BGR[class_id % len(PALETTE_BGR)]
+
+def draw_detections(frame, detections):
+    line_width = max(round(sum(frame.shape[:2]) / 2 * 0.003), 2)
+    font_scale = line_width / 3
+    for class_id, class_name, conf, x1, y1, x2, y2, track_id in zip(
+            detections['class_id'], detections['class_name'], detections['conf'],
+            detections['x1'], detections['y1'], detections['x2'], detections['y2'], detections['track_id']):
+        color = class_color(int(class_id))
+        p1, p2 = (int(x1), int(y1)), (int(x2), int(y2))
+        cv2.rectangle(frame, p1, p2, color, line_width, cv2.LINE_AA)
+        label = f"{class_name} {conf:.2f}" if track_id < 0 else f"id:{track_id} {class_name} {conf:.2f}"
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, max(line_width - 1, 1))
+        outside = p1[1] >= h + 3
+        top = (p1[0], p1[1] - h - 3) if outside else (p1[0], p1[1])
+        bottom = (p1[0] + w, p1[1]) if outside else (p1[0] + w, p1[1] + h + 3)
+        cv2.rectangle(frame, top, bottom, color, -1, cv2.LINE_AA)
+        cv2.putText(frame, label, (p1[0], p1[1] - 2 if outside else p1[1] + h + 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), max(line_width - 1, 1), cv2.LINE_AA)
+    return frame
+
+def render_video(detections_path, video_path, output_path):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("❌ 无法打开视频文件（可能格式不支持/文件损坏）")
+        return
+    width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps    = cap.get(cv2.CAP_PROP_FPS) or 30
+    out = create_writer(output_path, fps, width, height)
+    if out is None:
+        print("❌ 所有编码格式都无法创建输出视频！")
+        cap.release()
+        return
+
+    start = time.perf_counter()
+    frame_count = 0
+    frames = iter_frames(detections_path)
+    next_frame = next(frames, None)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # 跳过序号小于当前帧的检测结果（例如视频被截短）
+            while next_frame is not None and next_frame[0] < frame_count:
+                next_frame = next(frames, None)
+            if next_frame is not None and next_frame[0] == frame_count:
+                draw_detections(frame, next_frame[1])
+                next_frame = next(frames, None)
+            out.write(frame)
+            frame_count += 1
+    finally:
+        cap.release()
+        out.release()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ 渲染完成！共 {frame_count} 帧，用时 {elapsed:.2f}s | 输出视频保存到：{output_path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='根据导出的检测结果（Parquet/CSV.gz）为原视频绘制标注')
+    parser.add_argument('--detections', required=True, help='检测结果文件（.parquet 或 .csv.gz）')
+    parser.add_argument('--video', required=True, help='原视频文件')
+    parser.add_argument('--output', default='output_rendered.mp4', help='输出视频文件')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.detections):
+        print(f"❌ 检测结果文件不存在：{args.detections}")
+        return
+    render_video(args.detections, args.video, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+import functools
+import importlib.util
+import os
+import time
+
+import numpy as np
+import torch
+
+# ========== 推理设备选择（video_detect.py、multi_video_detect.py、img_detect.py共用） ==========
+# 启动时探测一次可用的设备并选择最快的：CUDA → MPS → CPU；
+# 也可以指定设备，常见写法（"GPU"、"gpu"、"cuda"、"0"）会转换为torch能识别的设备名，指定的设备不可用时自动回退
+# CPU上可以设置PyTorch线程数，并可选择把权重导出为ONNX Runtime / OpenVINO格式推理（需要安装对应的包）
+DEVICE_ALIASES = {"gpu": "cuda:0", "cuda": "cuda:0"}
+EXPORT_PACKAGES = {"onnx": "onnxruntime", "openvino": "openvino"}
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+@functools.lru_cache(maxsize=None)
+def available_devices():
+    # 按速度从快到慢返回可用的设备（只探测一次）
+    devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())] if torch.cuda.is_available() else []
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        devices.append("mps")
+    devices.append("cpu")
+    return tuple(devices)
+
+def resolve_device(requested="auto"):
+    # 把配置中的设备名转换为可用的torch设备名
+    devices = available_devices()
+    name = str(requested).strip().lower()
+    if name in ("", "auto"):
+        return devices[0]
+    name = DEVICE_ALIASES.get(name, name)
+    if name.isdigit():
+        name = f"cuda:{name}"
+    if name in devices:
+        return name
+    print(f"⚠️ 设备 {requested} 不可用（可用设备：{', '.join(devices)}），自动选择 {devices[0]}")
+    return devices[0]
+
+def device_description(device):
+    if device.startswith("cuda"):
+        return f"{device}（{torch.cuda.get_device_name(int(device.split(':')[1]))}）"
+    if device == "mps":
+        return "mps（Apple GPU）"
+    return f"cpu（{os.cpu_count()} 核，PyTorch线程数 {torch.get_num_threads()}）"
+
+def export_model(model, model_path, export_format):
+    # 把权重导出为ONNX/OpenVINO格式并加载，导出文件比权重新时直接复用；缺少依赖或导出失败时返回None
+    package = EXPORT_PACKAGES.get(export_format)
+    if package is None:
+        print(f"⚠️ 不支持的导出格式：{export_format}（可选：{', '.join(EXPORT_PACKAGES)}），继续使用PyTorch")
+        return None
+    if importlib.util.find_spec(package) is None:
+        print(f"⚠️ 未安装 {package}（pip install {package}），继续使用PyTorch")
+        return None
+
+    from ultralytics import YOLO
+    stem = os.path.splitext(model_path)[0]
+    exported = stem + ".onnx" if export_format == "onnx" else stem + "_openvino_model"
+    try:
+        if not os.path.exists(exported) or os.path.getmtime(exported) < os.path.getmtime(model_path):
+            print(f"📦 正在导出 {export_format} 模型（只在权重更新后导出一次）...")
+            exported = model.export(format=export_format, dynamic=True, verbose=False)
+        return YOLO(exported, task=model.task)
+    except Exception as e:
+        print(f"⚠️ 导出 {export_format} 模型失败：{e}，继续使用PyTorch")
+        return None
+
+def warmup(model, imgsz=640, runs=4):
+    # 预热runs次并测量延迟，返回 (首次推理毫秒数（含初始化）, 之后单次推理的平均毫秒数（runs为1时为None）)
+    image = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    start = time.perf_counter()
+    model(image, verbose=False)
+    first = (time.perf_counter() - start) * 1000
+    if runs < 2:
+        return first, None
+    start = time.perf_counter()
+    for _ in range(runs - 1):
+        model(image, verbose=False)
+    return first, (time.perf_counter() - start) * 1000 / (runs - 1)
+
+def prepare_model(model, model_path, device="auto", cpu_threads=0, export_format="", warmup_runs=4):
+    # 选择设备、设置线程数/导出格式并预热，返回可直接调用的模型
+    # warmup_runs：预热推理次数（第一次含初始化，之后用于测量稳定延迟）；只推理一两张图片的脚本设为0，不预热
+    # 设备和半精度写入model.overrides，之后每次调用model()都会使用，不需要再传device参数
+    resolved = resolve_device(device)
+    half = resolved.startswith("cuda")  # 半精度只在CUDA上更快，CPU/MPS使用FP32
+    backend = "PyTorch"
+
+    if resolved == "cpu":
+        if cpu_threads > 0:
+            torch.set_num_threads(cpu_threads)
+        if export_format:
+            exported = export_model(model, model_path, export_format)
+            if exported is not None:
+                model = exported
+                backend = "ONNX Runtime" if export_format == "onnx" else "OpenVINO"
+    elif export_format:
+        print(f"⚠️ {export_format} 导出只用于CPU推理，当前设备为 {resolved}，使用PyTorch")
+
+    model.overrides["device"] = resolved
+    model.overrides["half"] = half
+    print(f"⚙️ 推理设备：{device_description(resolved)} | 后端：{backend} | 半精度：{'是' if half else '否'}")
+    if warmup_runs > 0:
+        first, steady = warmup(model, runs=warmup_runs)
+        if steady is None:
+            print(f"🔥 预热完成：首次推理 {first:.0f}ms（含初始化）")
+        else:
+            print(f"🔥 预热完成：首次推理 {first:.0f}ms（含初始化），之后 {steady:.0f}ms/张")
+    return model
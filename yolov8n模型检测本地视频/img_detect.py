@@ -1,11 +1,16 @@
 import cv2
 import os
+import time
 from ultralytics import YOLO
 
+from device_utils import prepare_model
+
 # ========== 核心：直接写文件名（模型/图片都在utills目录下） ==========
 model_name = r"xxx.pt"       # 模型文件名（放utills下）
 image_name = r"xxx.jpg"              # 图片文件名（放utills下）
 output_name = "output.jpg"              # 结果保存到utills下
+# "auto"：自动选择最快的可用设备；Windows/Mac上遇到mps报错时可改为 "cpu"
+device = "auto"
 
 # 拼接当前目录路径（确保指向utills目录）
 model_path = os.path.join(os.getcwd(), model_name)
@@ -33,8 +38,9 @@ if not os.path.exists(image_path):
     exit()
 
 # ========== 加载模型 + 检测 ==========
-# 加载模型（Windows用cpu，避免mps报错）
+# 加载模型并选择推理设备（只检测一张图片，不预热）
 model = YOLO(model_path)
+model = prepare_model(model, model_path, device, warmup_runs=0)
 
 # 读取图片
 image = cv2.imread(image_path)
@@ -42,8 +48,10 @@ if image is None:
     print("❌ 无法读取图片（可能图片损坏/格式不对）")
     exit()
 
-# 推理（置信度0.3，IOU0.5，Windows用cpu）
-results = model(image, conf=0.3, iou=0.5, device="cpu")[0]
+# 推理（置信度0.3，IOU0.5）
+start = time.perf_counter()
+results = model(image, conf=0.3, iou=0.5)[0]
+print(f"⏱️ 推理耗时：{(time.perf_counter() - start) * 1000:.0f}ms（首次推理，含模型初始化）")
 
 # ========== 保存结果 ==========
 # 个人矩阵
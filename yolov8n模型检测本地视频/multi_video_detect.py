@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from detection_export import DetectionExporter
+from device_utils import prepare_model
+from tracker import Tracker
+from video_writer import create_writer
+from video_detect import (
+    batch_size, queue_size, model_path, utills_dir, output_mode, export_chunk_rows, skip_mode, SKIP_MODES,
+    device, cpu_threads, cpu_export,
+    tracking, track_high_conf, track_iou, track_min_hits, track_max_age, tracker_skip,
+    load_model, put_until_stopped, reader_loop, render_frame, writer_loop, export_loop,
+    track_frame, save_tracks, infer_frames, scaled_size,
+)
+
+# ========== 多路视频批处理：一个模型同时处理多个视频 ==========
+# 每路视频有自己的读帧线程和写入线程，推理在主线程中进行：
+# 从各路视频的帧队列中轮流取帧组成跨视频的批次，推理后按各自的帧顺序分发回每路视频
+input_dir_name = "videos"           # 待检测视频所在目录（utills目录下）
+output_dir_name = "outputs"         # 标注视频和统计文件的输出目录（utills目录下）
+video_extensions = ('.mp4', '.avi', '.mov', '.mkv')
+
+# ========== 调度配置 ==========
+max_streams = 4          # 同时打开的视频路数，其余视频排队等待
+stream_queue_size = 8    # 每路视频读帧/写入队列的最大长度（总内存约为 max_streams 倍）
+max_wait_ms = 20         # 凑批时最多等待各路读帧线程多少毫秒
+plot_workers = 4         # 所有视频共享的绘制线程数
+status_interval = 5.0    # 每隔多少秒打印一次总速度和各路积压情况
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+class VideoStream:
+    # 一路视频：读帧线程 → 共享的推理调度 → 共享的绘制线程池 → 自己的写入线程
+    def __init__(self, video_path, output_dir):
+        self.name = os.path.basename(video_path)
+        stem = os.path.splitext(self.name)[0]
+        self.video_path = video_path
+        self.output_path = os.path.join(output_dir, f"{stem}_detected.mp4")
+        self.detections_path = os.path.join(output_dir, f"{stem}_detections")
+        self.stats_path = os.path.join(output_dir, f"{stem}_stats.json")
+        self.tracks_path = os.path.join(output_dir, f"{stem}_tracks.csv")
+
+        self.frame_queue = queue.Queue(maxsize=stream_queue_size)
+        self.write_queue = queue.Queue(maxsize=stream_queue_size)
+        self.stop = threading.Event()
+        self.timings = {}
+        self.errors = []
+        self.plot_times = []
+
+        self.frame_count = 0
+        self.inferred_count = 0
+        self.detected_object_count = 0
+        self.infer_time = 0.0      # 按本路视频在每批中的帧数分摊的推理耗时
+        self.last_results = None   # 最近一次推理的结果，跳过的帧沿用它的检测框
+        self.total_frames = 0
+        self.finished = False      # 读帧线程已结束（或出错停止）
+        self.tracker = None        # 开启tracking时每路视频有自己的跟踪器
+        self.track_time = 0.0
+
+    def open(self):
+        # 打开视频和写入器并启动读帧/写入线程，失败时返回错误信息
+        self.cap = cv2.VideoCapture(self.video_path)
+        if not self.cap.isOpened():
+            return "无法打开视频文件（可能格式不支持/文件损坏）"
+        width  = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps    = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        original_width = width
+        width, height = scaled_size(width, height)
+
+        # detections模式只导出检测结果，不绘制也不编码视频
+        self.export = output_mode == "detections"
+        if self.export:
+            self.out = DetectionExporter(self.detections_path, fps, export_chunk_rows, original_width / width)
+            self.output_path = self.out.path
+        else:
+            self.out = create_writer(self.output_path, fps, width, height)
+            if self.out is None:
+                self.cap.release()
+                return "所有编码格式都无法创建输出视频"
+
+        if tracking:
+            self.tracker = Tracker(fps, track_high_conf, track_iou, track_min_hits, track_max_age, tracker_skip)
+
+        self.started = time.perf_counter()
+        self.reader = threading.Thread(target=reader_loop, args=(self.cap, self.frame_queue, self.stop, self.timings), daemon=True)
+        self.writer = threading.Thread(target=export_loop if self.export else writer_loop,
+                                       args=(self.out, self.write_queue, self.stop, self.timings, self.errors), daemon=True)
+        self.reader.start()
+        self.writer.start()
+        return None
+
+    def backlog(self):
+        # 积压情况：(已解码等待推理的帧数, 尚未处理的帧数)
+        return self.frame_queue.qsize(), max(self.total_frames - self.frame_count, 0)
+
+    def close(self, names):
+        # 等待写入线程写完已分发的帧，释放资源并写入本路视频的统计文件
+        while self.writer.is_alive():
+            try:
+                self.write_queue.put(None, timeout=0.2)
+                break
+            except queue.Full:
+                continue
+        self.writer.join()
+        self.stop.set()
+        self.reader.join()
+        self.cap.release()
+        if self.export:
+            self.out.close()
+        else:
+            self.out.release()
+
+        elapsed = time.perf_counter() - self.started
+        self.timings['推理'] = self.infer_time
+        if not self.export:
+            self.timings['绘制'] = sum(self.plot_times)
+        if self.tracker is not None:
+            self.timings['跟踪'] = self.track_time
+        stats = {
+            'video': self.video_path,
+            'output': self.output_path,
+            'frames': self.frame_count,
+            'inferred_frames': self.inferred_count,
+            'detected_objects': self.detected_object_count,
+            'elapsed_s': round(elapsed, 3),
+            'fps': round(self.frame_count / max(elapsed, 1e-9), 2),
+            'timings_s': {name: round(seconds, 3) for name, seconds in self.timings.items()},
+        }
+        if self.tracker is not None:
+            track_summary = self.tracker.summary()
+            stats['tracks'] = len(track_summary)
+            stats['tracks_file'] = self.tracks_path
+        if self.errors:
+            stats['error'] = str(self.errors[0])
+        with open(self.stats_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+
+        if self.tracker is not None:
+            print(f"\n{self.name}：")
+            save_tracks(track_summary, names, self.tracks_path)
+        if self.errors:
+            print(f"\n❌ {self.name} 写入出错：{self.errors[0]}")
+        else:
+            print(f"\n✅ {self.name} 完成：{self.frame_count} 帧 | 推理 {self.inferred_count} 帧 | "
+                  f"累计检测到 {self.detected_object_count} 个目标 | {stats['fps']} 帧/秒")
+        return stats
+
+# ========== 跨视频凑批 ==========
+def next_cross_batch(streams, start_index, one_per_stream=False):
+    # 从各路视频轮流取帧（每轮每路取一帧，起始位置每批轮换，保证各路公平），
+    # 直到凑够batch_size个需要推理的帧、总帧数达到queue_size或等待超过max_wait_ms
+    # one_per_stream：每路最多取一帧（tracker模式下每帧是否推理取决于该路上一帧的跟踪结果）
+    # 返回 [(视频, 帧, 是否推理), ...]
+    items = []
+    taken = set()
+    infer_count = 0
+    deadline = time.perf_counter() + max_wait_ms / 1000
+    while infer_count < batch_size and len(items) < queue_size:
+        progress = False
+        for offset in range(len(streams)):
+            stream = streams[(start_index + offset) % len(streams)]
+            if stream.finished or stream in taken:
+                continue
+            if stream.stop.is_set():
+                stream.finished = True
+                continue
+            try:
+                item = stream.frame_queue.get_nowait()
+            except queue.Empty:
+                continue
+            if item is None:
+                stream.finished = True
+                continue
+            frame, infer = item
+            items.append((stream, frame, infer))
+            infer_count += infer
+            progress = True
+            if one_per_stream:
+                taken.add(stream)
+            if infer_count >= batch_size:
+                break
+        if all(stream.finished or stream in taken for stream in streams):
+            break
+        if not progress:
+            if time.perf_counter() >= deadline:
+                break
+            time.sleep(0.002)
+    return items
+
+def print_status(total_frames, elapsed, active, pending):
+    # 打印总速度和各路视频的积压情况（队列中的帧数/剩余帧数）
+    backlog = "，".join(f"{stream.name} {'/'.join(map(str, stream.backlog()))}" for stream in active)
+    print(f"🔄 已处理 {total_frames} 帧 | 总速度 {total_frames / max(elapsed, 1e-9):.1f} 帧/秒 | "
+          f"进行中 {len(active)} 路，排队 {len(pending)} 个 | 积压（队列/剩余）：{backlog or '无'}")
+
+# ========== 多路调度（推理在主线程中进行） ==========
+def process_videos(model, video_paths, output_dir):
+    pending = deque(video_paths)
+    active = []
+    closers = []
+    all_stats = []
+    failed = []
+    total_frames = 0
+    batch_index = 0
+    start = time.perf_counter()
+    last_status = start
+
+    with ThreadPoolExecutor(max_workers=plot_workers) as plotter, ThreadPoolExecutor(max_workers=max_streams) as closer:
+        while pending or active:
+            # 补充新的视频，保持max_streams路同时进行
+            while pending and len(active) < max_streams:
+                stream = VideoStream(pending.popleft(), output_dir)
+                error = stream.open()
+                if error:
+                    print(f"\n❌ {stream.name}：{error}")
+                    failed.append({'video': stream.video_path, 'error': error})
+                else:
+                    active.append(stream)
+
+            tracker_gated = tracking and skip_mode == "tracker"
+            items = next_cross_batch(active, batch_index, one_per_stream=tracker_gated) if active else []
+            batch_index += 1
+            if tracker_gated:
+                items = [(stream, frame, stream.tracker.should_infer()) for stream, frame, _ in items]
+
+            frames = [frame for _, frame, infer in items if infer]
+            batch_results = []
+            if frames:
+                infer_start = time.perf_counter()
+                try:
+                    batch_results = infer_frames(model, frames)
+                except Exception as e:
+                    print(f"\n⚠️ 推理出错（{len(frames)} 帧）：{e}")
+                    batch_results = [None] * len(frames)
+                per_frame = (time.perf_counter() - infer_start) / len(frames)
+
+            batch_results = iter(batch_results)
+            for stream, frame, infer in items:
+                if infer:
+                    results = stream.last_results = next(batch_results)
+                    stream.inferred_count += 1
+                    stream.infer_time += per_frame
+                    img = None
+                else:
+                    results = stream.last_results
+                    img = frame
+                if stream.tracker is not None:
+                    track_start = time.perf_counter()
+                    results = track_frame(stream.tracker, results if infer else None, frame, model.names)
+                    stream.track_time += time.perf_counter() - track_start
+                    img = None
+                if results is not None:
+                    stream.detected_object_count += len(results.boxes) if results.boxes is not None else 0
+                if stream.export:
+                    if results is not None:
+                        put_until_stopped(stream.write_queue, (stream.frame_count, results, infer), stream.stop)
+                elif results is None:
+                    put_until_stopped(stream.write_queue, (None, frame), stream.stop)
+                else:
+                    put_until_stopped(stream.write_queue, (plotter.submit(render_frame, results, stream.plot_times, img), frame), stream.stop)
+                stream.frame_count += 1
+            total_frames += len(items)
+
+            # 读完的视频在后台线程中等待写入完成，不阻塞其他视频的推理
+            for stream in [stream for stream in active if stream.finished]:
+                active.remove(stream)
+                closers.append(closer.submit(stream.close, model.names))
+
+            now = time.perf_counter()
+            if now - last_status >= status_interval:
+                print_status(total_frames, now - start, active, pending)
+                last_status = now
+
+        for future in closers:
+            all_stats.append(future.result())
+
+    return all_stats, failed, total_frames, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='多路视频批量检测（多个视频共享一个模型，跨视频组批推理）')
+    parser.add_argument('--input', default=os.path.join(utills_dir, input_dir_name), help='待检测视频所在目录')
+    parser.add_argument('--output', default=os.path.join(utills_dir, output_dir_name), help='输出目录')
+    parser.add_argument('--model', default=model_path, help='模型文件路径')
+    args = parser.parse_args()
+
+    # ========== 路径/文件校验 ==========
+    if not os.path.exists(args.model):
+        print(f"\n❌ 模型文件不存在：{args.model}")
+        return
+    if skip_mode not in SKIP_MODES:
+        print(f'\n❌ 不支持的跳帧模式 skip_mode = "{skip_mode}"（可选：{", ".join(SKIP_MODES)}）')
+        return
+    if skip_mode == "tracker" and not tracking:
+        print('\n❌ skip_mode = "tracker" 需要开启 tracking = True')
+        return
+    if not os.path.isdir(args.input):
+        print(f"\n❌ 视频目录不存在：{args.input}")
+        return
+    video_paths = sorted(os.path.join(args.input, name) for name in os.listdir(args.input)
+                         if name.lower().endswith(video_extensions))
+    if not video_paths:
+        print(f"\n❌ 目录中没有视频文件：{args.input}")
+        return
+    os.makedirs(args.output, exist_ok=True)
+
+    model = load_model(args.model)
+    if model is None:
+        return
+    model = prepare_model(model, args.model, device, cpu_threads, cpu_export)
+
+    print(f"🚀 开始检测 {len(video_paths)} 个视频 | 同时处理 {max_streams} 路 | 批大小 {batch_size}")
+    all_stats, failed, total_frames, elapsed = process_videos(model, video_paths, args.output)
+
+    # ========== 最终统计 ==========
+    print(f"\n✅ 全部完成！输出目录：{args.output}")
+    print(f"📊 成功 {len(all_stats) - sum('error' in stats for stats in all_stats)} 个视频，"
+          f"失败 {len(failed) + sum('error' in stats for stats in all_stats)} 个 | 共处理 {total_frames} 帧 | "
+          f"累计检测到 {sum(stats['detected_objects'] for stats in all_stats)} 个目标")
+    print(f"⏱️ 总耗时 {elapsed:.2f}s（总速度 {total_frames / max(elapsed, 1e-9):.1f} 帧/秒）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+
+# ========== 感兴趣区域（ROI）与切片推理（SAHI风格） ==========
+# 只把需要的区域裁剪出来送入模型；切片模式下把区域切成重叠的小块，按原始分辨率推理（不缩小），
+# 小目标在小块中占的像素比整帧缩小到imgsz时更多、更容易检出，
+# 各小块的检测框映射回整帧坐标后，跨块的同一目标按"交集/较小框面积"（IoS）合并为一个框
+# 不切片的ROI区域按其占整帧的比例缩小推理尺寸，与整帧推理的缩放比例相同，计算量与区域面积成正比
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+def tile_starts(low, high, tile_size, overlap):
+    # 一个方向上各小块的起点，相邻小块重叠overlap比例，最后一块与区域边缘对齐
+    if high - low <= tile_size:
+        return [low]
+    step = max(int(tile_size * (1 - overlap)), 1)
+    return list(range(low, high - tile_size, step)) + [high - tile_size]
+
+def frame_regions(width, height, rois, tile_size=0, overlap=0.2):
+    # 返回一帧需要推理的区域列表 [(x1, y1, x2, y2), ...]（像素坐标）
+    # rois为0-1之间的比例坐标，与视频分辨率无关；为空时使用整帧；tile_size为0时不切片
+    if rois:
+        regions = []
+        for x1, y1, x2, y2 in rois:
+            x1, x2 = max(int(round(x1 * width)), 0), min(int(round(x2 * width)), width)
+            y1, y2 = max(int(round(y1 * height)), 0), min(int(round(y2 * height)), height)
+            if x2 > x1 and y2 > y1:
+                regions.append((x1, y1, x2, y2))
+    else:
+        regions = [(0, 0, width, height)]
+
+    if tile_size:
+        regions = [(x, y, min(x + tile_size, x2), min(y + tile_size, y2))
+                   for x1, y1, x2, y2 in regions
+                   for y in tile_starts(y1, y2, tile_size, overlap)
+                   for x in tile_starts(x1, x2, tile_size, overlap)]
+    return regions
+
+def region_imgsz(width, height, regions, imgsz=640, scale=1.0, native=False, stride=32):
+    # 每个区域的推理尺寸，向上取整到stride的倍数
+    # native为True（切片）：区域长边 × scale，即按原始分辨率推理
+    # native为False（ROI）：区域长边/整帧长边 × imgsz × scale，与整帧推理的缩放比例相同
+    frame_side = max(width, height)
+    sizes = []
+    for x1, y1, x2, y2 in regions:
+        side = max(x2 - x1, y2 - y1)
+        size = side * scale if native else side / frame_side * imgsz * scale
+        sizes.append(max(stride, math.ceil(size / stride) * stride))
+    return sizes
+
+def merge_detections(data, threshold=0.5):
+    # 合并跨小块重复的检测框（贪心NMM）：data为 (N, 6) [x1, y1, x2, y2, 置信度, 类别]
+    # 按置信度从高到低，把与当前框同类别且IoS超过threshold的框并入当前框（取外接框），置信度取最高值
+    if len(data) < 2:
+        return data
+    data = data[np.argsort(-data[:, 4], kind='stable')]
+    boxes = data[:, :4]
+    iw = np.minimum(boxes[:, None, 2], boxes[None, :, 2]) - np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    ih = np.minimum(boxes[:, None, 3], boxes[None, :, 3]) - np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    ios = inter / np.maximum(np.minimum(area[:, None], area[None, :]), 1e-9)
+    overlap = (ios > threshold) & (data[:, None, 5] == data[None, :, 5])
+    np.fill_diagonal(overlap, True)
+
+    used = np.zeros(len(data), dtype=bool)
+    merged = []
+    for i in range(len(data)):
+        if used[i]:
+            continue
+        group = np.flatnonzero(overlap[i] & ~used)
+        used[group] = True
+        merged.append([boxes[group, 0].min(), boxes[group, 1].min(), boxes[group, 2].max(), boxes[group, 3].max(),
+                       data[i, 4], data[i, 5]])
+    return np.array(merged, dtype=data.dtype)
@@ -0,0 +1,195 @@
+import numpy as np
+
+# ========== 轻量多目标跟踪（SORT/ByteTrack风格） ==========
+# 每条轨迹用卡尔曼滤波（匀速模型，状态为 [cx, cy, 面积, 宽高比, vx, vy, v面积]）预测下一帧的位置，
+# 与检测框按IoU匹配；所有轨迹的预测、更新和IoU代价矩阵都用NumPy批量计算，不逐条循环
+# 匹配分两轮（ByteTrack）：高置信度检测框先匹配所有轨迹，低置信度检测框只用于延续剩下的已确认轨迹
+
+# 卡尔曼滤波参数（与SORT相同）
+F = np.eye(7)
+F[0, 4] = F[1, 5] = F[2, 6] = 1
+Q = np.diag([1, 1, 1, 1, 0.01, 0.01, 0.0001])
+R = np.diag([1, 1, 10, 10])
+P0 = np.diag([10, 10, 10, 10, 10000, 10000, 10000])
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+def xyxy_to_z(boxes):
+    # [x1, y1, x2, y2] → 观测 [cx, cy, 面积, 宽高比]
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w * h, w / np.maximum(h, 1e-6)], axis=1)
+
+def x_to_xyxy(x):
+    # 卡尔曼状态 → [x1, y1, x2, y2]
+    w = np.sqrt(np.maximum(x[:, 2] * x[:, 3], 0))
+    h = x[:, 2] / np.maximum(w, 1e-6)
+    return np.stack([x[:, 0] - w / 2, x[:, 1] - h / 2, x[:, 0] + w / 2, x[:, 1] + h / 2], axis=1)
+
+def iou_matrix(a, b):
+    # 两组框两两之间的IoU，返回 (len(a), len(b))；按坐标分别广播，避免生成 (N, M, 2) 的中间数组
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.maximum(iw, 0) * np.maximum(ih, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def greedy_match(iou, threshold):
+    # 按IoU从大到小贪心匹配，返回 (行索引, 列索引)；只对超过阈值的候选对排序
+    rows, cols = np.nonzero(iou >= threshold)
+    order = np.argsort(-iou[rows, cols], kind='stable')
+    used_rows = np.zeros(iou.shape[0], dtype=bool)
+    used_cols = np.zeros(iou.shape[1], dtype=bool)
+    matched_rows, matched_cols = [], []
+    for row, col in zip(rows[order], cols[order]):
+        if not used_rows[row] and not used_cols[col]:
+            used_rows[row] = used_cols[col] = True
+            matched_rows.append(row)
+            matched_cols.append(col)
+    return np.array(matched_rows, dtype=int), np.array(matched_cols, dtype=int)
+
+class Tracker:
+    # 多目标跟踪器：update()处理推理帧的检测结果，predict()处理跳过推理的帧（只用卡尔曼预测）
+    def __init__(self, fps, high_conf=0.5, iou_threshold=0.3, min_hits=3, max_age=30, skip_frames=2):
+        self.fps = fps
+        self.high_conf = high_conf
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.skip_frames = skip_frames
+
+        # 所有轨迹的状态按行存放在数组中
+        self.mean = np.zeros((0, 7))
+        self.cov = np.zeros((0, 7, 7))
+        self.ids = np.zeros(0, dtype=int)
+        self.cls = np.zeros(0, dtype=int)
+        self.conf = np.zeros(0)
+        self.hits = np.zeros(0, dtype=int)
+        self.activated = np.zeros(0, dtype=bool)  # 第一帧出现的目标直接确认
+        self.first_frame = np.zeros(0, dtype=int)
+        self.last_frame = np.zeros(0, dtype=int)
+
+        self.frame = -1
+        self.next_id = 1
+        self.skip_budget = 0   # 轨迹稳定时允许连续跳过推理的剩余帧数
+        self.finished = []     # 已结束的已确认轨迹：(id, 类别, 首帧, 末帧, 匹配次数)
+
+    def _predict(self):
+        self.frame += 1
+        # 面积不能预测为负数
+        self.mean[self.mean[:, 2] + self.mean[:, 6] <= 0, 6] = 0
+        self.mean = self.mean @ F.T
+        self.cov = F @ self.cov @ F.T + Q
+
+    def _confirmed(self):
+        return self.activated | (self.hits >= self.min_hits)
+
+    def _output(self, mask, boxes, confs):
+        # 返回 (N, 7)：x1, y1, x2, y2, 跟踪ID, 置信度, 类别
+        return np.column_stack([boxes, self.ids[mask], confs, self.cls[mask]]).astype(np.float32)
+
+    def should_infer(self):
+        # skip_mode="tracker"时由推理循环调用：轨迹稳定时消耗跳帧额度，否则需要推理
+        if self.skip_budget > 0:
+            self.skip_budget -= 1
+            return False
+        return True
+
+    def predict(self):
+        # 跳过推理的帧：用卡尔曼预测输出最近一次推理时匹配上的已确认轨迹
+        self._predict()
+        if self.frame == 0:
+            return np.zeros((0, 7), dtype=np.float32)
+        mask = self._confirmed() & (self.last_frame == self.last_frame.max(initial=-1))
+        return self._output(mask, x_to_xyxy(self.mean[mask]), self.conf[mask])
+
+    def update(self, boxes, confs, classes):
+        # 推理帧：boxes为 (N, 4) xyxy，返回本帧匹配上的已确认轨迹
+        self._predict()
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        confs = np.asarray(confs, dtype=np.float64).reshape(-1)
+        classes = np.asarray(classes, dtype=int).reshape(-1)
+
+        # 代价矩阵：轨迹预测框与检测框的IoU，不同类别之间不匹配
+        iou = iou_matrix(x_to_xyxy(self.mean), boxes)
+        iou[self.cls[:, None] != classes[None, :]] = 0
+
+        track_matched = np.zeros(len(self.ids), dtype=bool)
+        det_matched = np.zeros(len(boxes), dtype=bool)
+        high = confs >= self.high_conf
+        confirmed = self._confirmed()
+        matches = []
+        # 第一轮：高置信度检测框 ↔ 所有轨迹；第二轮：低置信度检测框 ↔ 剩余的已确认轨迹
+        for det_mask, track_mask in ((high, np.ones_like(track_matched)), (~high, confirmed)):
+            track_index = np.flatnonzero(track_mask & ~track_matched)
+            det_index = np.flatnonzero(det_mask & ~det_matched)
+            rows, cols = greedy_match(iou[np.ix_(track_index, det_index)], self.iou_threshold)
+            track_matched[track_index[rows]] = True
+            det_matched[det_index[cols]] = True
+            matches.append((track_index[rows], det_index[cols]))
+        track_index = np.concatenate([m[0] for m in matches])
+        det_index = np.concatenate([m[1] for m in matches])
+
+        # 批量卡尔曼更新匹配上的轨迹
+        if len(track_index):
+            z = xyxy_to_z(boxes[det_index])
+            P = self.cov[track_index]
+            S = P[:, :4, :4] + R
+            K = P[:, :, :4] @ np.linalg.inv(S)
+            self.mean[track_index] += (K @ (z - self.mean[track_index, :4])[:, :, None])[:, :, 0]
+            self.cov[track_index] = P - K @ P[:, :4, :]
+            self.conf[track_index] = confs[det_index]
+            self.hits[track_index] += 1
+            self.last_frame[track_index] = self.frame
+
+        # 轨迹是否稳定：没有新出现的目标，也没有已确认的轨迹丢失
+        new_dets = np.flatnonzero(~det_matched & high)
+        lost = confirmed & ~track_matched
+        self.skip_budget = self.skip_frames if len(new_dets) == 0 and not lost.any() else 0
+
+        output_mask = track_matched & confirmed
+        output = np.zeros((len(self.ids), 4))
+        output[track_index] = boxes[det_index]
+        output = self._output(output_mask, output[output_mask], self.conf[output_mask])
+
+        # 删除：未确认且本帧没匹配上的轨迹，以及超过max_age帧没匹配上的轨迹
+        remove = (~track_matched & ~confirmed) | (self.frame - self.last_frame > self.max_age)
+        self._remove(remove)
+
+        # 未匹配的高置信度检测框创建新轨迹（第一帧的目标直接确认）
+        if len(new_dets):
+            n = len(new_dets)
+            self.mean = np.concatenate([self.mean, np.column_stack([xyxy_to_z(boxes[new_dets]), np.zeros((n, 3))])])
+            self.cov = np.concatenate([self.cov, np.repeat(P0[None], n, axis=0)])
+            self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+            self.cls = np.concatenate([self.cls, classes[new_dets]])
+            self.conf = np.concatenate([self.conf, confs[new_dets]])
+            self.hits = np.concatenate([self.hits, np.ones(n, dtype=int)])
+            self.activated = np.concatenate([self.activated, np.full(n, self.frame == 0)])
+            self.first_frame = np.concatenate([self.first_frame, np.full(n, self.frame)])
+            self.last_frame = np.concatenate([self.last_frame, np.full(n, self.frame)])
+            self.next_id += n
+            if self.frame == 0:
+                output = np.concatenate([output, self._output(
+                    np.arange(len(self.ids) - n, len(self.ids)), boxes[new_dets], confs[new_dets])])
+        return output
+
+    def _remove(self, mask):
+        # 删除轨迹，已确认的轨迹记录到finished中
+        keep = ~mask
+        done = mask & self._confirmed()
+        self.finished.extend(zip(self.ids[done].tolist(), self.cls[done].tolist(), self.first_frame[done].tolist(),
+                                 self.last_frame[done].tolist(), self.hits[done].tolist()))
+        for name in ('mean', 'cov', 'ids', 'cls', 'conf', 'hits', 'activated', 'first_frame', 'last_frame'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def summary(self):
+        # 结束跟踪，返回所有已确认轨迹的统计：[(id, 类别, 首帧, 末帧, 停留秒数, 匹配次数), ...]
+        self._remove(np.ones(len(self.ids), dtype=bool))
+        return [(track_id, cls, first, last, (last - first + 1) / self.fps, hits)
+                for track_id, cls, first, last, hits in sorted(self.finished)]
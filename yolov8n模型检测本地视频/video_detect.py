@@ -1,29 +1,90 @@
 import cv2
+import csv
 import os
 import hashlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import torch
 from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+from detection_export import DetectionExporter
+from device_utils import prepare_model
+from tiling import frame_regions, merge_detections, region_imgsz
+from tracker import Tracker
+from video_writer import create_writer
 
 # ========== 核心配置：务必确认模型文件名是你自己训练的！ ==========
 # 【重点】修改为你自己训练的模型文件名（比如：my_train_model.pt）
-model_name = "xxx.pt"  
-video_name = "xxx.mp4"        
-output_name = "output_detected.mp4"  
+model_name = "xxx.pt"
+video_name = "xxx.mp4"
+output_name = "output_detected.mp4"
+
+# ========== 输出模式 ==========
+# "video"：绘制检测框并输出标注视频；"detections"：只导出检测结果，不绘制也不编码视频（速度快很多），
+# 需要标注视频时再用 detection_export.py 根据导出的检测结果单独渲染
+output_mode = "video"
+detections_name = "detections"   # 检测结果文件名（不含扩展名），安装了pyarrow时为.parquet，否则为.csv.gz
+export_chunk_rows = 10000        # 每积累多少行检测结果写入一次文件
+
+# ========== 推理参数 ==========
+conf = 0.3
+iou = 0.5
+# "auto"：启动时自动选择最快的可用设备（CUDA → MPS → CPU）；也可指定 "cuda:0"/"GPU"/"mps"/"cpu"，不可用时自动回退
+device = "auto"
+cpu_threads = 0      # CPU推理时PyTorch使用的线程数，0表示使用默认值
+cpu_export = ""      # CPU推理时可选 "onnx"（需安装onnxruntime）或 "openvino"（需安装openvino），为空时直接用PyTorch推理
+
+# ========== 推理区域（高分辨率画面中目标只出现在固定区域、或目标很小时使用） ==========
+# rois：只在这些区域内推理，格式 [(x1, y1, x2, y2), ...]，用0-1之间的比例表示（如 (0.5, 0, 1, 0.5) 为右上四分之一），为空时整帧推理
+# tile_size：切片推理（SAHI风格），把每个区域切成 tile_size 像素、相互重叠 tile_overlap 的小块分别推理，再合并跨块的检测框；0表示不切片
+# decode_width：读帧后立即把帧等比例缩小到该宽度，后续推理、绘制和编码都在缩小后的帧上进行；0表示保持原始分辨率
+rois = []
+tile_size = 0
+tile_overlap = 0.2
+merge_threshold = 0.5   # 合并跨块检测框的阈值（交集/较小框面积）
+region_scale = 1.0      # 区域推理尺寸的缩放倍数：切片时小块按 小块长边 × region_scale 推理（1为原始分辨率），
+                        # 只用ROI不切片时按 区域长边/整帧长边 × 模型输入尺寸 × region_scale 推理（1与整帧推理的缩放比例相同）
+max_crops_per_call = 16 # 每次送入模型的区域/小块数量上限，避免一批帧的全部小块一次推理占满内存
+decode_width = 0
+
+# ========== 流水线配置（读帧 → 推理 → 绘制/写入 三个阶段并行） ==========
+batch_size = 4      # 每次送入模型的帧数（GPU上可适当调大）
+queue_size = 32     # 阶段之间队列的最大长度，限制内存中缓存的帧数
+plot_workers = 2    # 绘制标注帧的线程数
+
+# ========== 跳帧/运动门控（长时间静止的监控视频可大幅减少推理次数） ==========
+# "all"：每帧都推理；"interval"：每 infer_interval 帧推理一次；"motion"：画面变化超过阈值时才推理；
+# "tracker"：由跟踪器决定（需开启tracking），所有轨迹都稳定匹配时跳过接下来的 tracker_skip 帧
+# 跳过的帧沿用最近一次推理的检测框绘制（开启tracking时改用卡尔曼预测的位置），并计入 detected_object_count
+skip_mode = "all"
+SKIP_MODES = ("all", "interval", "motion", "tracker")
+infer_interval = 5       # interval模式：推理间隔（帧）
+motion_threshold = 4.0   # motion模式：缩小后的灰度帧与上次推理帧的平均像素差（0-255）超过该值时推理
+max_skip = 30            # motion模式：最多连续跳过的帧数，达到后强制推理一次
+motion_width = 160       # motion模式：计算画面变化前把帧缩小到的宽度
+
+# ========== 多目标跟踪（SORT/ByteTrack风格：卡尔曼滤波预测 + IoU匹配） ==========
+# detected_object_count按帧累加，同一个目标每帧都会计一次；开启跟踪后每个目标有稳定的跟踪ID，
+# 结束时统计不同目标的数量和每个目标的停留时间（保存到 tracks_name）
+tracking = False
+track_high_conf = 0.5      # 高于该置信度的检测框才能创建新轨迹，低置信度的框只用于延续已有轨迹
+track_iou = 0.3            # 检测框与轨迹预测位置的IoU低于该值时不匹配
+track_min_hits = 3         # 轨迹匹配多少次后确认（确认后才绘制和统计）
+track_max_age = 30         # 轨迹连续多少帧没有匹配上后删除
+tracker_skip = 2           # skip_mode="tracker"：轨迹稳定时最多连续跳过的帧数
+tracks_name = "tracks.csv" # 每个目标的统计（类别、首末帧、停留时间）
 
 # ========== 脚本所在目录（utills） ==========
 utills_dir = os.path.dirname(os.path.abspath(__file__))
 model_path = os.path.join(utills_dir, model_name)
 video_path = os.path.join(utills_dir, video_name)
 output_path = os.path.join(utills_dir, output_name)
-
-# ========== 路径/文件校验 ==========
-print("📌 脚本所在目录（utills）：", utills_dir)
-print("📌 模型文件路径：", model_path)
-print("📌 输入视频路径：", video_path)
-
-# 检查模型是否存在
-if not os.path.exists(model_path):
-    print(f"\n❌ 模型文件不存在！请确认 {model_name} 在 utills 目录下")
-    exit()
+detections_path = os.path.join(utills_dir, detections_name)
+tracks_path = os.path.join(utills_dir, tracks_name)
 
 # 【新增】验证模型文件（避免加载错误文件）
 # 个人矩阵
@@ -33,116 +94,469 @@ if not os.path.exists(model_path):
         #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
         #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
 def get_file_md5(file_path):
+    # MD5按（文件大小、修改时间）缓存在同目录的 .md5 文件中，模型未变化时不再重新读取整个模型
+    st = os.stat(file_path)
+    stamp = f"{st.st_size} {st.st_mtime_ns}"
+    cache_path = file_path + ".md5"
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached_stamp, cached_md5 = f.read().strip().rsplit(' ', 1)
+        if cached_stamp == stamp:
+            return cached_md5
+    except (OSError, ValueError):
+        pass
+
     md5 = hashlib.md5()
     with open(file_path, 'rb') as f:
-        while chunk := f.read(4096):
+        while chunk := f.read(1 << 20):
             md5.update(chunk)
-    return md5.hexdigest()
+    file_md5 = md5.hexdigest()
+    try:
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            f.write(f"{stamp} {file_md5}")
+    except OSError:
+        pass
+    return file_md5
 
-model_md5 = get_file_md5(model_path)
-print(f"📌 模型文件MD5：{model_md5}（可用于验证文件是否正确）")
+# ========== 加载模型 ==========
+def load_model(model_path):
+    # 加载模型并检查类别，失败时返回None
+    try:
+        model = YOLO(model_path)
+        model_classes = model.names
+        print(f"✅ 模型加载成功！模型包含 {len(model_classes)} 个类别：{list(model_classes.values())}")
+        # 【重点提醒】如果这里显示的还是person/car等，说明模型文件不对！
+        if 'person' in model_classes.values() and len(model_classes) <= 20:
+            print("⚠️ 警告：当前加载的模型是通用预训练模型，不是你自己训练的！")
+        return model
+    except Exception as e:
+        print(f"❌ 模型加载失败：{e}")
+        return None
 
-# 检查视频是否存在
-if not os.path.exists(video_path):
-    print(f"\n❌ 视频文件不存在！请确认 {video_name} 在 utills 目录下")
-    exit()
+# ========== 获取视频参数（视频写入器见video_writer.py） ==========
+def scaled_size(width, height):
+    # 开启decode_width时帧缩小后的尺寸
+    if 0 < decode_width < width:
+        return decode_width, max(1, round(height * decode_width / width))
+    return width, height
 
-# ========== 加载模型 ==========
-try:
-    model = YOLO(model_path)
-    model_classes = model.names
-    print(f"✅ 模型加载成功！模型包含 {len(model_classes)} 个类别：{list(model_classes.values())}")
-    # 【重点提醒】如果这里显示的还是person/car等，说明模型文件不对！
-    if 'person' in model_classes.values() and len(model_classes) <= 20:
-        print("⚠️ 警告：当前加载的模型是通用预训练模型，不是你自己训练的！")
-except Exception as e:
-    print(f"❌ 模型加载失败：{e}")
-    exit()
-
-# ========== 打开视频文件 ==========
+# ========== 流水线：读帧线程 ==========
 # 个人矩阵
 
         #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
         #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
         #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
         #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
-cap = cv2.VideoCapture(video_path)
-if not cap.isOpened():
-    print("❌ 无法打开视频文件（可能格式不支持/文件损坏）")
-    exit()
-
-# ========== 获取视频参数 + 修复编码问题 ==========
-width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-fps    = cap.get(cv2.CAP_PROP_FPS) or 30
-
-# 【修复编码问题】放弃openh264，使用mp4v/XVID编码（兼容性最好）
-# 优先用mp4v，若失败则用XVID
-fourcc_options = [cv2.VideoWriter_fourcc(*'mp4v'), cv2.VideoWriter_fourcc(*'XVID')]
-out = None
-for fourcc in fourcc_options:
-    out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-    if out.isOpened():
-        print(f"✅ 视频写入器初始化成功（编码：{chr(fourcc&0xFF)}{chr((fourcc>>8)&0xFF)}{chr((fourcc>>16)&0xFF)}{chr((fourcc>>24)&0xFF)}）")
-        break
-
-if not out or not out.isOpened():
-    print("❌ 所有编码格式都无法创建输出视频！")
-    cap.release()
-    exit()
-
-print(f"🚀 开始检测... | 视频尺寸：{width}x{height} | 帧率：{fps}")
-
-# ========== 逐帧检测 ==========
+def put_until_stopped(q, item, stop):
+    # 队列满时等待（背压），收到停止信号时放弃，返回是否放入成功
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+class FrameGate:
+    # 决定每一帧是否需要推理（在读帧线程中执行，只依赖画面内容，结果与推理进度无关）
+    def __init__(self, mode=None):
+        # 未指定时在创建时读取全局配置skip_mode（导入后修改video_detect.skip_mode同样生效）
+        mode = skip_mode if mode is None else mode
+        if mode not in SKIP_MODES:
+            raise ValueError(f"不支持的跳帧模式：{mode}")
+        self.mode = mode
+        self.index = 0
+        self.reference = None  # 上次推理帧的缩略灰度图
+        self.skipped = 0       # 上次推理后连续跳过的帧数
+
+    def thumbnail(self, frame):
+        # 缩小并转为灰度，计算画面变化只需要很小的分辨率
+        height, width = frame.shape[:2]
+        size = (motion_width, max(1, height * motion_width // width))
+        return cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+    def should_infer(self, frame):
+        # tracker模式在推理循环中由跟踪器决定
+        if self.mode in ("all", "tracker"):
+            return True
+        if self.mode == "interval":
+            infer = self.index % infer_interval == 0
+            self.index += 1
+            return infer
+
+        small = self.thumbnail(frame)
+        if (self.reference is None or self.skipped >= max_skip
+                or cv2.absdiff(small, self.reference).mean() > motion_threshold):
+            self.reference = small
+            self.skipped = 0
+            return True
+        self.skipped += 1
+        return False
+
+def reader_loop(cap, frame_queue, stop, timings):
+    # 解码视频帧并标记是否需要推理，放入队列，结束时放入None（各阶段只统计实际工作时间，不含等待队列的时间）
+    busy = 0.0
+    try:
+        gate = FrameGate()
+        while not stop.is_set():
+            start = time.perf_counter()
+            ret, frame = cap.read()
+            if ret and 0 < decode_width < frame.shape[1]:
+                frame = cv2.resize(frame, scaled_size(frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_AREA)
+            infer = ret and gate.should_infer(frame)
+            busy += time.perf_counter() - start
+            if not ret:
+                break
+            if not put_until_stopped(frame_queue, (frame, infer), stop):
+                break
+    except Exception as e:
+        # 读帧线程出错时通知其他阶段停止，避免推理循环一直等待新帧
+        print(f"\n❌ 读帧出错：{e}")
+        stop.set()
+    finally:
+        timings['读帧'] = busy
+        put_until_stopped(frame_queue, None, stop)
+
+# ========== 流水线：写入线程（按帧顺序写入） ==========
+def render_frame(results, plot_times, img=None):
+    # 绘制标注帧（在绘制线程池中执行），img不为None时把检测框绘制到该帧上（跳过推理的帧）
+    start = time.perf_counter()
+    annotated_frame = results.plot(img=img)
+    plot_times.append(time.perf_counter() - start)
+    return annotated_frame
+
+def writer_loop(out, write_queue, stop, timings, errors):
+    # 队列中的任务已按帧顺序排列，依次等待绘制完成后写入，收到None时结束
+    busy = 0.0
+    try:
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            future, raw_frame = item
+            frame = raw_frame if future is None else future.result()  # 推理出错的帧写入原始画面
+            start = time.perf_counter()
+            out.write(frame)
+            busy += time.perf_counter() - start
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        timings['写入'] = busy
+
+def export_loop(exporter, write_queue, stop, timings, errors):
+    # detections模式的写入线程：队列中为 (帧序号, 推理结果, 是否推理)，按帧顺序追加到检测结果文件
+    busy = 0.0
+    try:
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            frame_index, results, inferred = item
+            start = time.perf_counter()
+            exporter.add(frame_index, results, inferred)
+            busy += time.perf_counter() - start
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        timings['写入'] = busy
+
+# ========== 流水线：推理阶段 ==========
 # 个人矩阵
 
         #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
         #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
         #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
         #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
-frame_count = 0
-detected_object_count = 0
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
+def next_batch(frame_queue, batch_size, stop):
+    # 从队列中按顺序取帧，直到凑够batch_size个需要推理的帧（或取出的帧数达到queue_size）
+    # 返回 ([(帧, 是否推理), ...], 是否已读完)
+    items = []
+    infer_count = 0
+    while infer_count < batch_size and len(items) < queue_size:
+        try:
+            item = frame_queue.get(timeout=0.2)
+        except queue.Empty:
+            if stop.is_set():
+                return items, True
+            continue
+        if item is None:
+            return items, True
+        items.append(item)
+        infer_count += item[1]
+    return items, False
+
+region_cache = {}  # 帧尺寸 → [(推理区域, 推理尺寸), ...]
 
+def frame_region_sizes(model, width, height):
+    # 一帧的推理区域及各区域的推理尺寸（同一尺寸的帧只计算一次）
+    if (width, height) not in region_cache:
+        imgsz = model.overrides.get("imgsz") or 640
+        imgsz = max(imgsz) if isinstance(imgsz, (list, tuple)) else imgsz
+        regions = frame_regions(width, height, rois, tile_size, tile_overlap)
+        sizes = region_imgsz(width, height, regions, imgsz, region_scale, native=bool(tile_size))
+        region_cache[(width, height)] = list(zip(regions, sizes))
+    return region_cache[(width, height)]
+
+def infer_frames(model, frames):
+    # 整帧推理；配置了rois/tile_size时把各帧的区域裁剪出来推理，检测框映射回整帧坐标并合并，
+    # 返回与整帧推理相同的Results列表，后续的绘制/跟踪/导出不需要区分
+    if not rois and not tile_size:
+        return model(frames, conf=conf, iou=iou, verbose=False)
+
+    # 按推理尺寸分组，同一尺寸的区域一起推理，每次最多max_crops_per_call个
+    groups = {}
+    frame_region_lists = []
+    crop_count = 0
+    for frame in frames:
+        regions = frame_region_sizes(model, frame.shape[1], frame.shape[0])
+        frame_region_lists.append(regions)
+        for (x1, y1, x2, y2), size in regions:
+            groups.setdefault(size, []).append((crop_count, frame[y1:y2, x1:x2]))
+            crop_count += 1
+
+    crop_data = [None] * crop_count
+    for size, items in groups.items():
+        for i in range(0, len(items), max_crops_per_call):
+            chunk = items[i:i + max_crops_per_call]
+            results = model([crop for _, crop in chunk], conf=conf, iou=iou, imgsz=size, verbose=False)
+            for (index, _), result in zip(chunk, results):
+                crop_data[index] = result.boxes.data.cpu().numpy()
+
+    crop_data = iter(crop_data)
+    batch_results = []
+    for frame, regions in zip(frames, frame_region_lists):
+        parts = [np.zeros((0, 6), dtype=np.float32)]
+        for (x1, y1, _, _), _ in regions:
+            data = next(crop_data)
+            data[:, :4] += (x1, y1, x1, y1)
+            parts.append(data)
+        data = np.concatenate(parts)
+        if len(regions) > 1:
+            data = merge_detections(data, merge_threshold)
+        batch_results.append(Results(frame, path="", names=model.names, boxes=torch.from_numpy(data)))
+    return batch_results
+
+def track_frame(tracker, results, frame, names):
+    # 把一帧的检测结果交给跟踪器，返回带跟踪ID的Results；跳过推理（results为None）的帧只做卡尔曼预测
+    if results is None or results.boxes is None:
+        tracks = tracker.predict()
+    else:
+        boxes = results.boxes
+        tracks = tracker.update(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+    return Results(frame, path="", names=names, boxes=torch.from_numpy(tracks))
+
+def process_video(model, cap, out, tracker=None):
+    # 读帧线程 → 推理（主线程，按批） → 绘制线程池 + 写入线程
+    # 三个阶段通过有界队列连接，总耗时接近最慢的阶段，而不是三者之和
+    frame_queue = queue.Queue(maxsize=queue_size)
+    write_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    timings = {}
+    errors = []
+    plot_times = []
+
+    # out为VideoWriter（video模式）或DetectionExporter（detections模式）
+    export = isinstance(out, DetectionExporter)
+    reader = threading.Thread(target=reader_loop, args=(cap, frame_queue, stop, timings), daemon=True)
+    writer = threading.Thread(target=export_loop if export else writer_loop, args=(out, write_queue, stop, timings, errors), daemon=True)
+    reader.start()
+    writer.start()
+
+    frame_count = 0
+    inferred_count = 0
+    detected_object_count = 0
+    infer_time = 0.0
+    track_time = 0.0
+    last_results = None  # 最近一次推理的结果，跳过的帧沿用它的检测框
     try:
-        results = model(
-            frame, 
-            conf=0.3, 
-            iou=0.5, 
-            device="GPU",
-            verbose=False
-        )[0]
-
-        current_detected = len(results.boxes) if results.boxes is not None else 0
-        detected_object_count += current_detected
-        annotated_frame = results.plot()
-        out.write(annotated_frame)
+        with ThreadPoolExecutor(max_workers=plot_workers) as plotter:
+            finished = False
+            # tracker模式下是否跳过某一帧取决于上一帧的跟踪结果，因此逐帧取出、决定并推理（不组批）
+            tracker_gated = tracker is not None and skip_mode == "tracker"
+            while not finished and not stop.is_set():
+                items, finished = next_batch(frame_queue, 1 if tracker_gated else batch_size, stop)
+                if not items:
+                    break
+                if tracker_gated:
+                    items = [(frame, tracker.should_infer()) for frame, _ in items]
 
-    except Exception as e:
-        print(f"\n⚠️ 第 {frame_count+1} 帧推理出错：{e}")
-        out.write(frame)
-
-    frame_count += 1
-    if frame_count % 30 == 0:
-        print(f"🔄 已处理 {frame_count} 帧 | 累计检测到 {detected_object_count} 个目标")
-
-# ========== 释放资源 ==========
-cap.release()
-out.release()
-cv2.destroyAllWindows()
-
-# ========== 最终统计 ==========
-print(f"\n✅ 检测完成！")
-print(f"📤 输出视频保存到：{output_path}")
-print(f"📊 共处理 {frame_count} 帧 | 累计检测到 {detected_object_count} 个目标")
-
-# 【再次提醒】
-if 'person' in model_classes.values():
-    print("\n❌ 关键问题：你加载的模型是通用预训练模型，不是自定义训练的！")
-    print("请检查：")
-    print("  1. 模型文件名是否正确（是否是训练完成后生成的best.pt/last.pt）")
-    print("  2. 是否将训练好的模型文件复制到了utills目录下")
-    print("  3. 模型文件是否被覆盖（比如误放了官方预训练模型）")
\ No newline at end of file
+                frames = [frame for frame, infer in items if infer]
+                batch_results = []
+                if frames:
+                    start = time.perf_counter()
+                    try:
+                        batch_results = infer_frames(model, frames)
+                    except Exception as e:
+                        print(f"\n⚠️ 第 {frame_count+1}-{frame_count+len(items)} 帧推理出错：{e}")
+                        batch_results = [None] * len(frames)
+                    infer_time += time.perf_counter() - start
+                    inferred_count += len(frames)
+
+                batch_results = iter(batch_results)
+                for frame, infer in items:
+                    if infer:
+                        results = last_results = next(batch_results)
+                        img = None
+                    else:
+                        results = last_results
+                        img = frame
+                    if tracker is not None:
+                        start = time.perf_counter()
+                        results = track_frame(tracker, results if infer else None, frame, model.names)
+                        track_time += time.perf_counter() - start
+                        img = None
+                    if results is not None:
+                        current_detected = len(results.boxes) if results.boxes is not None else 0
+                        detected_object_count += current_detected
+                    if export:
+                        if results is not None:
+                            put_until_stopped(write_queue, (frame_count, results, infer), stop)
+                    elif results is None:
+                        put_until_stopped(write_queue, (None, frame), stop)
+                    else:
+                        put_until_stopped(write_queue, (plotter.submit(render_frame, results, plot_times, img), frame), stop)
+
+                    frame_count += 1
+                    if frame_count % 30 == 0:
+                        print(f"🔄 已处理 {frame_count} 帧 | 累计检测到 {detected_object_count} 个目标")
+    finally:
+        # 写入线程处理完队列中已有的帧后结束；读帧线程可能阻塞在已满的队列上，通知其停止
+        while writer.is_alive():
+            try:
+                write_queue.put(None, timeout=0.2)
+                break
+            except queue.Full:
+                continue
+        writer.join()
+        stop.set()
+        reader.join()
+
+    if errors:
+        raise errors[0]
+    timings['推理'] = infer_time
+    if tracker is not None:
+        timings['跟踪'] = track_time
+    if not export:
+        timings['绘制'] = sum(plot_times)
+    return frame_count, inferred_count, detected_object_count, timings
+
+def save_tracks(track_summary, names, path):
+    # 保存每个目标的统计并按类别打印：不同目标数、平均停留时间
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['track_id', 'class_id', 'class_name', 'first_frame', 'last_frame', 'dwell_s', 'hits'])
+        for track_id, cls, first, last, dwell, hits in track_summary:
+            writer.writerow([track_id, cls, names.get(cls, cls), first, last, round(dwell, 3), hits])
+
+    print(f"🆔 跟踪到 {len(track_summary)} 个不同目标（明细保存到：{path}）")
+    for cls in sorted({item[1] for item in track_summary}):
+        dwells = [item[4] for item in track_summary if item[1] == cls]
+        print(f"   {names.get(cls, cls)}：{len(dwells)} 个，平均停留 {sum(dwells) / len(dwells):.2f}s，最长 {max(dwells):.2f}s")
+
+def main():
+    # ========== 路径/文件校验 ==========
+    print("📌 脚本所在目录（utills）：", utills_dir)
+    print("📌 模型文件路径：", model_path)
+    print("📌 输入视频路径：", video_path)
+
+    # 检查模型是否存在
+    if not os.path.exists(model_path):
+        print(f"\n❌ 模型文件不存在！请确认 {model_name} 在 utills 目录下")
+        return
+
+    model_md5 = get_file_md5(model_path)
+    print(f"📌 模型文件MD5：{model_md5}（可用于验证文件是否正确）")
+
+    if skip_mode not in SKIP_MODES:
+        print(f'\n❌ 不支持的跳帧模式 skip_mode = "{skip_mode}"（可选：{", ".join(SKIP_MODES)}）')
+        return
+    if skip_mode == "tracker" and not tracking:
+        print('\n❌ skip_mode = "tracker" 需要开启 tracking = True')
+        return
+
+    # 检查视频是否存在
+    if not os.path.exists(video_path):
+        print(f"\n❌ 视频文件不存在！请确认 {video_name} 在 utills 目录下")
+        return
+
+    model = load_model(model_path)
+    if model is None:
+        return
+    model_classes = model.names
+    model = prepare_model(model, model_path, device, cpu_threads, cpu_export)
+
+    # ========== 打开视频文件 ==========
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("❌ 无法打开视频文件（可能格式不支持/文件损坏）")
+        return
+
+    width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps    = cap.get(cv2.CAP_PROP_FPS) or 30
+    # 开启decode_width时输出视频为缩小后的尺寸，导出的检测框换算回原始分辨率
+    original_width = width
+    width, height = scaled_size(width, height)
+
+    if output_mode == "detections":
+        out = DetectionExporter(detections_path, fps, export_chunk_rows, original_width / width)
+        result_path = out.path
+    else:
+        out = create_writer(output_path, fps, width, height)
+        if out is None:
+            print("❌ 所有编码格式都无法创建输出视频！")
+            cap.release()
+            return
+        result_path = output_path
+
+    tracker = None
+    if tracking:
+        tracker = Tracker(fps, track_high_conf, track_iou, track_min_hits, track_max_age, tracker_skip)
+
+    print(f"🚀 开始检测... | 视频尺寸：{width}x{height} | 帧率：{fps}")
+    if rois or tile_size:
+        regions = frame_region_sizes(model, width, height)
+        print(f"🔲 每帧推理 {len(regions)} 个区域（区域, 推理尺寸）：{regions}")
+
+    # ========== 逐帧检测（流水线） ==========
+    start = time.perf_counter()
+    try:
+        frame_count, inferred_count, detected_object_count, timings = process_video(model, cap, out, tracker)
+    finally:
+        # ========== 释放资源 ==========
+        cap.release()
+        if output_mode == "detections":
+            out.close()
+        else:
+            out.release()
+        cv2.destroyAllWindows()
+    elapsed = time.perf_counter() - start
+
+    # ========== 最终统计 ==========
+    print(f"\n✅ 检测完成！")
+    if output_mode == "detections":
+        print(f"📤 检测结果保存到：{result_path}（共 {out.total_rows} 行）")
+        print(f"🎬 如需标注视频：python detection_export.py --detections {result_path} --video {video_path}")
+    else:
+        print(f"📤 输出视频保存到：{result_path}")
+    print(f"📊 共处理 {frame_count} 帧 | 累计检测到 {detected_object_count} 个目标")
+    if inferred_count < frame_count:
+        print(f"⏭️ 跳帧模式 {skip_mode}：推理 {inferred_count} 帧，跳过 {frame_count - inferred_count} 帧（沿用上次推理结果）")
+    if tracker is not None:
+        save_tracks(tracker.summary(), model_classes, tracks_path)
+    print(f"⏱️ 总耗时 {elapsed:.2f}s（{frame_count / max(elapsed, 1e-9):.1f} 帧/秒）| 各阶段耗时："
+          + "，".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+
+    # 【再次提醒】
+    if 'person' in model_classes.values():
+        print("\n❌ 关键问题：你加载的模型是通用预训练模型，不是自定义训练的！")
+        print("请检查：")
+        print("  1. 模型文件名是否正确（是否是训练完成后生成的best.pt/last.pt）")
+        print("  2. 是否将训练好的模型文件复制到了utills目录下")
+        print("  3. 模型文件是否被覆盖（比如误放了官方预训练模型）")
+
+
+if __name__ == '__main__':
+    main()
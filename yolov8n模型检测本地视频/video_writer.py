@@ -0,0 +1,21 @@
+import cv2
+
+# ========== 输出视频写入器（video_detect.py、multi_video_detect.py、detection_export.py共用） ==========
+# 只依赖OpenCV，渲染检测结果时不需要导入torch/ultralytics
+
+# 个人矩阵
+
+        #> - 抖音账号：从 0 至 1（日常分享实操、效率工具教程）
+        #> - 微信公众号：从 0 至 1（可通过该渠道获取完整代码包及EXE程序）
+        #> - 博客网站：[www.from0to1.cn](https://www.from0to1.cn)（持续更新实战教程、技术干货内容）
+        #> - GitHub账号：[https://github.com/mtnljbydd](https://github.com/mtnljbydd)（开源更多实用工具脚本及项目工程）
+def create_writer(output_path, fps, width, height):
+    # 【修复编码问题】放弃openh264，使用mp4v/XVID编码（兼容性最好）
+    # 优先用mp4v，若失败则用XVID
+    fourcc_options = [cv2.VideoWriter_fourcc(*'mp4v'), cv2.VideoWriter_fourcc(*'XVID')]
+    for fourcc in fourcc_options:
+        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        if out.isOpened():
+            print(f"✅ 视频写入器初始化成功（编码：{chr(fourcc&0xFF)}{chr((fourcc>>8)&0xFF)}{chr((fourcc>>16)&0xFF)}{chr((fourcc>>24)&0xFF)}）")
+            return out
+    return None